@@ -1,25 +1,101 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
+import hmac
+import ipaddress
+import math
 import os
-from werkzeug.utils import secure_filename
+import time
 from datetime import datetime
 from utils.file_cleanup import cleanup_old_files
+from utils.upload_stream import (
+    ImageUploadStream,
+    UploadRejected,
+    parse_multipart_boundary,
+    UPLOAD_CHUNK_SIZE,
+)
+from utils.structured_logging import (
+    get_logger,
+    new_request_id,
+    current_request_id,
+    clear_request_id,
+    get_logging_stats,
+)
 from services.swin_service import (
     load_swin_model,
+    load_cascade_model,
+    reload_swin_model,
+    start_model_watcher,
+    start_inference_workers,
     classify_image,
+    extract_embeddings,
     is_model_loaded,
     get_model_info,
+    preprocess_upload,
+    PREPROCESSED_UPLOAD_SUFFIX,
+    TILE_POOLING,
+    TILE_POOLING_METHODS,
+    QUALITY_INPUT_SIZES,
 )
 from services.gemini_service import (
     load_gemini_client,
     is_gemini_available,
+    get_gemini_info,
     generate_explanation,
-    generate_chat_response,
+)
+from services.explanation_library import load_explanation_library
+from services.similarity_index import (
+    load_similarity_index,
+    is_similarity_index_loaded,
+    search_similar_cases,
+    get_similarity_index_info,
+)
+from services.job_service import (
+    init_job_queue,
+    submit_job,
+    get_job,
+)
+from services.chat_session_service import (
+    create_chat_session,
+    get_chat_session,
+    generate_session_reply,
+)
+from services.admission_control import (
+    admit,
+    release,
+    get_admission_stats,
+)
+from services.storage_backend import configure_storage, get_storage_info
+from services.traffic_capture import (
+    configure_traffic_capture,
+    begin_capture,
+    is_capturing_request,
+    capture_image,
+    record_stage,
+    finish_capture,
+    end_capture,
+    get_capture_stats,
+)
+from services.tracing import (
+    configure_tracing,
+    start_trace,
+    finish_trace,
+    span,
+    annotate,
+    current_trace_id,
+    get_tracing_stats,
 )
 
 # Create Flask application instance
 app = Flask(__name__)
 
+# Loggers per category (sampling rates are configured per category)
+log = get_logger("app")
+http_log = get_logger("http")
+upload_log = get_logger("upload")
+analyze_log = get_logger("analyze")
+chat_log = get_logger("chat")
+similar_log = get_logger("similar")
+
 # Enable CORS to allow frontend to connect
 # This allows requests from any origin (for development)
 # In production, you'd specify allowed origins
@@ -28,9 +104,29 @@ CORS(app)
 # Configuration constants for file uploads
 UPLOAD_FOLDER = "uploads"  # Directory where uploaded images will be saved
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}  # Allowed image file extensions
+# Uploads plus their preprocessed artifacts ("<upload>.npy") are cleaned up together
+CLEANUP_EXTENSIONS = ALLOWED_EXTENSIONS | {PREPROCESSED_UPLOAD_SUFFIX.lstrip(".")}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # Maximum file size: 10MB (in bytes)
+MAX_IMAGE_PIXELS = 40_000_000  # Largest accepted width x height (checked from the image header)
+MAX_MULTIPART_OVERHEAD = 64 * 1024  # Allowance for multipart headers and other form fields
 CLEANUP_MAX_AGE_HOURS = 1  # Delete files older than 1 hour
 MODEL_PATH = "models/swin_best.pt"  # Path to Swin Transformer model file
+CASCADE_MODEL_PATH = "models/cascade_fast.pt"  # Optional cheap first-stage model for cascade mode
+MODEL_WATCH_INTERVAL_SECONDS = 30  # Hot-swap the model when MODEL_PATH changes on disk (0 disables)
+INFERENCE_WORKER_PROCESSES = 2  # Processes running Swin inference (0 runs it in the request threads)
+AUTOTUNE_ON_STARTUP = False  # Benchmark execution variants at startup if this host has no saved configuration (see services/autotune.py)
+ANALYZE_TTA_MODE = "adaptive"  # TTA policy for /analyze: True, False or "adaptive"
+ANALYZE_QUALITY = "full"  # Default /analyze quality tier ("full" or "reduced", see QUALITY_INPUT_SIZES in services/swin_service.py)
+EXPLANATION_LIBRARY_PATH = "models/explanation_library.bin"  # Precomputed explanations (see scripts/build_explanation_library.py)
+JOB_DB_PATH = "analysis_jobs.db"  # SQLite store for async analysis jobs
+SIMILAR_CASES_INDEX_PATH = "models/similar_cases"  # Reference case embeddings (see scripts/build_similarity_index.py)
+SIMILAR_CASES_DEFAULT_K = 5  # Similar cases returned by /similar by default
+SIMILAR_CASES_MAX_K = 50  # Largest 'k' a client may request
+MAX_BURST_IMAGES = 20  # Most shots accepted in one /analyze burst (up to MAX_FRAMES of them are scored)
+STORAGE_URL = os.getenv("STORAGE_URL", "memory://")  # Prediction/explanation caches and chat sessions (see services/storage_backend.py)
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")  # Record /analyze and /chat traffic for replay (see services/traffic_capture.py)
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL", "")  # Export request spans to "file:///path" or an OTLP/HTTP collector (see services/tracing.py)
+MODEL_RELOAD_TOKEN = os.getenv("MODEL_RELOAD_TOKEN", "")  # Bearer token /model/reload requires (unset: loopback callers only)
 
 # Ensure uploads directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -38,18 +134,74 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 # Ensure models directory exists
 os.makedirs("models", exist_ok=True)
 
+# Shared state first - caches and sessions are used as soon as requests arrive
+log.info("Storage backend initialization")
+storage_ready = configure_storage(STORAGE_URL)
+capture_enabled = configure_traffic_capture(TRAFFIC_CAPTURE_PATH)
+tracing_enabled = configure_tracing(TRACE_EXPORT_URL)
+
 # Initialize models
-print("\n" + "=" * 70)
-print(" SWIN TRANSFORMER MODEL INITIALIZATION")
-print("=" * 70)
-model_loaded = load_swin_model(MODEL_PATH)
-print("=" * 70 + "\n")
-
-print("=" * 70)
-print(" GEMINI API INITIALIZATION")
-print("=" * 70)
+log.info("Swin Transformer model initialization")
+model_loaded = load_swin_model(MODEL_PATH, autotune=AUTOTUNE_ON_STARTUP)
+cascade_loaded = load_cascade_model(CASCADE_MODEL_PATH)
+start_model_watcher(MODEL_WATCH_INTERVAL_SECONDS)
+inference_workers_started = start_inference_workers(INFERENCE_WORKER_PROCESSES)
+similarity_index_loaded = load_similarity_index(SIMILAR_CASES_INDEX_PATH)
+
+log.info("Gemini API initialization")
 gemini_loaded = load_gemini_client()
-print("=" * 70 + "\n")
+library_loaded = load_explanation_library(EXPLANATION_LIBRARY_PATH)
+
+
+@app.before_request
+def start_request_log():
+    """
+    Attach a request ID (the client's X-Request-ID, or a new one) to log
+    records and open the request's root span.
+    """
+    request_id = new_request_id(request.headers.get("X-Request-ID"))
+    request.environ["backend.start_time"] = time.time()
+    request.environ["backend.trace"] = start_trace(
+        f"{request.method} {request.path}",
+        request.headers.get("traceparent"),
+        **{"http.request.method": request.method, "url.path": request.path, "request_id": request_id},
+    )
+    begin_capture(request.path)
+
+
+@app.after_request
+def finish_request_log(response):
+    """
+    Log the handled request and return its ID in the X-Request-ID header
+    (and its trace ID in X-Trace-ID when traced).
+    """
+    start_time = request.environ.get("backend.start_time", time.time())
+    http_log.info(
+        "Request handled",
+        method=request.method,
+        path=request.path,
+        status=response.status_code,
+        duration_ms=round((time.time() - start_time) * 1000, 1),
+    )
+    response.headers["X-Request-ID"] = current_request_id() or ""
+    trace_id = current_trace_id()
+    if trace_id:
+        response.headers["X-Trace-ID"] = trace_id
+        annotate(**{"http.response.status_code": response.status_code})
+    if is_capturing_request():
+        finish_capture(response.status_code, request.get_json(silent=True), response.get_json(silent=True))
+    return response
+
+
+@app.teardown_request
+def end_request_log(error):
+    """
+    Close the root span and detach the request ID and any unfinished
+    capture from the worker thread.
+    """
+    finish_trace(request.environ.get("backend.trace"), error=str(error) if error else None)
+    end_capture()
+    clear_request_id()
 
 
 # Helper function to check if file extension is allowed
@@ -72,8 +224,20 @@ def health_check():
     """
     Simple health check endpoint to verify the server is running.
     Frontend can call this to test connectivity.
+    Includes current admission load (active and waiting requests per class),
+    storage backend hit rates, counts of log records discarded by sampling,
+    traffic capture and tracing counters and Gemini connection timings.
     """
-    return jsonify({"status": "ok", "message": "Backend is running"}), 200
+    return jsonify({
+        "status": "ok",
+        "message": "Backend is running",
+        "admission": get_admission_stats(),
+        "storage": get_storage_info(),
+        "logging": get_logging_stats(),
+        "capture": get_capture_stats(),
+        "tracing": get_tracing_stats(),
+        "gemini": get_gemini_info(),
+    }), 200
 
 
 # Image upload route
@@ -81,64 +245,184 @@ def health_check():
 def upload_image():
     """
     Handle image upload from frontend.
-    Validates the file, saves it temporarily, and returns file information.
+    The multipart body is read straight from the request stream and
+    validated chunk by chunk, so bad uploads are rejected before they are
+    fully received or stored.
     """
-    print(f"\n[UPLOAD] Received upload request")
+    upload, error = begin_upload(request.content_type, request.content_length)
+    if error:
+        return jsonify(error[0]), error[1]
 
-    # Check if file was sent in the request
-    if "image" not in request.files:
-        print(f"[UPLOAD] Error: No image in request.files")
-        return jsonify({"error": "No image provided"}), 400
+    def body_chunks():
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
 
-    file = request.files["image"]
+    response_data, status_code = store_upload(upload, body_chunks())
+    return jsonify(response_data), status_code
 
+
+def begin_upload(content_type, content_length):
+    """
+    Check the request headers of an upload and prepare its stream reader.
+    Shared by the Flask and ASGI upload routes.
+
+    Args:
+        content_type: Request Content-Type header
+        content_length: Declared body size in bytes (None for chunked bodies)
+
+    Returns:
+        tuple: (ImageUploadStream, None) or (None, (response body dict, HTTP status))
+    """
+    boundary = parse_multipart_boundary(content_type)
+    if boundary is None:
+        upload_log.info("Rejected: no image in request.files", content_type=content_type)
+        return None, ({"error": "No image provided"}, 400)
+
+    # Refuse before reading a byte of a body that cannot fit
+    if content_length is not None and content_length > MAX_FILE_SIZE + MAX_MULTIPART_OVERHEAD:
+        upload_log.info("Rejected: file too large", size_mb=round(content_length / (1024 * 1024), 2), stage="headers")
+        return None, ({"error": f"File too large. Maximum size: {MAX_FILE_SIZE / (1024 * 1024):.1f}MB"}, 400)
+
+    return ImageUploadStream(
+        boundary,
+        field_name="image",
+        temp_dir=UPLOAD_FOLDER,
+        max_file_size=MAX_FILE_SIZE,
+        max_pixels=MAX_IMAGE_PIXELS,
+        check_part=check_upload_part,
+    ), None
+
+
+def check_upload_part(filename, content_type):
+    """
+    Validate the client-supplied name and type of the image part, before
+    any of its data is accepted.
+
+    Args:
+        filename: Client-supplied file name
+        content_type: Client-supplied content type of the part
+
+    Raises:
+        UploadRejected: If the part cannot be an allowed image
+    """
     # Check if file was actually selected (not empty)
-    if file.filename == "":
-        print(f"[UPLOAD] Error: Empty filename")
-        return jsonify({"error": "No file selected"}), 400
+    if not filename:
+        raise UploadRejected("No file selected", "empty filename")
 
     # Validate file extension
-    if not allowed_file(file.filename):
-        print(f"[UPLOAD] Error: Invalid file type - {file.filename}")
-        return jsonify({"error": "Invalid file type. Only JPG, JPEG, PNG, GIF, and WebP files are allowed."}), 400
+    if not allowed_file(filename):
+        raise UploadRejected("Invalid file type. Only JPG, JPEG, PNG, GIF, and WebP files are allowed.", "invalid file type")
 
     # Validate content type
-    if not file.content_type.startswith("image/"):
-        print(f"[UPLOAD] Error: Invalid content type - {file.content_type}")
-        return jsonify({"error": "File must be an image"}), 400
+    if not (content_type or "").startswith("image/"):
+        raise UploadRejected("File must be an image", "invalid content type")
+
+
+def store_upload(upload, chunks):
+    """
+    Stream an upload body through validation and save the image under a
+    unique name. The actual format (from the file's magic bytes, not the
+    client's extension) decides the saved extension.
+
+    Args:
+        upload: ImageUploadStream from begin_upload
+        chunks: Iterable of request body chunks
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    try:
+        for chunk in chunks:
+            upload.feed(chunk)
+        return complete_upload(upload)
+    except UploadRejected as e:
+        return upload_rejected(upload, e)
+    finally:
+        upload.close()
+
+
+def complete_upload(upload):
+    """
+    Finish a fully fed upload and move it into the upload folder.
+    Shared by the Flask and ASGI upload routes.
+
+    Args:
+        upload: ImageUploadStream that has received the whole body
 
-    # Read file to check size
-    file.seek(0, os.SEEK_END)  # Move to end of file
-    file_size = file.tell()  # Get file size
-    file.seek(0)  # Reset to beginning
+    Returns:
+        tuple: (response body dict, HTTP status)
 
-    # Validate file size
-    if file_size > MAX_FILE_SIZE:
-        print(f"[UPLOAD] Error: File too large - {file_size / (1024 * 1024):.2f}MB")
-        return jsonify({"error": f"File too large. Maximum size: {MAX_FILE_SIZE / (1024 * 1024):.1f}MB"}), 400
+    Raises:
+        UploadRejected: If the image is missing, truncated or does not decode
+    """
+    uploaded = upload.finish()
 
     # Generate unique filename with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    original_filename = secure_filename(file.filename)
-    file_extension = original_filename.rsplit(".", 1)[1].lower()
-    unique_filename = f"rash_{timestamp}.{file_extension}"
+    unique_filename = f"rash_{timestamp}.{uploaded['extension']}"
     file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
 
     try:
-        file.save(file_path)
-        cleanup_old_files(UPLOAD_FOLDER, max_age_hours=CLEANUP_MAX_AGE_HOURS, allowed_extensions=ALLOWED_EXTENSIONS)
+        with span("upload.save", size=uploaded["size"], format=uploaded["format"]):
+            os.replace(uploaded["temp_path"], file_path)
+        with span("upload.cleanup"):
+            cleanup_old_files(UPLOAD_FOLDER, max_age_hours=CLEANUP_MAX_AGE_HOURS, allowed_extensions=CLEANUP_EXTENSIONS)
 
-        print(f"[UPLOAD] Success: {unique_filename} ({file_size / 1024:.1f}KB)")
+        # Quality gate and base-view resize now, while the decoded image is at
+        # hand, so /analyze can skip decoding. A failed gate keeps the upload
+        # (without an artifact); /analyze reports the error as before
+        preprocess_start = time.time()
+        quality_error = None
+        if is_model_loaded():
+            try:
+                with span("upload.preprocess"):
+                    quality_error = preprocess_upload(uploaded["image"], file_path)
+            except Exception as e:
+                upload_log.warning("Preprocessing failed", filename=unique_filename, error=str(e))
+
+        upload_log.info(
+            "Saved",
+            filename=unique_filename,
+            size_kb=round(uploaded["size"] / 1024, 1),
+            format=uploaded["format"],
+            width=uploaded["width"],
+            height=uploaded["height"],
+            preprocess_ms=round((time.time() - preprocess_start) * 1000, 1),
+            quality_error=quality_error,
+        )
 
-        return jsonify({
+        return {
             "success": True,
             "message": "Image uploaded successfully",
             "filename": unique_filename,
             "path": file_path,
-        }), 200
+        }, 200
     except Exception as e:
-        print(f"[UPLOAD] Error: Failed to save - {str(e)}")
-        return jsonify({"error": f"Failed to save image: {str(e)}"}), 500
+        upload_log.error("Failed to save", error=str(e))
+        return {"error": f"Failed to save image: {str(e)}"}, 500
+
+
+def upload_rejected(upload, error):
+    """
+    Log a rejected upload and build its error response.
+
+    Args:
+        upload: ImageUploadStream that raised
+        error: The UploadRejected raised
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    upload_log.info(
+        f"Rejected: {error.reason}",
+        filename=upload.filename,
+        image_kb=round(upload.size / 1024, 1),
+        body_kb=round(upload.bytes_received / 1024, 1),
+    )
+    return {"error": error.message}, error.status
 
 
 # Cleanup endpoint - manually trigger file cleanup
@@ -149,183 +433,531 @@ def cleanup_files():
     Deletes files older than CLEANUP_MAX_AGE_HOURS.
     """
     try:
-        cleanup_result = cleanup_old_files(
-            UPLOAD_FOLDER,
-            max_age_hours=CLEANUP_MAX_AGE_HOURS,
-            allowed_extensions=ALLOWED_EXTENSIONS,
-        )
-
-        if cleanup_result["success"]:
-            return (
-                jsonify(
-                    {
-                        "success": True,
-                        "message": f"Cleanup completed. Deleted {cleanup_result['files_deleted']} file(s).",
-                        "files_deleted": cleanup_result["files_deleted"],
-                        "errors": (
-                            cleanup_result["errors"]
-                            if cleanup_result["errors"]
-                            else None
-                        ),
-                    }
-                ),
-                200,
-            )
-        else:
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "message": "Cleanup completed with errors",
-                        "files_deleted": cleanup_result["files_deleted"],
-                        "errors": cleanup_result["errors"],
-                    }
-                ),
-                200,
-            )
+        response_data, status_code = run_cleanup()
+        return jsonify(response_data), status_code
     except Exception as e:
         return jsonify({"error": f"Failed to cleanup files: {str(e)}"}), 500
 
 
+def run_cleanup():
+    """
+    Delete uploaded files older than CLEANUP_MAX_AGE_HOURS.
+    Shared by the Flask and ASGI servers.
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    cleanup_result = cleanup_old_files(
+        UPLOAD_FOLDER,
+        max_age_hours=CLEANUP_MAX_AGE_HOURS,
+        allowed_extensions=CLEANUP_EXTENSIONS,
+    )
+
+    if cleanup_result["success"]:
+        return {
+            "success": True,
+            "message": f"Cleanup completed. Deleted {cleanup_result['files_deleted']} file(s).",
+            "files_deleted": cleanup_result["files_deleted"],
+            "errors": cleanup_result["errors"] if cleanup_result["errors"] else None,
+        }, 200
+
+    return {
+        "success": False,
+        "message": "Cleanup completed with errors",
+        "files_deleted": cleanup_result["files_deleted"],
+        "errors": cleanup_result["errors"],
+    }, 200
+
+
 # Analysis endpoint - classify skin condition using Swin Transformer
 @app.route("/analyze", methods=["POST"])
 def classify_skin_condition():
     """
     Classify skin condition using Swin Transformer model.
     Requires 'image_path' or 'filename' in request body.
+    With "async": true the request is queued and a job ID is returned
+    immediately; poll GET /jobs/<job_id> for the result.
 
     Returns top K predictions with confidence scores and Gemini AI explanation.
     """
     try:
-        # Get image path and user context from request
         data = request.get_json() or {}
-        image_path = data.get("image_path") or data.get("path")
-        filename = data.get("filename")
-        user_context = (
-            data.get("user_context")
-            or data.get("user_description")
-            or data.get("description")
-            or ""
-        )
-        top_k = data.get("top_k", 5)  # Default to top 5 predictions
-
-        # If filename provided, construct full path
-        if filename and not image_path:
-            potential_path = os.path.join(UPLOAD_FOLDER, filename)
-            if os.path.exists(potential_path):
-                image_path = potential_path
-            else:
-                test_images_path = os.path.join("test_images", filename)
-                if os.path.exists(test_images_path):
-                    image_path = test_images_path
-                else:
-                    image_path = potential_path
-
-        # Validate image path
-        if not image_path:
-            print(f"[ANALYZE] Error: No image provided")
-            return jsonify({
-                "success": False,
-                "error": "Please upload an image to analyze. No image was provided.",
-                "predictions": []
-            }), 400
+        params, error = parse_analysis_request(data)
+        if error:
+            return jsonify(error[0]), error[1]
+
+        client_id = client_identity(request.headers, request.remote_addr)
 
-        if not os.path.exists(image_path):
-            print(f"[ANALYZE] Error: Image file not found - {image_path}")
+        if data.get("async"):
+            params["client_id"] = client_id
+            job_id = submit_job(params)
+            if job_id is None:
+                analyze_log.warning("Job queue full or unavailable")
+                return jsonify({
+                    "success": False,
+                    "error": "The server is busy. Please try again shortly.",
+                }), 503
+
+            analyze_log.info("Queued job", job_id=job_id, image=os.path.basename(params["image_path"]))
             return jsonify({
-                "success": False,
-                "error": "The uploaded image could not be found. Please try uploading again.",
-                "predictions": []
-            }), 404
+                "success": True,
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/jobs/{job_id}",
+            }), 202
 
-        import time
-        start_time = time.time()
+        # Interactive analyses wait for capacity up to their deadline, then are shed
+        ticket, rejection = admit("analysis", client_id, request_timeout_seconds(request.headers))
+        if ticket is None:
+            analyze_log.warning("Shed", reason=rejection["error"], retry_after=rejection["retry_after"])
+            return admission_rejected(rejection)
 
-        # Run Swin classification (without TTA for faster inference)
-        print(f"\n[ANALYZE] Processing: {os.path.basename(image_path)}")
-        classification_result = classify_image(image_path, top_k=top_k, use_tta=False)
+        try:
+            response_data, status_code = run_analysis(params, deadline=ticket["deadline"])
+        finally:
+            release(ticket)
+        return jsonify(response_data), status_code
 
-        if not classification_result["success"]:
-            error_msg = classification_result.get("error", "Classification failed")
-            print(f"[ANALYZE] Error: {error_msg}")
-            return jsonify({
-                "success": False,
-                "error": error_msg,
-                "predictions": [],
-            }), 400 if "blurry" in error_msg.lower() or "small" in error_msg.lower() else 500
+    except Exception as e:
+        analyze_log.exception("Classification failed", error=str(e))
+        return jsonify({"error": f"Classification error: {str(e)}"}), 500
 
-        predictions = classification_result["predictions"]
 
-        # If no predictions found, return early with helpful message
-        if not predictions or len(predictions) == 0:
-            print(f"[ANALYZE] Warning: No confident predictions found")
-            return jsonify({
-                "success": False,
-                "error": "Unable to identify the skin condition with confidence. Please ensure the image is clear, well-lit, and focused on the affected area.",
-                "predictions": [],
-                "primary_condition": None,
-                "confidence": None,
-                "ai_explanation": None,
-                "explanation_available": False,
-                "model_loaded": is_model_loaded(),
-                "mock": classification_result.get("mock", False),
-            }), 400
-
-        # Get primary prediction (highest confidence)
-        primary_prediction = predictions[0]
-
-        classification_time = time.time() - start_time
-        print(f"[CLASSIFY] Found {len(predictions)} predictions in {classification_time:.2f}s")
-        for i, pred in enumerate(predictions, 1):
-            print(f"           {i}. {pred.get('condition')} ({pred.get('confidence')}%)")
-
-        # Convert predictions to format compatible with Gemini
-        # (using same structure as YOLO detections for compatibility)
-        gemini_predictions = [
-            {"rash_label": pred["condition"], "confidence": pred["confidence"]}
-            for pred in predictions
-        ]
-
-        # Generate AI explanation using Gemini
-        if user_context and user_context.strip():
-            print(f"[CONTEXT] User description provided ({len(user_context)} chars)")
-
-        gemini_start = time.time()
-        gemini_result = generate_explanation(gemini_predictions, user_context=user_context)
-        gemini_time = time.time() - gemini_start
+def parse_analysis_request(data):
+    """
+    Resolve and validate the image and options of an analysis request.
 
-        if gemini_result["success"]:
-            print(f"[GEMINI] Generated explanation ({len(gemini_result.get('explanation', ''))} chars) in {gemini_time:.2f}s")
-        else:
-            print(f"[GEMINI] Failed: {gemini_result.get('error')}")
+    Args:
+        data: Request JSON body
 
-        total_time = time.time() - start_time
-        print(f"[ANALYZE] Total time: {total_time:.2f}s\n")
+    Returns:
+        tuple: (params dict, None) if valid, or (None, (error body, HTTP status))
+    """
+    # Get image path and user context from request
+    image_path = data.get("image_path") or data.get("path")
+    filename = data.get("filename")
+    user_context = (
+        data.get("user_context")
+        or data.get("user_description")
+        or data.get("description")
+        or ""
+    )
+    top_k = data.get("top_k", 5)  # Default to top 5 predictions
+    tile_pooling = data.get("tile_pooling", TILE_POOLING)
+    quality = data.get("quality", ANALYZE_QUALITY)
 
-        # Combine Swin classification results with Gemini explanation
-        response_data = {
-            "success": True,
-            "predictions": predictions,
-            "primary_condition": primary_prediction["condition"],
-            "confidence": primary_prediction["confidence"],
-            "ai_explanation": (
-                gemini_result.get("explanation") if gemini_result["success"] else None
-            ),
-            "explanation_available": gemini_result["success"],
-            "explanation_error": (
-                gemini_result.get("error") if not gemini_result["success"] else None
-            ),
+    # If filename provided, construct full path
+    if filename and not image_path:
+        image_path = resolve_image_filename(filename)
+
+    capture_image(image_path)
+
+    # Validate image path
+    if not image_path:
+        analyze_log.info("Rejected: no image provided")
+        return None, ({
+            "success": False,
+            "error": "Please upload an image to analyze. No image was provided.",
+            "predictions": []
+        }, 400)
+
+    if not os.path.exists(image_path):
+        analyze_log.info("Rejected: image file not found", image_path=image_path)
+        return None, ({
+            "success": False,
+            "error": "The uploaded image could not be found. Please try uploading again.",
+            "predictions": []
+        }, 404)
+
+    if tile_pooling not in TILE_POOLING_METHODS:
+        analyze_log.info("Rejected: unknown tile pooling", tile_pooling=tile_pooling)
+        return None, ({
+            "success": False,
+            "error": f"tile_pooling must be one of: {', '.join(TILE_POOLING_METHODS)}",
+            "predictions": []
+        }, 400)
+
+    if quality not in QUALITY_INPUT_SIZES:
+        analyze_log.info("Rejected: unknown quality", quality=quality)
+        return None, ({
+            "success": False,
+            "error": f"quality must be one of: {', '.join(QUALITY_INPUT_SIZES)}",
+            "predictions": []
+        }, 400)
+
+    # Further shots of the same lesion, given by uploaded filename
+    burst = data.get("burst") or []
+    if not isinstance(burst, list) or not all(isinstance(name, str) and name for name in burst):
+        analyze_log.info("Rejected: malformed burst")
+        return None, ({
+            "success": False,
+            "error": "burst must be a list of uploaded filenames",
+            "predictions": []
+        }, 400)
+    if len(burst) + 1 > MAX_BURST_IMAGES:
+        analyze_log.info("Rejected: burst too large", images=len(burst) + 1)
+        return None, ({
+            "success": False,
+            "error": f"A burst may have at most {MAX_BURST_IMAGES} images",
+            "predictions": []
+        }, 400)
+    burst_paths = [resolve_image_filename(os.path.basename(name)) for name in burst]
+    missing = [path for path in burst_paths if not os.path.exists(path)]
+    if missing:
+        analyze_log.info("Rejected: burst image not found", image_path=missing[0])
+        return None, ({
+            "success": False,
+            "error": "An image of the burst could not be found. Please try uploading again.",
+            "predictions": []
+        }, 404)
+
+    return {
+        "image_path": image_path,
+        "user_context": user_context,
+        "top_k": top_k,
+        "include_embedding": bool(data.get("include_embedding")),
+        "include_saliency": bool(data.get("include_saliency")),
+        "tiled": bool(data.get("tiled")),
+        "tile_pooling": tile_pooling,
+        "burst_paths": burst_paths,
+        "quality": quality,
+    }, None
+
+
+def resolve_image_filename(filename):
+    """
+    Find an image given by filename: an upload, else a bundled test image.
+
+    Args:
+        filename: Name of the image file
+
+    Returns:
+        str: Path of the image (in UPLOAD_FOLDER if it exists nowhere)
+    """
+    potential_path = os.path.join(UPLOAD_FOLDER, filename)
+    if os.path.exists(potential_path):
+        return potential_path
+    test_images_path = os.path.join("test_images", filename)
+    if os.path.exists(test_images_path):
+        return test_images_path
+    return potential_path
+
+
+def client_identity(headers, remote_addr):
+    """
+    Identify the client for fair queuing: API key if sent, else client IP.
+
+    Args:
+        headers: Request headers
+        remote_addr: Client address
+
+    Returns:
+        str: Client identity
+    """
+    api_key = headers.get("X-API-Key")
+    if api_key:
+        return f"key:{api_key}"
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+def request_timeout_seconds(headers):
+    """
+    Read the caller's remaining time budget from the X-Request-Timeout header.
+
+    Args:
+        headers: Request headers
+
+    Returns:
+        float: Seconds the caller will wait, or None if not given or not a positive, finite number
+    """
+    try:
+        timeout = float(headers["X-Request-Timeout"])
+    except (KeyError, ValueError):
+        return None
+    if not math.isfinite(timeout) or timeout <= 0:
+        return None
+    return timeout
+
+
+def admission_rejected(rejection):
+    """
+    Build the 503 response for a shed request.
+
+    Args:
+        rejection: Rejection returned by admit
+
+    Returns:
+        tuple: (Flask response with Retry-After, 503)
+    """
+    response = jsonify({
+        "success": False,
+        "error": rejection["error"],
+        "retry_after": rejection["retry_after"],
+    })
+    response.headers["Retry-After"] = str(rejection["retry_after"])
+    return response, 503
+
+
+def run_batch_analysis(params):
+    """
+    Run an async analysis job in the low-priority batch class, so queued
+    jobs only take capacity interactive requests are not waiting for.
+
+    Args:
+        params: Parameters returned by parse_analysis_request, plus 'client_id'
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    ticket, rejection = admit("batch", params.get("client_id"))
+    if ticket is None:
+        return {"success": False, "error": rejection["error"], "retry_after": rejection["retry_after"]}, 503
+
+    try:
+        return run_analysis(params, deadline=ticket["deadline"])
+    finally:
+        release(ticket)
+
+
+def run_analysis(params, deadline=None):
+    """
+    Run classification and Gemini explanation for a validated request.
+    Used both inline by /analyze and by the async job workers.
+
+    Args:
+        params: Parameters returned by parse_analysis_request
+        deadline: Absolute time by which the response is needed (bounds the Gemini call)
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    start_time = time.time()
+
+    classification_result, error = classify_for_analysis(params)
+    if error:
+        return error
+
+    gemini_start = time.time()
+    gemini_result = generate_explanation(
+        explanation_detections(classification_result),
+        user_context=params["user_context"],
+        deadline=deadline,
+    )
+    log_explanation_result(gemini_result, time.time() - gemini_start)
+    log_analysis_timings(start_time, gemini_start)
+
+    return build_analysis_response(classification_result, gemini_result)
+
+
+def classify_for_analysis(params):
+    """
+    Run the CPU-bound classification step of an analysis.
+
+    Args:
+        params: Parameters returned by parse_analysis_request
+
+    Returns:
+        tuple: (classification result, None) on success, or (None, (error body, HTTP status))
+    """
+    image_path = params["image_path"]
+    top_k = params["top_k"]
+    start_time = time.time()
+
+    # Run Swin classification (adaptive TTA only augments uncertain predictions)
+    analyze_log.debug("Processing", image=os.path.basename(image_path))
+    with span("classify", tta=str(ANALYZE_TTA_MODE), tiled=params.get("tiled", False),
+              quality=params.get("quality", ANALYZE_QUALITY)) as classify_span:
+        classification_result = classify_image(
+            image_path,
+            top_k=top_k,
+            use_tta=ANALYZE_TTA_MODE,
+            return_embedding=params.get("include_embedding", False),
+            tiled=params.get("tiled", False),
+            tile_pooling=params.get("tile_pooling", TILE_POOLING),
+            return_saliency=params.get("include_saliency", False),
+            burst_paths=params.get("burst_paths"),
+            quality=params.get("quality", ANALYZE_QUALITY),
+        )
+        if classify_span is not None:
+            classify_span.set(
+                stage=classification_result.get("stage", "mock"),
+                cached=classification_result.get("cached", False),
+                tta_views=classification_result.get("tta_views", 0),
+            )
+
+    if not classification_result["success"]:
+        error_msg = classification_result.get("error", "Classification failed")
+        analyze_log.warning("Classification failed", error=error_msg)
+        return None, ({
+            "success": False,
+            "error": error_msg,
+            "predictions": [],
+        }, 400 if "blurry" in error_msg.lower() or "small" in error_msg.lower() else 500)
+
+    predictions = classification_result["predictions"]
+
+    # If no predictions found, return early with helpful message
+    if not predictions or len(predictions) == 0:
+        analyze_log.info("No confident predictions found")
+        return None, ({
+            "success": False,
+            "error": "Unable to identify the skin condition with confidence. Please ensure the image is clear, well-lit, and focused on the affected area.",
+            "predictions": [],
+            "primary_condition": None,
+            "confidence": None,
+            "ai_explanation": None,
+            "explanation_available": False,
             "model_loaded": is_model_loaded(),
             "mock": classification_result.get("mock", False),
-        }
+        }, 400)
 
-        return jsonify(response_data), 200
+    classification_time = time.time() - start_time
+    analyze_log.info(
+        "Classified",
+        image=os.path.basename(image_path),
+        predictions=len(predictions),
+        top=predictions[0].get("condition"),
+        confidence=predictions[0].get("confidence"),
+        classify_s=round(classification_time, 3),
+        stage=classification_result.get("stage", "mock"),
+        cached=classification_result.get("cached", False),
+        tta_views=classification_result.get("tta_views", 0),
+        quality=classification_result.get("quality"),
+        context_chars=len((params["user_context"] or "").strip()),
+    )
+    for i, pred in enumerate(predictions, 1):
+        analyze_log.debug("Prediction", rank=i, condition=pred.get("condition"), confidence=pred.get("confidence"))
 
-    except Exception as e:
-        import traceback
-        print(f"\n[ERROR] Classification failed: {str(e)}")
-        print(traceback.format_exc())
-        return jsonify({"error": f"Classification error: {str(e)}"}), 500
+    return classification_result, None
+
+
+def explanation_detections(classification_result):
+    """
+    Convert predictions to format compatible with Gemini
+    (using same structure as YOLO detections for compatibility).
+
+    Args:
+        classification_result: Successful result of classify_image
+
+    Returns:
+        list: Detection dictionaries with 'rash_label' and 'confidence'
+    """
+    return [
+        {"rash_label": pred["condition"], "confidence": pred["confidence"]}
+        for pred in classification_result["predictions"]
+    ]
+
+
+def log_explanation_result(gemini_result, gemini_time):
+    """
+    Log the outcome of the explanation step.
+
+    Args:
+        gemini_result: Result of generate_explanation
+        gemini_time: Seconds spent generating the explanation
+    """
+    if gemini_result["success"]:
+        analyze_log.info(
+            "Explanation generated",
+            chars=len(gemini_result.get("explanation") or ""),
+            explanation_s=round(gemini_time, 3),
+            source=gemini_result.get("source"),
+            cached=gemini_result.get("cached", False),
+        )
+    else:
+        analyze_log.warning("Explanation failed", error=gemini_result.get("error"), explanation_s=round(gemini_time, 3))
+
+
+def log_analysis_timings(start_time, explanation_start):
+    """
+    Log the stage timings of a finished analysis.
+
+    Args:
+        start_time: When the analysis started
+        explanation_start: When the explanation step started
+    """
+    now = time.time()
+    record_stage("classify", explanation_start - start_time)
+    record_stage("explanation", now - explanation_start)
+    analyze_log.info(
+        "Analysis complete",
+        classify_s=round(explanation_start - start_time, 3),
+        explanation_s=round(now - explanation_start, 3),
+        total_s=round(now - start_time, 3),
+    )
+
+
+def build_analysis_response(classification_result, gemini_result):
+    """
+    Combine Swin classification results with Gemini explanation.
+
+    Args:
+        classification_result: Successful result of classify_image
+        gemini_result: Result of generate_explanation
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    predictions = classification_result["predictions"]
+
+    # Get primary prediction (highest confidence)
+    primary_prediction = predictions[0]
+
+    response_data = {
+        "success": True,
+        "predictions": predictions,
+        "primary_condition": primary_prediction["condition"],
+        "confidence": primary_prediction["confidence"],
+        "ai_explanation": (
+            gemini_result.get("explanation") if gemini_result["success"] else None
+        ),
+        "explanation_available": gemini_result["success"],
+        "explanation_error": (
+            gemini_result.get("error") if not gemini_result["success"] else None
+        ),
+        "explanation_source": gemini_result.get("source"),
+        "model_loaded": is_model_loaded(),
+        "mock": classification_result.get("mock", False),
+        "inference_stage": classification_result.get("stage"),
+        "tta_views": classification_result.get("tta_views"),
+        "quality": classification_result.get("quality"),
+    }
+    if "embedding" in classification_result:
+        response_data["embedding"] = classification_result["embedding"]
+    if "tiles" in classification_result:
+        response_data["tiles"] = classification_result["tiles"]
+    if "frames" in classification_result:
+        response_data["frames"] = classification_result["frames"]
+    if "saliency" in classification_result:
+        response_data["saliency"] = classification_result["saliency"]
+
+    # Seed a server-side chat session so follow-ups only send new messages
+    response_data["chat_session_id"] = create_chat_session(analysis_context={
+        "condition": response_data["primary_condition"],
+        "confidence": response_data["confidence"],
+        "explanation": response_data["ai_explanation"] or "",
+    })
+
+    return response_data, 200
+
+
+# Job status endpoint - poll or long-poll an async analysis
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Get the status and result of an async analysis job.
+    Optional 'wait' query parameter (seconds) long-polls until the job finishes.
+    """
+    try:
+        wait_seconds = float(request.args.get("wait", 0))
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+
+    job = get_job(job_id, wait_seconds=wait_seconds)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    return jsonify(job), 200
 
 
 # Follow-up chat endpoint - continue conversation with Gemini
@@ -333,46 +965,153 @@ def classify_skin_condition():
 def chat_followup():
     """
     Handle follow-up questions about an analysis using Gemini API.
-    Maintains conversation context.
+    Conversation context is kept server-side: send 'session_id' (returned by
+    /analyze as 'chat_session_id') with just the new 'message'. Requests
+    without a session_id may still send 'conversation_history' and
+    'analysis_context'; a session is created from them and returned.
     """
     try:
         data = request.get_json() or {}
         user_message = data.get("message", "")
-        conversation_history = data.get("conversation_history", [])
-        analysis_context = data.get("analysis_context", {})
+        session_id = data.get("session_id")
 
         if not user_message:
             return jsonify({"error": "No message provided"}), 400
 
-        print(f"\n[CHAT] User: {user_message[:100]}{'...' if len(user_message) > 100 else ''}")
+        if session_id:
+            if get_chat_session(session_id) is None:
+                return jsonify({"success": False, "error": "Chat session not found or expired"}), 404
+        else:
+            session_id = create_chat_session(
+                analysis_context=data.get("analysis_context", {}),
+                conversation_history=data.get("conversation_history", []),
+            )
+
+        chat_log.debug("User message", session_id=session_id, preview=user_message[:100])
 
-        # Call Gemini API with conversation context
-        gemini_result = generate_chat_response(
-            user_message=user_message,
-            conversation_history=conversation_history,
-            analysis_context=analysis_context
+        ticket, rejection = admit(
+            "chat", client_identity(request.headers, request.remote_addr), request_timeout_seconds(request.headers)
         )
+        if ticket is None:
+            chat_log.warning("Shed", reason=rejection["error"], retry_after=rejection["retry_after"])
+            return admission_rejected(rejection)
+
+        # Call Gemini API with the session's compacted context
+        try:
+            gemini_result = generate_session_reply(session_id, user_message)
+        finally:
+            release(ticket)
 
         if gemini_result["success"]:
-            print(f"[CHAT] Response generated ({len(gemini_result.get('explanation', ''))} chars)\n")
+            chat_log.info(
+                "Response generated",
+                chars=len(gemini_result.get("explanation") or ""),
+                prompt_tokens=gemini_result["prompt_tokens"],
+            )
             return jsonify({
                 "success": True,
                 "response": gemini_result.get("explanation"),
+                "session_id": session_id,
             }), 200
         else:
-            print(f"[CHAT] Failed: {gemini_result.get('error')}\n")
+            chat_log.warning("Response failed", error=gemini_result.get("error"))
             return jsonify({
                 "success": False,
                 "error": gemini_result.get("error", "Failed to generate response")
             }), 500
 
     except Exception as e:
-        import traceback
-        print(f"\n[ERROR] Chat failed: {str(e)}")
-        print(traceback.format_exc())
+        chat_log.exception("Chat failed", error=str(e))
         return jsonify({"error": f"Chat error: {str(e)}"}), 500
 
 
+# Similar cases endpoint - nearest reference images by Swin embedding
+@app.route("/similar", methods=["POST"])
+def similar_cases():
+    """
+    Find the reference cases that look most like an uploaded image.
+    Requires 'image_path' or 'filename' in request body; optional 'k'
+    (number of cases, default SIMILAR_CASES_DEFAULT_K).
+    """
+    try:
+        data = request.get_json() or {}
+        params, error = parse_analysis_request(data)
+        if error:
+            return jsonify(error[0]), error[1]
+
+        ticket, rejection = admit(
+            "analysis", client_identity(request.headers, request.remote_addr), request_timeout_seconds(request.headers)
+        )
+        if ticket is None:
+            similar_log.warning("Shed", reason=rejection["error"], retry_after=rejection["retry_after"])
+            return admission_rejected(rejection)
+
+        try:
+            response_data, status_code = find_similar_cases(params["image_path"], data.get("k", SIMILAR_CASES_DEFAULT_K))
+        finally:
+            release(ticket)
+        return jsonify(response_data), status_code
+
+    except Exception as e:
+        similar_log.exception("Similar-case search failed", error=str(e))
+        return jsonify({"error": f"Similar-case search error: {str(e)}"}), 500
+
+
+def find_similar_cases(image_path, k):
+    """
+    Embed an image and search the reference case index.
+    Shared by the Flask and ASGI servers.
+
+    Args:
+        image_path: Path to the query image
+        k: Number of cases requested
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    from PIL import Image
+
+    if not is_similarity_index_loaded():
+        return {"success": False, "error": "Similar-case search is not available", "cases": []}, 503
+
+    try:
+        k = max(1, min(int(k), SIMILAR_CASES_MAX_K))
+    except (TypeError, ValueError):
+        return {"success": False, "error": "k must be a number", "cases": []}, 400
+
+    try:
+        image = Image.open(image_path).convert("RGB")
+    except Exception:
+        return {
+            "success": False,
+            "error": "Unable to read the image file. Please ensure it's a valid image format (JPG, PNG, GIF, or WebP).",
+            "cases": [],
+        }, 400
+
+    embed_start = time.time()
+    embeddings = extract_embeddings([image])
+    if embeddings is None:
+        return {"success": False, "error": "Model not loaded - similar-case search unavailable", "cases": []}, 503
+
+    search_start = time.time()
+    cases = search_similar_cases(embeddings[0], k=k)
+    search_ms = (time.time() - search_start) * 1000
+
+    similar_log.info(
+        "Search complete",
+        image=os.path.basename(image_path),
+        cases=len(cases),
+        embed_s=round(search_start - embed_start, 3),
+        search_ms=round(search_ms, 2),
+    )
+
+    return {
+        "success": True,
+        "cases": cases,
+        "search_ms": round(search_ms, 2),
+    }, 200
+
+
 # Model info endpoint
 @app.route("/model/info", methods=["GET"])
 def model_info():
@@ -380,11 +1119,82 @@ def model_info():
     Get information about the loaded Swin Transformer model.
     """
     info = get_model_info()
+    info["similar_cases"] = get_similarity_index_info()
     return jsonify(info), 200
 
 
+# Model reload endpoint - hot-swap the checkpoint without restarting
+@app.route("/model/reload", methods=["POST"])
+def model_reload():
+    """
+    Load and warm a checkpoint in the background, then swap it in atomically.
+    Optional 'model_path' in request body (must be inside the models directory).
+    Poll /model/info for the reload status and the active version.
+    """
+    data = request.get_json(silent=True) or {}
+    response_data, status_code = request_model_reload(data, request.headers, request.remote_addr)
+    return jsonify(response_data), status_code
+
+
+def request_model_reload(data, headers, remote_addr):
+    """
+    Validate a reload request and start the background reload.
+    Shared by the Flask and ASGI servers.
+
+    Args:
+        data: Request body (optional 'model_path')
+        headers: Request headers (Authorization when MODEL_RELOAD_TOKEN is set)
+        remote_addr: Client address
+
+    Returns:
+        tuple: (response body dict, HTTP status)
+    """
+    if not reload_authorized(headers, remote_addr):
+        log.warning("Model reload refused", client=remote_addr)
+        return {"success": False, "error": "Not authorized to reload the model"}, 403
+
+    model_path = data.get("model_path") or MODEL_PATH
+
+    # Checkpoints are unpickled on load, so only allow files in the models directory
+    models_dir = os.path.abspath(os.path.dirname(MODEL_PATH))
+    if os.path.dirname(os.path.abspath(model_path)) != models_dir:
+        return {"success": False, "error": "model_path must be inside the models directory"}, 400
+
+    result = reload_swin_model(model_path)
+    log.info("Model reload requested", model_path=model_path, result=result["message"])
+
+    return result, 202 if result["success"] else 409
+
+
+def reload_authorized(headers, remote_addr):
+    """
+    Check whether a client may trigger a model reload: with MODEL_RELOAD_TOKEN
+    set it must send "Authorization: Bearer <token>", otherwise it must
+    connect from the loopback interface.
+
+    Args:
+        headers: Request headers
+        remote_addr: Client address
+
+    Returns:
+        bool: True if the reload is allowed
+    """
+    if MODEL_RELOAD_TOKEN:
+        return hmac.compare_digest(headers.get("Authorization", ""), f"Bearer {MODEL_RELOAD_TOKEN}")
+    try:
+        return ipaddress.ip_address(remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+# Start async analysis workers (run_batch_analysis is defined above)
+log.info("Analysis job queue initialization")
+job_queue_loaded = init_job_queue(JOB_DB_PATH, run_batch_analysis)
+
+
 # Main entry point - runs the Flask development server
 if __name__ == "__main__":
     # Run on localhost, port 5000
-    # debug=True enables auto-reload on code changes (useful for development)
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # debug=True enables the interactive debugger; the auto-reloader stays off because it
+    # would start a second copy of the inference workers, job queue and background threads
+    app.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,558 @@
+"""
+Production ASGI server for the backend.
+
+Serves the same routes and response contracts as app.py on an event loop:
+Gemini calls and upload handling are awaited on the loop, while CPU-bound
+classification runs on a bounded thread pool. app.py stays the development
+server and the source of the shared request handling.
+
+Run from the backend directory:
+    python asgi.py
+or
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --timeout-keep-alive 15
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Importing the Flask app loads the models and starts the job queue
+import app as flask_backend
+from services.swin_service import get_model_info
+from services.gemini_service import generate_explanation_async, preconnect_gemini_async, get_gemini_info
+from services.chat_session_service import (
+    create_chat_session,
+    get_chat_session,
+    generate_session_reply_async,
+)
+from services.job_service import submit_job, get_job, JOB_MAX_WAIT_SECONDS
+from services.admission_control import admit_async, release, get_admission_stats
+from services.similarity_index import get_similarity_index_info
+from services.storage_backend import get_storage_info
+from utils.structured_logging import get_logger, new_request_id, get_logging_stats
+from utils.upload_stream import UploadRejected
+from services.traffic_capture import (
+    CAPTURED_ENDPOINTS,
+    is_capture_enabled,
+    begin_capture,
+    finish_capture,
+    end_capture,
+    get_capture_stats,
+)
+from services.tracing import start_trace, finish_trace, get_tracing_stats
+
+# Server configuration
+HOST = "0.0.0.0"
+PORT = 5000
+INFERENCE_WORKERS = 2  # Threads running classify_image concurrently
+INFERENCE_MAX_PENDING = 32  # Classifications waiting for a worker before requests queue on the loop
+KEEPALIVE_SECONDS = 15  # Idle keep-alive connection timeout
+GRACEFUL_SHUTDOWN_SECONDS = 30  # Time allowed for in-flight requests on shutdown
+MAX_CONCURRENT_CONNECTIONS = 4096  # Connections beyond this get 503 from uvicorn
+JOB_POLL_INTERVAL_SECONDS = 0.25  # Long-poll check interval for /jobs
+
+# Loggers (categories shared with app.py)
+log = get_logger("asgi")
+http_log = get_logger("http")
+upload_log = get_logger("upload")
+analyze_log = get_logger("analyze")
+chat_log = get_logger("chat")
+similar_log = get_logger("similar")
+
+# Bounded pool for CPU-bound inference (created in lifespan)
+_inference_executor = None
+_inference_slots = None
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    """
+    Create the inference pool and connect to Gemini on startup, and drain
+    the pool on shutdown.
+    """
+    global _inference_executor, _inference_slots
+
+    _inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    _inference_slots = asyncio.Semaphore(INFERENCE_MAX_PENDING)
+    log.info("Inference threads ready", workers=INFERENCE_WORKERS)
+
+    # Async Gemini channels belong to this event loop, so they are opened here
+    # (in the background, so an unreachable API does not hold up startup)
+    gemini_preconnect = asyncio.create_task(preconnect_gemini_async())
+
+    yield
+
+    gemini_preconnect.cancel()
+
+    log.info("Shutting down - waiting for in-flight inference")
+    _inference_executor.shutdown(wait=True)
+
+
+class RequestLogMiddleware:
+    """
+    Attach a request ID to log records for the request (and the threads it
+    hands work to), return it in X-Request-ID and log the handled request.
+    Traced requests get their root span here and return the trace ID in
+    X-Trace-ID.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = new_request_id(headers.get(b"x-request-id", b"").decode("latin-1"))
+        start_time = time.time()
+        trace = start_trace(
+            f"{scope['method']} {scope['path']}",
+            headers.get(b"traceparent", b"").decode("latin-1"),
+            **{"http.request.method": scope["method"], "url.path": scope["path"], "request_id": request_id},
+        )
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+                if trace is not None:
+                    message["headers"].append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+                    trace.set(**{"http.response.status_code": message["status"]})
+                http_log.info(
+                    "Request handled",
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=message["status"],
+                    duration_ms=round((time.time() - start_time) * 1000, 1),
+                )
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            finish_trace(trace, error=error)
+
+
+class TrafficCaptureMiddleware:
+    """
+    Record /analyze and /chat requests when traffic capture is enabled
+    (see services/traffic_capture.py). Request and response bodies of
+    captured endpoints are kept alongside the request for the record.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not is_capture_enabled() or scope["path"] not in CAPTURED_ENDPOINTS:
+            await self.app(scope, receive, send)
+            return
+
+        request_body = bytearray()
+        response_body = bytearray()
+        status = 500
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def send_and_keep(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.extend(message.get("body", b""))
+            await send(message)
+
+        begin_capture(scope["path"])
+        try:
+            await self.app(scope, receive_and_keep, send_and_keep)
+        finally:
+            finish_capture(status, _parse_json(request_body), _parse_json(response_body))
+            end_capture()
+
+
+def _parse_json(body):
+    """
+    Parse a captured JSON body, or None if it is not JSON.
+    """
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+async def run_inference(func, *args):
+    """
+    Run a CPU-bound function on the bounded inference pool.
+
+    Args:
+        func: Function to run
+        *args: Positional arguments
+
+    Returns:
+        The function's return value
+    """
+    async with _inference_slots:
+        loop = asyncio.get_running_loop()
+        # Carry the request ID into the worker thread's log records
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_inference_executor, context.run, func, *args)
+
+
+async def read_json(request):
+    """
+    Parse a JSON request body, treating an empty or invalid body as {}.
+
+    Args:
+        request: Starlette request
+
+    Returns:
+        dict: Parsed body
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def client_address(request):
+    """
+    Get the client IP of a request.
+
+    Args:
+        request: Starlette request
+
+    Returns:
+        str: Client host, or None if unknown
+    """
+    return request.client.host if request.client else None
+
+
+def admission_rejected(rejection):
+    """
+    Build the 503 response for a shed request.
+
+    Args:
+        rejection: Rejection returned by admit_async
+
+    Returns:
+        JSONResponse: 503 with Retry-After
+    """
+    return JSONResponse(
+        {"success": False, "error": rejection["error"], "retry_after": rejection["retry_after"]},
+        status_code=503,
+        headers={"Retry-After": str(rejection["retry_after"])},
+    )
+
+
+async def health_check(request):
+    """
+    Simple health check endpoint to verify the server is running.
+    """
+    return JSONResponse({
+        "status": "ok",
+        "message": "Backend is running",
+        "admission": get_admission_stats(),
+        "storage": get_storage_info(),
+        "logging": get_logging_stats(),
+        "capture": get_capture_stats(),
+        "tracing": get_tracing_stats(),
+        "gemini": get_gemini_info(),
+    }, status_code=200)
+
+
+async def upload_image(request):
+    """
+    Handle image upload from frontend.
+    The multipart body is received on the event loop and validated chunk by
+    chunk in the thread pool, so bad uploads are rejected before the rest
+    of the body is read or anything is stored.
+    """
+    content_length = request.headers.get("content-length")
+    upload, error = flask_backend.begin_upload(
+        request.headers.get("content-type"),
+        int(content_length) if content_length and content_length.isdigit() else None,
+    )
+    if error:
+        return JSONResponse(error[0], status_code=error[1])
+
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(upload.feed, chunk)
+        response_data, status_code = await run_in_threadpool(flask_backend.complete_upload, upload)
+    except UploadRejected as e:
+        response_data, status_code = flask_backend.upload_rejected(upload, e)
+    finally:
+        await run_in_threadpool(upload.close)
+    return JSONResponse(response_data, status_code=status_code)
+
+
+async def classify_skin_condition(request):
+    """
+    Classify skin condition using Swin Transformer model.
+    Classification runs on the inference pool; the Gemini explanation is
+    awaited on the event loop. File hashing, job and chat session storage
+    run in the thread pool, so a slow storage backend never blocks the loop.
+    """
+    try:
+        data = await read_json(request)
+        params, error = await run_in_threadpool(flask_backend.parse_analysis_request, data)
+        if error:
+            return JSONResponse(error[0], status_code=error[1])
+
+        client_id = flask_backend.client_identity(request.headers, client_address(request))
+
+        if data.get("async"):
+            params["client_id"] = client_id
+            job_id = await run_in_threadpool(submit_job, params)
+            if job_id is None:
+                analyze_log.warning("Job queue full or unavailable")
+                return JSONResponse({
+                    "success": False,
+                    "error": "The server is busy. Please try again shortly.",
+                }, status_code=503)
+
+            analyze_log.info("Queued job", job_id=job_id, image=os.path.basename(params["image_path"]))
+            return JSONResponse({
+                "success": True,
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/jobs/{job_id}",
+            }, status_code=202)
+
+        ticket, rejection = await admit_async(
+            "analysis", client_id, flask_backend.request_timeout_seconds(request.headers)
+        )
+        if ticket is None:
+            analyze_log.warning("Shed", reason=rejection["error"], retry_after=rejection["retry_after"])
+            return admission_rejected(rejection)
+
+        try:
+            start_time = time.time()
+            classification_result, error = await run_inference(flask_backend.classify_for_analysis, params)
+            if error:
+                return JSONResponse(error[0], status_code=error[1])
+
+            gemini_start = time.time()
+            gemini_result = await generate_explanation_async(
+                flask_backend.explanation_detections(classification_result),
+                user_context=params["user_context"],
+                deadline=ticket["deadline"],
+            )
+            flask_backend.log_explanation_result(gemini_result, time.time() - gemini_start)
+            flask_backend.log_analysis_timings(start_time, gemini_start)
+        finally:
+            release(ticket)
+
+        response_data, status_code = await run_in_threadpool(
+            flask_backend.build_analysis_response, classification_result, gemini_result
+        )
+        return JSONResponse(response_data, status_code=status_code)
+
+    except Exception as e:
+        analyze_log.exception("Classification failed", error=str(e))
+        return JSONResponse({"error": f"Classification error: {str(e)}"}, status_code=500)
+
+
+async def job_status(request):
+    """
+    Get the status and result of an async analysis job.
+    Long-polls without holding a thread while the job is unfinished.
+    """
+    job_id = request.path_params["job_id"]
+    try:
+        wait_seconds = min(float(request.query_params.get("wait", 0)), JOB_MAX_WAIT_SECONDS)
+    except ValueError:
+        return JSONResponse({"error": "wait must be a number of seconds"}, status_code=400)
+
+    deadline = time.time() + wait_seconds
+    while True:
+        job = await run_in_threadpool(get_job, job_id)
+        if job is None:
+            return JSONResponse({"error": "Job not found or expired"}, status_code=404)
+        if job["status"] in ("done", "failed") or time.time() >= deadline:
+            return JSONResponse(job, status_code=200)
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+
+
+async def chat_followup(request):
+    """
+    Handle follow-up questions about an analysis using Gemini API.
+    Same contract as the Flask /chat route; the Gemini call is awaited.
+    """
+    try:
+        data = await read_json(request)
+        user_message = data.get("message", "")
+        session_id = data.get("session_id")
+
+        if not user_message:
+            return JSONResponse({"error": "No message provided"}, status_code=400)
+
+        if session_id:
+            if await run_in_threadpool(get_chat_session, session_id) is None:
+                return JSONResponse({"success": False, "error": "Chat session not found or expired"}, status_code=404)
+        else:
+            session_id = await run_in_threadpool(
+                create_chat_session,
+                analysis_context=data.get("analysis_context", {}),
+                conversation_history=data.get("conversation_history", []),
+            )
+
+        chat_log.debug("User message", session_id=session_id, preview=user_message[:100])
+
+        ticket, rejection = await admit_async(
+            "chat",
+            flask_backend.client_identity(request.headers, client_address(request)),
+            flask_backend.request_timeout_seconds(request.headers),
+        )
+        if ticket is None:
+            chat_log.warning("Shed", reason=rejection["error"], retry_after=rejection["retry_after"])
+            return admission_rejected(rejection)
+
+        try:
+            gemini_result = await generate_session_reply_async(session_id, user_message)
+        finally:
+            release(ticket)
+
+        if gemini_result["success"]:
+            chat_log.info(
+                "Response generated",
+                chars=len(gemini_result.get("explanation") or ""),
+                prompt_tokens=gemini_result["prompt_tokens"],
+            )
+            return JSONResponse({
+                "success": True,
+                "response": gemini_result.get("explanation"),
+                "session_id": session_id,
+            }, status_code=200)
+        else:
+            chat_log.warning("Response failed", error=gemini_result.get("error"))
+            return JSONResponse({
+                "success": False,
+                "error": gemini_result.get("error", "Failed to generate response")
+            }, status_code=500)
+
+    except Exception as e:
+        chat_log.exception("Chat failed", error=str(e))
+        return JSONResponse({"error": f"Chat error: {str(e)}"}, status_code=500)
+
+
+async def similar_cases(request):
+    """
+    Find the reference cases that look most like an uploaded image.
+    Embedding runs on the inference pool; the index search is in-memory.
+    """
+    try:
+        data = await read_json(request)
+        params, error = await run_in_threadpool(flask_backend.parse_analysis_request, data)
+        if error:
+            return JSONResponse(error[0], status_code=error[1])
+
+        ticket, rejection = await admit_async(
+            "analysis",
+            flask_backend.client_identity(request.headers, client_address(request)),
+            flask_backend.request_timeout_seconds(request.headers),
+        )
+        if ticket is None:
+            similar_log.warning("Shed", reason=rejection["error"], retry_after=rejection["retry_after"])
+            return admission_rejected(rejection)
+
+        try:
+            response_data, status_code = await run_inference(
+                flask_backend.find_similar_cases,
+                params["image_path"],
+                data.get("k", flask_backend.SIMILAR_CASES_DEFAULT_K),
+            )
+        finally:
+            release(ticket)
+        return JSONResponse(response_data, status_code=status_code)
+
+    except Exception as e:
+        similar_log.exception("Similar-case search failed", error=str(e))
+        return JSONResponse({"error": f"Similar-case search error: {str(e)}"}, status_code=500)
+
+
+async def model_info(request):
+    """
+    Get information about the loaded Swin Transformer model.
+    """
+    info = get_model_info()
+    info["similar_cases"] = get_similarity_index_info()
+    return JSONResponse(info, status_code=200)
+
+
+async def cleanup_files(request):
+    """
+    Manually trigger cleanup of old uploaded files.
+    """
+    try:
+        response_data, status_code = await run_in_threadpool(flask_backend.run_cleanup)
+        return JSONResponse(response_data, status_code=status_code)
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to cleanup files: {str(e)}"}, status_code=500)
+
+
+async def model_reload(request):
+    """
+    Load and warm a checkpoint in the background, then swap it in atomically.
+    """
+    data = await read_json(request)
+    response_data, status_code = flask_backend.request_model_reload(data, request.headers, client_address(request))
+    return JSONResponse(response_data, status_code=status_code)
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health_check, methods=["GET"]),
+        Route("/upload", upload_image, methods=["POST"]),
+        Route("/analyze", classify_skin_condition, methods=["POST"]),
+        Route("/jobs/{job_id}", job_status, methods=["GET"]),
+        Route("/chat", chat_followup, methods=["POST"]),
+        Route("/similar", similar_cases, methods=["POST"]),
+        Route("/model/info", model_info, methods=["GET"]),
+        Route("/cleanup", cleanup_files, methods=["POST", "DELETE"]),
+        Route("/model/reload", model_reload, methods=["POST"]),
+    ],
+    middleware=[
+        Middleware(RequestLogMiddleware),
+        Middleware(TrafficCaptureMiddleware),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+# Main entry point - runs the production ASGI server
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=HOST,
+        port=PORT,
+        timeout_keep_alive=KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+        limit_concurrency=MAX_CONCURRENT_CONNECTIONS,
+        backlog=2048,
+    )
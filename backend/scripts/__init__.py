@@ -0,0 +1 @@
+# Scripts package for offline backend tools
@@ -0,0 +1,63 @@
+"""
+Tune how the Swin model is executed on this host.
+
+Benchmarks every precision (fp32, bf16, int8), execution backend (eager,
+TorchScript) and thread count on synthetic inputs, rejects variants whose
+top-k predictions disagree with eager fp32, and saves the fastest
+configuration for this host's fingerprint. The server uses a saved
+configuration at startup without re-tuning.
+
+Usage (from the backend directory):
+    python -m scripts.autotune_execution
+    python -m scripts.autotune_execution --checkpoint models/swin_best.pt --threads 1 2 4 --force
+"""
+
+import argparse
+import os
+
+from services.swin_service import build_model_from_checkpoint, tune_execution
+from services.autotune import (
+    AUTOTUNE_RESULTS_PATH,
+    host_fingerprint,
+    load_execution_config,
+    save_execution_config,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the Swin execution configuration for this host")
+    parser.add_argument("--checkpoint", default="models/swin_best.pt", help="Swin checkpoint to tune")
+    parser.add_argument("--results", default=AUTOTUNE_RESULTS_PATH, help="Results file to update")
+    parser.add_argument("--threads", type=int, nargs="+", help="Thread counts to try (default: 1, half and all CPUs)")
+    parser.add_argument("--force", action="store_true", help="Re-tune even if this host already has a result")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        print(f"[AUTOTUNE] Error: Checkpoint not found: {args.checkpoint}")
+        return 1
+
+    model, _, model_name = build_model_from_checkpoint(args.checkpoint)
+    host = host_fingerprint()
+    print(f"[AUTOTUNE] Host {host['id']}: {host['cpu_model']}, {host['cpus']} CPUs, {host['cpu_capability']}")
+
+    existing = load_execution_config(model_name, args.results)
+    if existing and not args.force:
+        print(f"[AUTOTUNE] Already tuned for {model_name}: {existing['config']} (use --force to re-tune)")
+        return 0
+
+    result = tune_execution(model, args.threads)
+
+    print(f"[AUTOTUNE] {'precision':<10} {'backend':<12} {'threads':>7} {'agreement':>9} {'latency_ms':>10}")
+    for variant in result["variants"]:
+        latency = "rejected" if variant.get("rejected") else f"{variant['latency_ms']:.1f}"
+        threads = variant["threads"] or "-"
+        print(f"[AUTOTUNE] {variant['precision']:<10} {variant['backend']:<12} {threads:>7} {variant['agreement']:>9.3f} {latency:>10}")
+    print(f"[AUTOTUNE] Per-image ms by batch size: {result['per_image_ms']}")
+
+    save_execution_config(model_name, result, args.results)
+    print(f"[AUTOTUNE] Saved {result['config']} for {model_name} to {args.results} ({result['tune_seconds']}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+"""
+Build the precomputed explanation library used by generate_explanation.
+
+Generates a reference explanation for every condition in the class mapping
+and for common pairs of conditions, then writes them to one compact indexed
+file. Common pairs are taken from a JSON file of [condition, condition]
+pairs, or derived from the checkpoint: conditions whose classifier weights
+are most similar are the ones the model most often confuses. Each pair is
+generated in both orders, since its explanation names the first condition
+as the primary diagnosis.
+
+Usage (from the backend directory):
+    python -m scripts.build_explanation_library
+    python -m scripts.build_explanation_library --pairs-per-class 3 --checkpoint models/swin_best.pt
+    python -m scripts.build_explanation_library --pairs-file pairs.json --resume
+"""
+
+import argparse
+import json
+import os
+import time
+
+from services.explanation_library import (
+    make_library_key,
+    read_library_entries,
+    write_explanation_library,
+)
+from services.gemini_service import load_gemini_client, generate_explanation
+
+
+def load_class_names(class_mapping_path: str) -> list:
+    """
+    Load condition names from the class mapping file.
+
+    Args:
+        class_mapping_path: Path to class_mapping.json ({"0": name, ...})
+
+    Returns:
+        list: Condition names ordered by class index
+    """
+    with open(class_mapping_path, "r") as f:
+        mapping = json.load(f)
+    return [mapping[str(i)] for i in range(len(mapping))]
+
+
+def similar_class_pairs(checkpoint_path: str, class_names: list, pairs_per_class: int) -> list:
+    """
+    Find likely-confused condition pairs from classifier weight similarity.
+
+    Args:
+        checkpoint_path: Path to the Swin checkpoint
+        class_names: Condition names ordered by class index
+        pairs_per_class: Number of most similar conditions to pair with each one
+
+    Returns:
+        list: Unique [condition, condition] pairs (each in one order)
+    """
+    import torch
+
+    checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+    state_dict = checkpoint.get("model_state_dict") or checkpoint.get("state_dict") or checkpoint
+    weights = state_dict.get("head.fc.weight", state_dict.get("head.weight"))
+    if weights is None or weights.shape[0] != len(class_names):
+        raise ValueError("checkpoint classifier does not match the class mapping")
+
+    weights = torch.nn.functional.normalize(weights.float(), dim=1)
+    similarity = weights @ weights.T
+    similarity.fill_diagonal_(-1.0)
+    neighbors = torch.topk(similarity, k=pairs_per_class, dim=1).indices
+
+    pairs = set()
+    for i, row in enumerate(neighbors.tolist()):
+        for j in row:
+            pairs.add(tuple(sorted((class_names[i], class_names[j]))))
+    return [list(pair) for pair in sorted(pairs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed explanation library")
+    parser.add_argument("--output", default="models/explanation_library.bin", help="Library file to write")
+    parser.add_argument("--class-mapping", default="models/class_mapping.json", help="Class index to name mapping")
+    parser.add_argument("--checkpoint", default="models/swin_best.pt", help="Checkpoint used to derive common pairs")
+    parser.add_argument("--pairs-file", help="JSON list of [condition, condition] pairs (overrides --checkpoint)")
+    parser.add_argument("--pairs-per-class", type=int, default=3, help="Similar conditions paired with each condition (0 disables pairs)")
+    parser.add_argument("--resume", action="store_true", help="Keep entries already in --output and only generate missing ones")
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds between Gemini calls (rate limiting)")
+    parser.add_argument("--save-every", type=int, default=25, help="Write the library after this many new entries")
+    args = parser.parse_args()
+
+    class_names = load_class_names(args.class_mapping)
+
+    if args.pairs_file:
+        with open(args.pairs_file, "r") as f:
+            pairs = json.load(f)
+    elif args.pairs_per_class > 0 and os.path.exists(args.checkpoint):
+        pairs = similar_class_pairs(args.checkpoint, class_names, args.pairs_per_class)
+    else:
+        pairs = []
+
+    # Both orders of each pair, so the primary diagnosis always comes first
+    ordered_pairs = list(dict.fromkeys(tuple(order) for a, b in pairs for order in ((a, b), (b, a))))
+    targets = [[name] for name in class_names] + [list(pair) for pair in ordered_pairs]
+    entries = read_library_entries(args.output) if args.resume else {}
+    missing = [conditions for conditions in targets if make_library_key(conditions) not in entries]
+
+    print(f"[LIBRARY] {len(class_names)} conditions, {len(ordered_pairs)} ordered pairs, {len(missing)} to generate")
+
+    if missing and not load_gemini_client():
+        print("[LIBRARY] Error: Gemini API is required to generate explanations")
+        return 1
+
+    generated = 0
+    for i, conditions in enumerate(missing, 1):
+        detections = [{"rash_label": condition, "confidence": 0} for condition in conditions]
+        result = generate_explanation(detections, use_library=False)
+
+        key = make_library_key(conditions)
+        if result["success"]:
+            entries[key] = result["explanation"]
+            generated += 1
+            print(f"[LIBRARY] ({i}/{len(missing)}) {key}")
+        else:
+            print(f"[LIBRARY] ({i}/{len(missing)}) {key} failed: {result['error']}")
+
+        if generated and generated % args.save_every == 0:
+            write_explanation_library(args.output, entries)
+
+        time.sleep(args.delay)
+
+    write_explanation_library(args.output, entries)
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"[LIBRARY] Wrote {len(entries)} entries to {args.output} ({size_kb:.1f}KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
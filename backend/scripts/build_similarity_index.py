@@ -0,0 +1,118 @@
+"""
+Build or extend the similar-case index used by /similar.
+
+Embeds every image of a reference directory laid out as <label>/<image>
+with the Swin checkpoint and appends the embeddings to the index. Images
+already in the index are skipped, so re-running after adding images only
+embeds the new ones. Large libraries (roughly 50k+ images) should also be
+partitioned with --ivf-lists; retrain the lists after many additions.
+
+Usage (from the backend directory):
+    python -m scripts.build_similarity_index --images reference_images
+    python -m scripts.build_similarity_index --images reference_images --ivf-lists 512
+"""
+
+import argparse
+import os
+import time
+
+from PIL import Image
+
+from services.swin_service import load_swin_model, extract_embeddings, get_model_info
+from services.similarity_index import (
+    create_similarity_index,
+    load_similarity_index,
+    add_reference_cases,
+    build_ivf,
+    get_indexed_paths,
+    get_similarity_index_info,
+    INDEX_META_FILE,
+)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+def find_reference_images(images_dir: str) -> list:
+    """
+    List reference images and their labels.
+
+    Args:
+        images_dir: Directory with one subdirectory of images per label
+
+    Returns:
+        list: (relative path, label) pairs, sorted
+    """
+    found = []
+    for label in sorted(os.listdir(images_dir)):
+        label_dir = os.path.join(images_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for filename in sorted(os.listdir(label_dir)):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                found.append((os.path.join(label, filename), label))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or extend the similar-case index")
+    parser.add_argument("--images", required=True, help="Reference images, one subdirectory per label")
+    parser.add_argument("--index-dir", default="models/similar_cases", help="Index directory to create or extend")
+    parser.add_argument("--checkpoint", default="models/swin_best.pt", help="Swin checkpoint used for embeddings")
+    parser.add_argument("--batch-size", type=int, default=64, help="Images embedded and appended per step")
+    parser.add_argument("--ivf-lists", type=int, default=0, help="Train IVF with this many lists after adding (0 keeps the current setting)")
+    args = parser.parse_args()
+
+    if not load_swin_model(args.checkpoint):
+        print("[INDEX] Error: A trained Swin checkpoint is required to compute embeddings")
+        return 1
+    model_version = get_model_info()["active_version"]["version"]
+
+    references = find_reference_images(args.images)
+    index_exists = os.path.exists(os.path.join(args.index_dir, INDEX_META_FILE))
+    if index_exists:
+        load_similarity_index(args.index_dir)
+        indexed_model = get_similarity_index_info()["model_version"]
+        if indexed_model and indexed_model.split("-")[-1] != model_version.split("-")[-1]:
+            print(f"[INDEX] Error: {args.index_dir} was built with model {indexed_model}, not {model_version}")
+            print("[INDEX] Embeddings from different checkpoints are not comparable; use a new --index-dir")
+            return 1
+        indexed = get_indexed_paths()
+        references = [(path, label) for path, label in references if path not in indexed]
+
+    print(f"[INDEX] {len(references)} new images to embed")
+
+    start_time = time.time()
+    for start in range(0, len(references), args.batch_size):
+        batch = references[start:start + args.batch_size]
+        images, cases = [], []
+        for path, label in batch:
+            try:
+                images.append(Image.open(os.path.join(args.images, path)).convert("RGB"))
+                cases.append({"label": label, "path": path})
+            except Exception as e:
+                print(f"[INDEX] Skipping {path}: {str(e)}")
+        if not images:
+            continue
+
+        embeddings = extract_embeddings(images)
+        if not index_exists:
+            create_similarity_index(args.index_dir, dim=embeddings.shape[1], model_version=model_version)
+            load_similarity_index(args.index_dir)
+            index_exists = True
+
+        total = add_reference_cases(embeddings, cases)
+        done = start + len(batch)
+        rate = done / max(time.time() - start_time, 1e-6)
+        print(f"[INDEX] {done}/{len(references)} embedded ({rate:.1f} images/s), {total} cases in index")
+
+    if args.ivf_lists > 0 and index_exists:
+        nlist = build_ivf(args.ivf_lists)
+        print(f"[INDEX] Built IVF with {nlist} lists")
+
+    info = get_similarity_index_info()
+    print(f"[INDEX] Index at {args.index_dir}: {info['cases']} cases, IVF lists: {info['ivf_lists'] or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
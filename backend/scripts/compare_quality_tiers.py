@@ -0,0 +1,151 @@
+"""
+Compare the reduced-resolution quality tiers with the full-resolution model.
+
+Scores every image in a folder with the full model and with each tier of
+QUALITY_INPUT_SIZES (the same weights at a lower input resolution), and
+reports how often the tier's top-1 matches the full model's, how often the
+full model's top-1 is in the tier's top-3, the mean KL divergence between
+their predictions and the single-image latency of each. All tiers score the
+base view only (no TTA), the way the service runs them.
+
+Usage (from the backend directory):
+    python -m scripts.compare_quality_tiers
+    python -m scripts.compare_quality_tiers --images test_images --checkpoint models/swin_best.pt --output models/quality_report.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from services.swin_service import (
+    QUALITY_INPUT_SIZES,
+    build_model_from_checkpoint,
+    build_reduced_models,
+    downscale_for_quality,
+    get_image_transform,
+)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+LATENCY_REPEATS = 10  # Timed single-image forward passes per tier (the median is reported)
+
+
+def find_images(images_dir: str) -> list:
+    """
+    List image files under a directory (recursively), sorted.
+
+    Args:
+        images_dir: Image folder
+
+    Returns:
+        list: Image paths
+    """
+    found = []
+    for root, _, filenames in os.walk(images_dir):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                found.append(os.path.join(root, filename))
+    return sorted(found)
+
+
+@torch.no_grad()
+def measure_latency(model, batch: torch.Tensor) -> float:
+    """
+    Median single-image forward time after one warm-up run.
+
+    Args:
+        model: Model to time
+        batch: (1, 3, size, size) input
+
+    Returns:
+        float: Milliseconds
+    """
+    model(batch)
+    timings = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        model(batch)
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reduced-resolution quality tiers with the full model")
+    parser.add_argument("--images", default="test_images", help="Folder of images to score")
+    parser.add_argument("--checkpoint", default="models/swin_best.pt", help="Swin checkpoint")
+    parser.add_argument("--output", default="models/quality_report.json", help="Report file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        print(f"[QUALITY] Error: Checkpoint not found: {args.checkpoint}")
+        return 1
+    paths = find_images(args.images)
+    if not paths:
+        print(f"[QUALITY] Error: No images found in {args.images}")
+        return 1
+
+    model, class_names, model_name = build_model_from_checkpoint(args.checkpoint)
+    model = model.cpu()
+    tiers = build_reduced_models(model, model_name)
+    if not tiers:
+        print(f"[QUALITY] Error: {model_name} cannot run any reduced tier of {QUALITY_INPUT_SIZES}")
+        return 1
+    print(f"[QUALITY] {model_name}, {len(class_names)} classes, {len(paths)} images, tiers: {', '.join(tiers)}")
+
+    transform = get_image_transform()
+    batch = torch.stack([transform(Image.open(path).convert("RGB")) for path in paths])
+
+    with torch.no_grad():
+        full_logits = model(batch)
+    full_top1 = full_logits.argmax(dim=1)
+
+    report = {
+        "checkpoint": args.checkpoint,
+        "model_name": model_name,
+        "images": len(paths),
+        "threads": torch.get_num_threads(),
+        "full": {"input_size": batch.shape[-1], "latency_ms": measure_latency(model, batch[:1])},
+        "tiers": {},
+    }
+    for quality, tier_model in tiers.items():
+        tier_batch = downscale_for_quality(batch, quality)
+        with torch.no_grad():
+            logits = tier_model(tier_batch)
+        top3 = logits.topk(min(3, logits.shape[1]), dim=1).indices
+        kl = F.kl_div(F.log_softmax(logits, dim=1), F.log_softmax(full_logits, dim=1), reduction="batchmean", log_target=True)
+
+        report["tiers"][quality] = {
+            "input_size": QUALITY_INPUT_SIZES[quality],
+            "top1_agreement": round(float((logits.argmax(dim=1) == full_top1).float().mean()), 4),
+            "top3_agreement": round(float((top3 == full_top1[:, None]).any(dim=1).float().mean()), 4),
+            "mean_kl_divergence": round(float(kl), 4),
+            "latency_ms": measure_latency(tier_model, tier_batch[:1]),
+            "per_image": [
+                {"image": os.path.basename(path), "full": class_names[int(expected)], quality: class_names[int(actual)]}
+                for path, expected, actual in zip(paths, full_top1, logits.argmax(dim=1))
+            ],
+        }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    full_ms = report["full"]["latency_ms"]
+    print(f"[QUALITY] {'tier':<8} {'size':>5} {'top1':>6} {'top3':>6} {'kl':>7} {'ms':>7} {'speedup':>7}")
+    print(f"[QUALITY] {'full':<6} {report['full']['input_size']:>5} {1.0:>6.3f} {1.0:>6.3f} {0.0:>7.4f} {full_ms:>7.1f} {1.0:>6.2f}x")
+    for quality, tier in report["tiers"].items():
+        print(
+            f"[QUALITY] {quality:<8} {tier['input_size']:>5} {tier['top1_agreement']:>6.3f} {tier['top3_agreement']:>6.3f} "
+            f"{tier['mean_kl_divergence']:>7.4f} {tier['latency_ms']:>7.1f} {full_ms / tier['latency_ms']:>6.2f}x"
+        )
+    print(f"[QUALITY] Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,453 @@
+"""
+Distill the Swin checkpoint into a smaller SwinV2 student.
+
+The current checkpoint is the teacher: its logits on a local image folder
+are the training targets (soft-label KL divergence at a temperature), so
+the images do not need labels. Teacher logits are computed once per image
+and view (original and horizontally flipped) and reused every epoch, which
+keeps CPU-only runs practical. The student starts from the teacher's
+weights where the architectures line up (same widths, evenly spaced blocks
+of the deeper stages), converging much faster than from scratch.
+
+The student checkpoint records its timm architecture and the teacher's
+class mapping, so the service loads it like any other checkpoint: point
+MODEL_PATH at it (or /model/reload it). An evaluation report comparing
+agreement and latency with the teacher is written next to it.
+
+The same script trains the cascade's first stage: pass a small CNN as the
+student (e.g. mobilenetv3_large_100) and write it to CASCADE_MODEL_PATH.
+Only SwinV2 students start from the teacher's weights; other
+architectures start from random weights, or from timm's ImageNet weights
+with --pretrained.
+
+Usage (from the backend directory):
+    python -m scripts.distill_student --images training_images
+    python -m scripts.distill_student --images training_images --epochs 10 --student swinv2_tiny_window16_256
+    python -m scripts.distill_student --images training_images --evaluate-only --output models/swin_student.pt
+    python -m scripts.distill_student --images training_images --student mobilenetv3_large_100 --pretrained --output models/cascade_fast.pt
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import statistics
+import time
+
+import torch
+import torch.nn.functional as F
+from PIL import Image
+import timm
+
+from services.swin_service import build_model_from_checkpoint, get_image_transform
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+DEFAULT_STUDENT = "swinv2_tiny_window8_256"
+INPUT_SIZE = (3, 256, 256)  # Serving preprocessing (see get_image_transform)
+LATENCY_RUNS = 20
+
+
+class DistillationDataset(torch.utils.data.Dataset):
+    """
+    Images with their precomputed teacher logits for both views.
+    """
+
+    def __init__(self, paths, teacher_logits, labels, train):
+        self.paths = paths
+        self.teacher_logits = teacher_logits  # (N, 2, classes): original, flipped
+        self.labels = labels
+        self.train = train
+        self.transform = get_image_transform()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        image = self.transform(Image.open(self.paths[index]).convert("RGB"))
+        view = int(torch.randint(2, (1,))) if self.train else 0
+        if view == 1:
+            image = torch.flip(image, dims=[2])
+        return image, self.teacher_logits[index, view], self.labels[index]
+
+
+def find_images(images_dir: str) -> list:
+    """
+    List image files under a directory (recursively), sorted.
+
+    Args:
+        images_dir: Image folder (labels are optional subdirectories)
+
+    Returns:
+        list: Image paths
+    """
+    found = []
+    for root, _, filenames in os.walk(images_dir):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                found.append(os.path.join(root, filename))
+    return sorted(found)
+
+
+def split_validation(paths: list, val_fraction: float):
+    """
+    Split images into train and validation sets by a hash of the path,
+    so the split is stable across runs and as images are added.
+
+    Args:
+        paths: Image paths
+        val_fraction: Fraction held out for evaluation
+
+    Returns:
+        tuple: (train paths, validation paths)
+    """
+    train, val = [], []
+    for path in paths:
+        bucket = int(hashlib.sha1(path.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        (val if bucket < val_fraction else train).append(path)
+    return train, val
+
+
+def folder_labels(paths: list, images_dir: str, class_names: list) -> torch.Tensor:
+    """
+    Use the first subdirectory as the label when it names a teacher class.
+
+    Args:
+        paths: Image paths
+        images_dir: Image folder
+        class_names: Teacher class names
+
+    Returns:
+        torch.Tensor: Class index per image, -1 when unlabeled
+    """
+    index = {name: i for i, name in enumerate(class_names)}
+    labels = []
+    for path in paths:
+        parts = os.path.relpath(path, images_dir).split(os.sep)
+        labels.append(index.get(parts[0], -1) if len(parts) > 1 else -1)
+    return torch.tensor(labels, dtype=torch.long)
+
+
+@torch.no_grad()
+def compute_teacher_logits(teacher, paths: list, batch_size: int) -> torch.Tensor:
+    """
+    Score every image and its horizontal flip with the teacher.
+
+    Args:
+        teacher: Teacher model in eval mode
+        paths: Image paths
+        batch_size: Images per forward pass
+
+    Returns:
+        torch.Tensor: (N, 2, classes) logits
+    """
+    transform = get_image_transform()
+    outputs = []
+    start_time = time.time()
+    for start in range(0, len(paths), batch_size):
+        batch = torch.stack([transform(Image.open(path).convert("RGB")) for path in paths[start:start + batch_size]])
+        views = torch.cat([batch, torch.flip(batch, dims=[3])])
+        logits = teacher(views).float()
+        outputs.append(torch.stack([logits[:len(batch)], logits[len(batch):]], dim=1))
+        done = min(start + batch_size, len(paths))
+        print(f"[DISTILL] Teacher logits {done}/{len(paths)} ({done / max(time.time() - start_time, 1e-6):.1f} images/s)")
+    return torch.cat(outputs)
+
+
+def init_student_from_teacher(student, teacher) -> int:
+    """
+    Copy teacher weights into the student where shapes match. Stages with
+    fewer student blocks take evenly spaced teacher blocks.
+
+    Args:
+        student: Student model
+        teacher: Teacher model
+
+    Returns:
+        int: Number of tensors copied
+    """
+    teacher_state = teacher.state_dict()
+    teacher_depths = [len(layer.blocks) for layer in teacher.layers]
+    student_depths = [len(layer.blocks) for layer in student.layers]
+
+    copied = 0
+    student_state = student.state_dict()
+    for name, tensor in student_state.items():
+        source = name
+        match = re.match(r"layers\.(\d+)\.blocks\.(\d+)\.(.*)", name)
+        if match:
+            stage, block, rest = int(match.group(1)), int(match.group(2)), match.group(3)
+            if stage >= len(teacher_depths):
+                continue
+            teacher_block = round(block * (teacher_depths[stage] - 1) / max(student_depths[stage] - 1, 1))
+            source = f"layers.{stage}.blocks.{teacher_block}.{rest}"
+        if source in teacher_state and teacher_state[source].shape == tensor.shape:
+            student_state[name] = teacher_state[source].clone()
+            copied += 1
+
+    student.load_state_dict(student_state)
+    return copied
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature: float, hard_weight: float):
+    """
+    Soft-label KL divergence, plus cross-entropy on labeled images if requested.
+
+    Args:
+        student_logits: (B, classes)
+        teacher_logits: (B, classes)
+        labels: (B,) class indices, -1 when unlabeled
+        temperature: Softening temperature
+        hard_weight: Weight of the hard-label loss (0 disables it)
+
+    Returns:
+        torch.Tensor: Scalar loss
+    """
+    soft_loss = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.log_softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean",
+        log_target=True,
+    ) * (temperature ** 2)
+
+    labeled = labels >= 0
+    if hard_weight <= 0 or not labeled.any():
+        return soft_loss
+    hard_loss = F.cross_entropy(student_logits[labeled], labels[labeled])
+    return (1 - hard_weight) * soft_loss + hard_weight * hard_loss
+
+
+@torch.no_grad()
+def evaluate(student, loader) -> dict:
+    """
+    Compare student predictions with the teacher's on held-out images.
+
+    Args:
+        student: Student model
+        loader: Validation DataLoader (yields images, teacher logits, labels)
+
+    Returns:
+        dict: Agreement, KL divergence and label accuracy (when labeled)
+    """
+    student.eval()
+    images = top1 = top3 = labeled = teacher_correct = student_correct = 0
+    kl_total = 0.0
+    for batch, target_logits, labels in loader:
+        logits = student(batch).float()
+        teacher_top1 = target_logits.argmax(dim=1)
+        student_top3 = logits.topk(min(3, logits.shape[1]), dim=1).indices
+
+        images += len(batch)
+        top1 += int((logits.argmax(dim=1) == teacher_top1).sum())
+        top3 += int((student_top3 == teacher_top1[:, None]).any(dim=1).sum())
+        kl_total += float(F.kl_div(
+            F.log_softmax(logits, dim=1), F.log_softmax(target_logits, dim=1),
+            reduction="sum", log_target=True,
+        ))
+
+        mask = labels >= 0
+        labeled += int(mask.sum())
+        teacher_correct += int((teacher_top1[mask] == labels[mask]).sum())
+        student_correct += int((logits.argmax(dim=1)[mask] == labels[mask]).sum())
+
+    report = {
+        "images": images,
+        "top1_agreement": round(top1 / images, 4) if images else None,
+        "top3_agreement": round(top3 / images, 4) if images else None,
+        "mean_kl_divergence": round(kl_total / images, 4) if images else None,
+    }
+    if labeled:
+        report["labeled_images"] = labeled
+        report["teacher_accuracy"] = round(teacher_correct / labeled, 4)
+        report["student_accuracy"] = round(student_correct / labeled, 4)
+    return report
+
+
+@torch.no_grad()
+def measure_latency(model, batch_size: int) -> dict:
+    """
+    Time forward passes on a random batch.
+
+    Args:
+        model: Model in eval mode
+        batch_size: Images per forward pass
+
+    Returns:
+        dict: Median and p90 milliseconds per batch, and images per second
+    """
+    model.eval()
+    batch = torch.randn(batch_size, *INPUT_SIZE)
+    model(batch)
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        start = time.perf_counter()
+        model(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    median = statistics.median(timings)
+    return {
+        "batch_size": batch_size,
+        "median_ms": round(median, 1),
+        "p90_ms": round(timings[int(len(timings) * 0.9) - 1], 1),
+        "images_per_second": round(batch_size * 1000 / median, 1),
+    }
+
+
+def save_student(path: str, student, student_name: str, class_names: list, metadata: dict):
+    """
+    Write the student checkpoint in the format the service loads, atomically
+    (the model watcher may be polling the path).
+
+    Args:
+        path: Output checkpoint path
+        student: Trained student
+        student_name: timm architecture name
+        class_names: Teacher class names, by index
+        metadata: Distillation settings and results
+    """
+    temp_path = path + ".tmp"
+    torch.save({
+        "model_state_dict": student.state_dict(),
+        "model_name": student_name,
+        "class_to_idx": {name: i for i, name in enumerate(class_names)},
+        "distillation": metadata,
+    }, temp_path)
+    os.replace(temp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the Swin checkpoint into a smaller student")
+    parser.add_argument("--images", required=True, help="Image folder (optionally <class name>/<image>)")
+    parser.add_argument("--teacher", default="models/swin_best.pt", help="Teacher checkpoint")
+    parser.add_argument("--student", default=DEFAULT_STUDENT, help="timm architecture of the student")
+    parser.add_argument("--output", default="models/swin_student.pt", help="Student checkpoint to write")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--temperature", type=float, default=4.0, help="Softening temperature for the KL loss")
+    parser.add_argument("--hard-label-weight", type=float, default=0.0, help="Weight of cross-entropy on folder labels (0 = soft labels only)")
+    parser.add_argument("--val-fraction", type=float, default=0.1, help="Images held out for the evaluation report")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (0 keeps the torch default)")
+    parser.add_argument("--no-teacher-init", action="store_true", help="Start the student from random weights")
+    parser.add_argument("--pretrained", action="store_true", help="Start the student from timm's ImageNet weights (downloads them; implies --no-teacher-init)")
+    parser.add_argument("--evaluate-only", action="store_true", help="Only evaluate an existing --output checkpoint")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    teacher, class_names, teacher_name = build_model_from_checkpoint(args.teacher)
+    teacher = teacher.cpu()
+    print(f"[DISTILL] Teacher: {teacher_name} ({len(class_names)} classes)")
+
+    paths = find_images(args.images)
+    if not paths:
+        print(f"[DISTILL] Error: No images found in {args.images}")
+        return 1
+    train_paths, val_paths = split_validation(paths, args.val_fraction)
+    if not val_paths:
+        val_paths = train_paths[-max(len(train_paths) // 10, 1):]
+    print(f"[DISTILL] {len(train_paths)} training images, {len(val_paths)} held out")
+
+    if args.evaluate_only:
+        student, student_classes, student_name = build_model_from_checkpoint(args.output)
+        student = student.cpu()
+        if student_classes != class_names:
+            print("[DISTILL] Error: Student classes do not match the teacher")
+            return 1
+        train_paths = []
+    else:
+        student_name = args.student
+        student = timm.create_model(student_name, pretrained=args.pretrained, num_classes=len(class_names))
+        # Convolutional students take any input size; windowed transformers need the served one
+        if student.pretrained_cfg.get("fixed_input_size") and student.pretrained_cfg.get("input_size") != INPUT_SIZE:
+            print(f"[DISTILL] Error: {student_name} expects {student.pretrained_cfg.get('input_size')}, the service feeds {INPUT_SIZE}")
+            return 1
+        if not args.no_teacher_init and not args.pretrained and hasattr(student, "layers") and hasattr(teacher, "layers"):
+            copied = init_student_from_teacher(student, teacher)
+            print(f"[DISTILL] Initialized {copied}/{len(student.state_dict())} student tensors from the teacher")
+
+    all_logits = compute_teacher_logits(teacher, train_paths + val_paths, args.batch_size)
+    train_logits, val_logits = all_logits[:len(train_paths)], all_logits[len(train_paths):]
+
+    val_loader = torch.utils.data.DataLoader(
+        DistillationDataset(val_paths, val_logits, folder_labels(val_paths, args.images, class_names), train=False),
+        batch_size=args.batch_size,
+    )
+
+    history = []
+    if not args.evaluate_only:
+        train_loader = torch.utils.data.DataLoader(
+            DistillationDataset(train_paths, train_logits, folder_labels(train_paths, args.images, class_names), train=True),
+            batch_size=args.batch_size,
+            shuffle=True,
+            drop_last=len(train_paths) > args.batch_size,
+        )
+        optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=0.05)
+        scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(args.epochs * len(train_loader), 1))
+
+        best_agreement = -1.0
+        for epoch in range(1, args.epochs + 1):
+            student.train()
+            epoch_start = time.time()
+            total_loss = 0.0
+            for batch, target_logits, labels in train_loader:
+                loss = distillation_loss(student(batch), target_logits, labels, args.temperature, args.hard_label_weight)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                scheduler.step()
+                total_loss += loss.item() * len(batch)
+
+            metrics = evaluate(student, val_loader)
+            metrics.update({"epoch": epoch, "train_loss": round(total_loss / len(train_paths), 4), "seconds": round(time.time() - epoch_start, 1)})
+            history.append(metrics)
+            print(f"[DISTILL] Epoch {epoch}/{args.epochs}: loss {metrics['train_loss']}, top-1 agreement {metrics['top1_agreement']}, {metrics['seconds']}s")
+
+            # Keep the epoch that agrees best with the teacher
+            if metrics["top1_agreement"] > best_agreement:
+                best_agreement = metrics["top1_agreement"]
+                save_student(args.output, student, student_name, class_names, {
+                    "teacher": os.path.basename(args.teacher),
+                    "teacher_model_name": teacher_name,
+                    "temperature": args.temperature,
+                    "hard_label_weight": args.hard_label_weight,
+                    "epoch": epoch,
+                    "train_images": len(train_paths),
+                    "top1_agreement": metrics["top1_agreement"],
+                })
+
+        student, _, _ = build_model_from_checkpoint(args.output)
+        student = student.cpu()
+
+    report = {
+        "teacher": {"checkpoint": args.teacher, "model_name": teacher_name,
+                    "parameters_m": round(sum(p.numel() for p in teacher.parameters()) / 1e6, 1)},
+        "student": {"checkpoint": args.output, "model_name": student_name,
+                    "parameters_m": round(sum(p.numel() for p in student.parameters()) / 1e6, 1)},
+        "threads": torch.get_num_threads(),
+        "agreement": evaluate(student, val_loader),
+        "latency": {
+            "teacher": [measure_latency(teacher, 1), measure_latency(teacher, 8)],
+            "student": [measure_latency(student, 1), measure_latency(student, 8)],
+        },
+        "history": history,
+    }
+    teacher_ms = report["latency"]["teacher"][0]["median_ms"]
+    student_ms = report["latency"]["student"][0]["median_ms"]
+    report["speedup_batch1"] = round(teacher_ms / student_ms, 2)
+
+    report_path = os.path.splitext(args.output)[0] + ".report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    agreement = report["agreement"]
+    print(f"[DISTILL] Top-1 agreement {agreement['top1_agreement']}, top-3 {agreement['top3_agreement']} on {agreement['images']} held-out images")
+    print(f"[DISTILL] Latency (batch 1): teacher {teacher_ms}ms, student {student_ms}ms ({report['speedup_batch1']}x)")
+    print(f"[DISTILL] Report written to {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,343 @@
+"""
+Replay captured /analyze and /chat traffic against a running instance and
+report latency distributions.
+
+Requests are sent at their original pace (or --speed times faster, or as
+fast as --concurrency allows with --speed 0) with their original
+X-Request-ID. Captured images are uploaded to the target first, and chat
+sessions are remapped to the ones the replayed analyses create. Start the
+target with GEMINI_REPLAY_PATH set to the same capture so Gemini answers
+from the recorded responses, and with TRAFFIC_CAPTURE_PATH set to a new
+file to compare server-side stage timings too (pass it as --target-capture).
+
+Usage (from the backend directory):
+    GEMINI_REPLAY_PATH=captures/traffic.jsonl TRAFFIC_CAPTURE_PATH=/tmp/replay.jsonl python asgi.py
+    python -m scripts.replay_traffic --capture captures/traffic.jsonl --target-capture /tmp/replay.jsonl
+    python -m scripts.replay_traffic --capture captures/traffic.jsonl --speed 4 --report replay_report.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from services.traffic_capture import load_capture, CAPTURED_ENDPOINTS
+
+REQUEST_TIMEOUT_SECONDS = 120
+SESSION_WAIT_SECONDS = 300  # How long a chat turn waits for the replayed request that creates its session
+TARGET_CAPTURE_SETTLE_SECONDS = 2  # Time for the target's capture writer to flush before reading it
+
+
+def percentiles(values: list) -> dict:
+    """
+    Summarize a latency sample.
+
+    Args:
+        values: Latencies in milliseconds
+
+    Returns:
+        dict: count, mean, p50, p90, p99 and max (None if empty)
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)], 1)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 1),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def stage_timings(record: dict) -> dict:
+    """
+    Server-side stage timings of a captured request, including total Gemini time.
+
+    Args:
+        record: Capture record
+
+    Returns:
+        dict: Stage name -> milliseconds
+    """
+    stages = dict(record.get("stages") or {})
+    if record.get("gemini"):
+        stages["gemini"] = round(sum(call["latency_ms"] for call in record["gemini"]), 1)
+    stages["server_total"] = record.get("duration_ms")
+    return {name: value for name, value in stages.items() if value is not None}
+
+
+class Replayer:
+    """
+    Sends captured requests to the target and collects their outcomes.
+
+    Args:
+        target: Base URL of the instance under test
+        capture_path: Capture log being replayed (its images are next to it)
+    """
+
+    def __init__(self, target: str, capture_path: str):
+        self.target = target.rstrip("/")
+        self.image_dir = capture_path + ".images"
+        self.uploaded = {}  # Image SHA-256 -> path on the target
+        self.sessions = {}  # Original chat session ID -> replayed session ID
+        self.session_ready = {}  # Original chat session ID -> Event set once it is known
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.results = []
+
+    def http(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def upload_images(self, records: list) -> int:
+        """
+        Upload each captured image to the target once.
+
+        Args:
+            records: Records to replay
+
+        Returns:
+            int: Number of images uploaded
+        """
+        for record in records:
+            image = record.get("image")
+            if not image or image["sha256"] in self.uploaded:
+                continue
+            path = os.path.join(self.image_dir, f"{image['sha256']}.{image['ext']}")
+            if not os.path.exists(path):
+                continue
+            mimetype = "image/jpeg" if image["ext"] in ("jpg", "jpeg") else f"image/{image['ext']}"
+            with open(path, "rb") as f:
+                response = self.http().post(
+                    f"{self.target}/upload",
+                    files={"image": (os.path.basename(path), f, mimetype)},
+                    timeout=REQUEST_TIMEOUT_SECONDS,
+                )
+            if response.status_code == 200:
+                self.uploaded[image["sha256"]] = response.json()["path"]
+            else:
+                print(f"[REPLAY] Upload of {image['sha256'][:12]} failed: {response.status_code} {response.text[:200]}")
+        return len(self.uploaded)
+
+    def prepare(self, record: dict):
+        """
+        Build the replayed request body, or None if it cannot be replayed.
+        """
+        payload = dict(record.get("payload") or {})
+        if record["endpoint"] == "/analyze":
+            image = record.get("image")
+            if not image or image["sha256"] not in self.uploaded:
+                return None
+            payload.pop("filename", None)
+            payload.pop("path", None)
+            payload["image_path"] = self.uploaded[image["sha256"]]
+        return payload
+
+    def expect_session(self, record: dict):
+        """
+        Register a session created by this record so dependent chat turns can wait for it.
+        """
+        created = record.get("session_id")
+        if created and created != (record.get("payload") or {}).get("session_id"):
+            self.session_ready.setdefault(created, threading.Event())
+
+    def send(self, record: dict, payload: dict, scheduled_at: float):
+        """
+        Send one request and record its latency.
+        """
+        original_session = payload.get("session_id")
+        if original_session:
+            ready = self.session_ready.get(original_session)
+            if ready is None or not ready.wait(SESSION_WAIT_SECONDS) or original_session not in self.sessions:
+                self.add_result(record, None, None, 0, skipped="session not replayed")
+                self.publish_session(record, None)
+                return
+            payload = {**payload, "session_id": self.sessions[original_session]}
+
+        lag_ms = (time.perf_counter() - scheduled_at) * 1000
+        start = time.perf_counter()
+        try:
+            response = self.http().post(
+                self.target + record["endpoint"],
+                json=payload,
+                headers={"X-Request-ID": record.get("id") or ""},
+                timeout=REQUEST_TIMEOUT_SECONDS,
+            )
+            latency_ms = (time.perf_counter() - start) * 1000
+            status = response.status_code
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+        except requests.RequestException as e:
+            latency_ms, status, body = (time.perf_counter() - start) * 1000, None, {"error": str(e)}
+
+        self.add_result(record, status, latency_ms, lag_ms)
+        self.publish_session(record, body.get("chat_session_id") or body.get("session_id"))
+
+    def publish_session(self, record: dict, replayed_session):
+        original = record.get("session_id")
+        ready = self.session_ready.get(original)
+        if ready is None or ready.is_set():
+            return
+        with self.lock:
+            if replayed_session:
+                self.sessions[original] = replayed_session
+        ready.set()
+
+    def add_result(self, record, status, latency_ms, lag_ms, skipped=None):
+        with self.lock:
+            self.results.append({
+                "id": record.get("id"),
+                "endpoint": record["endpoint"],
+                "status": status,
+                "latency_ms": latency_ms,
+                "lag_ms": lag_ms,
+                "skipped": skipped,
+                "original_status": record.get("status"),
+                "original_ms": record.get("duration_ms"),
+            })
+
+
+def build_report(records: list, results: list, target_records: dict, elapsed: float, args) -> dict:
+    """
+    Compare replayed latencies with the originals per endpoint and stage.
+    """
+    report = {
+        "capture": args.capture,
+        "target": args.target,
+        "speed": args.speed,
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 1),
+        "endpoints": {},
+    }
+    originals = {record.get("id"): record for record in records}
+
+    for endpoint in sorted({result["endpoint"] for result in results}):
+        sent = [r for r in results if r["endpoint"] == endpoint and not r["skipped"]]
+        statuses = {}
+        for r in sent:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+        entry = {
+            "sent": len(sent),
+            "skipped": sum(1 for r in results if r["endpoint"] == endpoint and r["skipped"]),
+            "statuses": statuses,
+            "status_changed": sum(1 for r in sent if r["status"] != r["original_status"]),
+            "latency_ms": {
+                "original": percentiles([r["original_ms"] for r in sent if r["original_ms"] is not None]),
+                "replay": percentiles([r["latency_ms"] for r in sent]),
+            },
+            "send_lag_ms": percentiles([r["lag_ms"] for r in sent]),
+            "stages_ms": {},
+        }
+
+        stage_names = set()
+        original_stages, replay_stages = {}, {}
+        for r in sent:
+            original_stages[r["id"]] = stage_timings(originals.get(r["id"], {}))
+            if r["id"] in target_records:
+                replay_stages[r["id"]] = stage_timings(target_records[r["id"]])
+            stage_names.update(original_stages[r["id"]])
+        for name in sorted(stage_names):
+            stage = {"original": percentiles([s[name] for s in original_stages.values() if name in s])}
+            if target_records:
+                stage["replay"] = percentiles([s[name] for s in replay_stages.values() if name in s])
+            entry["stages_ms"][name] = stage
+
+        report["endpoints"][endpoint] = entry
+    return report
+
+
+def print_report(report: dict):
+    print(f"[REPLAY] {report['requests']} requests in {report['elapsed_s']}s (speed {report['speed']})")
+    for endpoint, entry in report["endpoints"].items():
+        print(f"\n{endpoint}: {entry['sent']} sent, {entry['skipped']} skipped, statuses {entry['statuses']}, "
+              f"{entry['status_changed']} changed status")
+        print(f"  {'':24} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+        rows = [("latency original", entry["latency_ms"]["original"]), ("latency replay", entry["latency_ms"]["replay"])]
+        for name, stage in entry["stages_ms"].items():
+            rows.append((f"{name} original", stage["original"]))
+            if "replay" in stage:
+                rows.append((f"{name} replay", stage["replay"]))
+        for label, stats in rows:
+            if stats["count"]:
+                print(f"  {label:24} {stats['count']:>6} {stats['p50']:>9} {stats['p90']:>9} {stats['p99']:>9} {stats['max']:>9}")
+        if entry["send_lag_ms"]["count"] and entry["send_lag_ms"]["p99"] > 100:
+            print(f"  Warning: sends ran up to {entry['send_lag_ms']['p99']}ms (p99) behind schedule - raise --concurrency")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic and report latency distributions")
+    parser.add_argument("--capture", required=True, help="Capture log written with TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--target", default="http://localhost:5000", help="Base URL of the instance under test")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay rate multiplier (0 sends as fast as --concurrency allows)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at most")
+    parser.add_argument("--endpoint", action="append", choices=sorted(CAPTURED_ENDPOINTS), help="Only replay these endpoints")
+    parser.add_argument("--limit", type=int, default=0, help="Replay at most this many requests (0 = all)")
+    parser.add_argument("--target-capture", help="Capture written by the target during the replay, for per-stage comparison")
+    parser.add_argument("--report", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    records = sorted(load_capture(args.capture), key=lambda record: record["ts"])
+    if args.endpoint:
+        records = [record for record in records if record["endpoint"] in args.endpoint]
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print(f"[REPLAY] Error: No captured requests in {args.capture}")
+        return 1
+
+    replayer = Replayer(args.target, args.capture)
+    print(f"[REPLAY] Uploading images for {len(records)} requests to {args.target}")
+    print(f"[REPLAY] {replayer.upload_images(records)} images uploaded")
+
+    prepared = []
+    for record in records:
+        payload = replayer.prepare(record)
+        if payload is None:
+            replayer.add_result(record, None, None, 0, skipped="image not captured")
+            continue
+        replayer.expect_session(record)
+        prepared.append((record, payload))
+
+    first_ts = records[0]["ts"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for record, payload in prepared:
+            scheduled_at = start
+            if args.speed > 0:
+                scheduled_at = start + (record["ts"] - first_ts) / args.speed
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(replayer.send, record, payload, scheduled_at)
+    elapsed = time.perf_counter() - start
+
+    target_records = {}
+    if args.target_capture:
+        time.sleep(TARGET_CAPTURE_SETTLE_SECONDS)
+        target_records = {record.get("id"): record for record in load_capture(args.target_capture)}
+
+    report = build_report(records, replayer.results, target_records, elapsed, args)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[REPLAY] Report written to {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,337 @@
+"""
+Admission Control for the analysis and chat paths.
+Caps the number of requests doing work at once and queues the overflow in
+bounded per-client queues. Freed slots are granted fairly: priority classes
+share them by weighted round robin (so batch scoring cannot starve
+interactive chat and analysis), and within a class clients take turns.
+Queued requests whose deadline passes are dropped, and requests that cannot
+be queued are shed with a Retry-After hint.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+
+# Priority classes, in the order they are offered freed slots.
+# weight: slots granted per round while the class has waiters
+# max_queued: waiting requests before new ones are shed
+# timeout_seconds: longest deadline a request of this class may have
+PRIORITY_CLASSES = {
+    "chat": {"weight": 4, "max_queued": 64, "timeout_seconds": 30},
+    "analysis": {"weight": 2, "max_queued": 64, "timeout_seconds": 60},
+    "batch": {"weight": 1, "max_queued": 64, "timeout_seconds": 600},
+}
+
+# Admission limits
+MAX_CONCURRENT_REQUESTS = 8  # Requests doing inference/Gemini work at once
+MAX_QUEUED_PER_CLIENT = 8  # Waiting requests per client and class
+MIN_RETRY_AFTER_SECONDS = 1
+MAX_RETRY_AFTER_SECONDS = 30
+SERVICE_TIME_SMOOTHING = 0.2  # EWMA weight of the newest request when estimating Retry-After
+
+# Admission state
+_lock = threading.Lock()
+_active = 0
+_queues = {name: OrderedDict() for name in PRIORITY_CLASSES}  # class -> client_id -> deque of tickets
+_queued = {name: 0 for name in PRIORITY_CLASSES}
+_credits = {name: config["weight"] for name, config in PRIORITY_CLASSES.items()}
+_service_seconds = 2.0  # Smoothed time a request holds its slot
+_stats = {name: {"admitted": 0, "queued": 0, "shed": 0, "expired": 0} for name in PRIORITY_CLASSES}
+
+
+def admit(priority: str, client_id: str, timeout_seconds: Optional[float] = None) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Wait for a slot to do work, or be shed.
+
+    Args:
+        priority: Priority class name (see PRIORITY_CLASSES)
+        client_id: API key or client IP used for fair queuing
+        timeout_seconds: Caller's remaining time budget (capped by the class timeout)
+
+    Returns:
+        tuple: (ticket, None) once admitted, or (None, rejection) with format:
+            {"error": str, "retry_after": int}
+        Pass the ticket to release() when the work is done; ticket["deadline"]
+        is the absolute deadline downstream calls should respect.
+    """
+    ticket, rejection = _enqueue(priority, client_id, timeout_seconds, threading.Event())
+    if ticket is None or ticket["granted"]:
+        return ticket, rejection
+
+    ticket["notify"].wait(max(ticket["deadline"] - time.time(), 0))
+    return _settle(ticket)
+
+
+async def admit_async(priority: str, client_id: str, timeout_seconds: Optional[float] = None) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Async variant of admit for the ASGI server (waits without holding a thread).
+
+    Args:
+        priority: Priority class name (see PRIORITY_CLASSES)
+        client_id: API key or client IP used for fair queuing
+        timeout_seconds: Caller's remaining time budget (capped by the class timeout)
+
+    Returns:
+        tuple: Same format as admit
+    """
+    loop = asyncio.get_running_loop()
+    granted = asyncio.Event()
+    ticket, rejection = _enqueue(priority, client_id, timeout_seconds, _LoopNotifier(loop, granted))
+    if ticket is None or ticket["granted"]:
+        return ticket, rejection
+
+    try:
+        await asyncio.wait_for(granted.wait(), timeout=max(ticket["deadline"] - time.time(), 0))
+    except asyncio.TimeoutError:
+        pass
+    except asyncio.CancelledError:
+        # Client went away: give the slot back if it was granted meanwhile
+        admitted, _ = _settle(ticket)
+        if admitted is not None:
+            release(admitted)
+        raise
+
+    return _settle(ticket)
+
+
+def release(ticket: Dict):
+    """
+    Return an admitted request's slot and grant it to the next waiter.
+
+    Args:
+        ticket: Ticket returned by admit
+    """
+    global _active, _service_seconds
+
+    held = time.time() - ticket["admitted_at"]
+    with _lock:
+        _active -= 1
+        _service_seconds += SERVICE_TIME_SMOOTHING * (held - _service_seconds)
+        _grant_waiters()
+
+
+def remaining_seconds(ticket: Dict) -> float:
+    """
+    Get the time left before an admitted request's deadline.
+
+    Args:
+        ticket: Ticket returned by admit
+
+    Returns:
+        float: Seconds remaining (0 if the deadline has passed)
+    """
+    return max(ticket["deadline"] - time.time(), 0.0)
+
+
+def get_admission_stats() -> Dict:
+    """
+    Get current load and per-class admission counters.
+
+    Returns:
+        dict: Active and queued requests, limits and counters per class
+    """
+    with _lock:
+        return {
+            "active": _active,
+            "max_concurrent": MAX_CONCURRENT_REQUESTS,
+            "service_seconds": round(_service_seconds, 3),
+            "classes": {
+                name: {
+                    **_stats[name],
+                    "waiting": _queued[name],
+                    "clients_waiting": len(_queues[name]),
+                    "weight": PRIORITY_CLASSES[name]["weight"],
+                }
+                for name in PRIORITY_CLASSES
+            },
+        }
+
+
+class _LoopNotifier:
+    """
+    Wake an asyncio waiter from whichever thread grants its slot.
+    """
+
+    def __init__(self, loop, event):
+        self.loop = loop
+        self.event = event
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+def _enqueue(priority: str, client_id: str, timeout_seconds: Optional[float], notify):
+    """
+    Admit immediately if a slot is free and nobody is waiting, else queue.
+
+    Args:
+        priority: Priority class name
+        client_id: Client identity
+        timeout_seconds: Caller's remaining time budget
+        notify: Object whose set() wakes the waiter
+
+    Returns:
+        tuple: (ticket, None) - granted or queued - or (None, rejection)
+    """
+    config = PRIORITY_CLASSES[priority]
+    now = time.time()
+    budget = config["timeout_seconds"] if timeout_seconds is None else min(timeout_seconds, config["timeout_seconds"])
+    ticket = {
+        "priority": priority,
+        "client_id": client_id or "anonymous",
+        "deadline": now + max(budget, 0),
+        "notify": notify,
+        "granted": False,
+        "expired": False,
+        "enqueued_at": now,
+        "admitted_at": None,
+    }
+
+    with _lock:
+        if budget <= 0:
+            _stats[priority]["expired"] += 1
+            return None, _rejection("Request deadline already passed")
+
+        if _active < MAX_CONCURRENT_REQUESTS and not any(_queued.values()):
+            _grant(ticket, now)
+            return ticket, None
+
+        client_queue = _queues[priority].get(ticket["client_id"])
+        if _queued[priority] >= config["max_queued"]:
+            _stats[priority]["shed"] += 1
+            return None, _rejection("The server is busy. Please try again shortly.")
+        if client_queue is not None and len(client_queue) >= MAX_QUEUED_PER_CLIENT:
+            _stats[priority]["shed"] += 1
+            return None, _rejection("Too many requests waiting for this client. Please try again shortly.")
+
+        if client_queue is None:
+            client_queue = _queues[priority][ticket["client_id"]] = deque()
+        client_queue.append(ticket)
+        _queued[priority] += 1
+        _stats[priority]["queued"] += 1
+
+    return ticket, None
+
+
+def _settle(ticket: Dict):
+    """
+    Resolve a queued ticket after its wait: admitted, or dropped at its deadline.
+
+    Args:
+        ticket: Queued ticket
+
+    Returns:
+        tuple: (ticket, None) if admitted, or (None, rejection)
+    """
+    with _lock:
+        if ticket["granted"]:
+            return ticket, None
+
+        if not ticket["expired"]:
+            _remove_waiter(ticket)
+            _stats[ticket["priority"]]["expired"] += 1
+
+        return None, _rejection("Request timed out waiting for capacity")
+
+
+def _grant_waiters():
+    """
+    Hand free slots to waiters by weighted round robin over classes and
+    round robin over clients, dropping expired waiters (caller holds the lock).
+    """
+    now = time.time()
+    while _active < MAX_CONCURRENT_REQUESTS and any(_queued.values()):
+        priority = _next_class()
+        client_id, client_queue = next(iter(_queues[priority].items()))
+        ticket = client_queue.popleft()
+        _queued[priority] -= 1
+
+        # The client goes to the back of the line for its next request
+        if client_queue:
+            _queues[priority].move_to_end(client_id)
+        else:
+            del _queues[priority][client_id]
+
+        if ticket["deadline"] <= now:
+            ticket["expired"] = True
+            _stats[priority]["expired"] += 1
+            ticket["notify"].set()
+            continue
+
+        _grant(ticket, now)
+        ticket["notify"].set()
+
+
+def _next_class() -> str:
+    """
+    Pick the class that gets the next slot (caller holds the lock).
+
+    Returns:
+        str: Priority class name with waiters
+    """
+    waiting = [name for name in PRIORITY_CLASSES if _queued[name]]
+    if not any(_credits[name] > 0 for name in waiting):
+        for name, config in PRIORITY_CLASSES.items():
+            _credits[name] = config["weight"]
+
+    for name in waiting:
+        if _credits[name] > 0:
+            _credits[name] -= 1
+            return name
+    return waiting[0]
+
+
+def _grant(ticket: Dict, now: float):
+    """
+    Mark a ticket admitted (caller holds the lock).
+
+    Args:
+        ticket: Ticket to admit
+        now: Current timestamp
+    """
+    global _active
+
+    _active += 1
+    ticket["granted"] = True
+    ticket["admitted_at"] = now
+    _stats[ticket["priority"]]["admitted"] += 1
+
+
+def _remove_waiter(ticket: Dict):
+    """
+    Take a ticket out of its client queue (caller holds the lock).
+
+    Args:
+        ticket: Queued ticket
+    """
+    client_queue = _queues[ticket["priority"]].get(ticket["client_id"])
+    if client_queue is None or ticket not in client_queue:
+        return
+
+    client_queue.remove(ticket)
+    _queued[ticket["priority"]] -= 1
+    if not client_queue:
+        del _queues[ticket["priority"]][ticket["client_id"]]
+
+
+def _rejection(error: str) -> Dict:
+    """
+    Build a rejection with a Retry-After estimate from the current backlog
+    (caller holds the lock).
+
+    Args:
+        error: Message for the client
+
+    Returns:
+        dict: {"error": str, "retry_after": int}
+    """
+    backlog = sum(_queued.values()) + 1
+    estimate = math.ceil(backlog * _service_seconds / MAX_CONCURRENT_REQUESTS)
+    return {
+        "error": error,
+        "retry_after": min(max(estimate, MIN_RETRY_AFTER_SECONDS), MAX_RETRY_AFTER_SECONDS),
+    }
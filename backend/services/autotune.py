@@ -0,0 +1,310 @@
+"""
+Autotuning of how the Swin model is executed on this host.
+
+The fastest mix of numeric precision, execution backend, intra-op thread
+count and batch size depends on the CPU (bf16 only pays off with
+AVX512-BF16 or AMX, dynamic int8 with VNNI, ...). autotune_execution()
+benchmarks the variants on synthetic inputs, drops any whose top-k
+predictions drift from the eager fp32 reference by more than
+AUTOTUNE_MIN_TOPK_AGREEMENT allows, and returns the fastest. Results are
+saved in AUTOTUNE_RESULTS_PATH per host fingerprint and model
+architecture, so later startups on the same host reuse them without
+re-tuning.
+
+Variants only replace the backbone (forward_features); the pooling head
+and classifier stay in fp32 eager mode, so pooled embeddings and class
+activation maps keep working.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import torch
+import torch.nn as nn
+
+from .input_buffers import BUFFER_BATCH_BUCKETS
+from utils.structured_logging import get_logger
+
+log = get_logger("model")
+
+# Configuration
+AUTOTUNE_RESULTS_PATH = "models/autotune.json"  # Tuned configurations per host fingerprint and model
+PRECISIONS = ("fp32", "bf16", "int8")
+BACKENDS = ("eager", "torchscript")
+AUTOTUNE_SAMPLES = max(BUFFER_BATCH_BUCKETS)  # Synthetic images checked for agreement (also the largest batch timed)
+AUTOTUNE_TOP_K = 5
+AUTOTUNE_MIN_TOPK_AGREEMENT = 0.9  # Mean share of each reference top-k a variant must reproduce
+AUTOTUNE_REPEATS = 5  # Timed runs per measurement (the median is used)
+
+DEFAULT_EXECUTION_CONFIG = {
+    "precision": "fp32",
+    "backend": "eager",
+    "threads": None,  # None keeps torch's default
+    "batch_size": None,  # None keeps the per-use defaults (TILE_BATCH_SIZE, EMBEDDING_BATCH_SIZE)
+}
+
+
+def host_fingerprint() -> Dict:
+    """
+    Describe what execution speed depends on: CPU model, usable cores,
+    the instruction set torch dispatches to, and the torch build.
+
+    Returns:
+        dict: {"id": short hash, plus the fields it was computed from}
+    """
+    cpu_model = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_model = next(
+                (line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu_model
+            )
+    except OSError:
+        pass
+
+    details = {
+        "machine": platform.machine(),
+        "cpu_model": cpu_model,
+        "cpus": _usable_cpus(),
+        "cpu_capability": torch.backends.cpu.get_cpu_capability(),
+        "torch": torch.__version__,
+    }
+    digest = hashlib.sha256(json.dumps(details, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"id": digest[:16], **details}
+
+
+def _usable_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def load_execution_config(model_name: str, path: str = AUTOTUNE_RESULTS_PATH) -> Optional[Dict]:
+    """
+    Look up the tuning result saved for this host and model architecture.
+
+    Args:
+        model_name: timm model name
+        path: Results file
+
+    Returns:
+        dict: Result of autotune_execution, or None if this host was not tuned
+    """
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return results.get(host_fingerprint()["id"], {}).get("models", {}).get(model_name)
+
+
+def save_execution_config(model_name: str, result: Dict, path: str = AUTOTUNE_RESULTS_PATH):
+    """
+    Save a tuning result for this host and model architecture, keeping the
+    results of other hosts and models in the file.
+
+    Args:
+        model_name: timm model name
+        result: Result of autotune_execution
+        path: Results file
+    """
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        results = {}
+
+    host = host_fingerprint()
+    entry = results.setdefault(host["id"], {"host": host, "models": {}})
+    entry["host"] = host
+    entry["models"][model_name] = result
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(results, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def available_precisions() -> List[str]:
+    """
+    Precisions this torch build can run on the CPU.
+
+    Returns:
+        list: Subset of PRECISIONS
+    """
+    precisions = ["fp32", "bf16"]
+    if torch.backends.quantized.supported_engines != ["none"]:
+        precisions.append("int8")
+    return precisions
+
+
+def apply_execution_config(model: nn.Module, config: Dict, input_shape: tuple) -> nn.Module:
+    """
+    Convert the backbone of an eval-mode model in place.
+
+    Args:
+        model: timm model (forward_features, forward_head, get_classifier)
+        config: Execution configuration (see DEFAULT_EXECUTION_CONFIG)
+        input_shape: (channels, height, width) of one input image, for tracing
+
+    Returns:
+        nn.Module: The same model
+    """
+    precision = config.get("precision", "fp32")
+    backend = config.get("backend", "eager")
+    if precision == "fp32" and backend == "eager":
+        return model
+
+    head = model.get_classifier()
+    if precision == "int8":
+        # Dynamic int8 for the backbone's linear layers. SwinV2 attention
+        # reads qkv.weight directly, so those stay in fp32
+        spec = {
+            name: torch.ao.quantization.default_dynamic_qconfig
+            for name, module in model.named_modules()
+            if isinstance(module, nn.Linear) and module is not head and not name.endswith("qkv")
+        }
+        torch.ao.quantization.quantize_dynamic(model, spec, dtype=torch.qint8, inplace=True)
+    elif precision == "bf16":
+        for name, child in model.named_children():
+            if not any(module is head for module in child.modules()):
+                child.to(torch.bfloat16)
+
+    input_dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+    backbone = model.forward_features
+    if backend == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace_module(
+                model, {"forward_features": torch.zeros((1, *input_shape), dtype=input_dtype)}, check_trace=False
+            )
+        backbone = torch.jit.freeze(traced, preserved_attrs=["forward_features"]).forward_features
+
+    if precision == "bf16":
+        model.forward_features = lambda batch: backbone(batch.to(torch.bfloat16)).float()
+    elif backend == "torchscript":
+        model.forward_features = backbone
+    return model
+
+
+def autotune_execution(
+    model: nn.Module,
+    forward: Callable[[nn.Module, torch.Tensor], torch.Tensor],
+    input_shape: tuple,
+    thread_counts: Optional[List[int]] = None
+) -> Dict:
+    """
+    Benchmark the execution variants of a model and pick the fastest one
+    whose predictions agree with the model as given (eager fp32).
+
+    Every precision and backend is checked for top-k agreement once, then
+    timed on single images (the latency-critical case) at each thread
+    count. The winner's batch size is the one with the lowest time per
+    image among the input buffer buckets. The given model is not modified.
+
+    Args:
+        model: Eval-mode reference model
+        forward: (model, batch) -> logits
+        input_shape: (channels, height, width) of one input image
+        thread_counts: Intra-op thread counts to try (default: 1, half and all usable CPUs)
+
+    Returns:
+        dict: {"config": winning configuration, "latency_ms", "agreement",
+            "variants": every measured variant, "host", "tuned_at", "tune_seconds"}
+    """
+    tune_start = time.time()
+    cpus = _usable_cpus()
+    thread_counts = thread_counts or sorted({1, max(1, cpus // 2), cpus})
+    default_threads = torch.get_num_threads()
+    samples = torch.randn((AUTOTUNE_SAMPLES, *input_shape), generator=torch.Generator().manual_seed(0))
+
+    variants = []
+    best = None
+    try:
+        with torch.no_grad():
+            logits = forward(model, samples)
+            top_k = min(AUTOTUNE_TOP_K, logits.shape[1])
+            reference = logits.topk(top_k, dim=1).indices
+
+            for precision in available_precisions():
+                for backend in BACKENDS:
+                    config = {**DEFAULT_EXECUTION_CONFIG, "precision": precision, "backend": backend}
+                    try:
+                        candidate = apply_execution_config(copy.deepcopy(model), config, input_shape)
+                        torch.set_num_threads(default_threads)
+                        predicted = forward(candidate, samples).topk(top_k, dim=1).indices
+                    except Exception as e:
+                        log.info("Autotune variant unavailable", precision=precision, backend=backend, error=str(e))
+                        continue
+
+                    agreement = _topk_agreement(reference, predicted)
+                    if agreement < AUTOTUNE_MIN_TOPK_AGREEMENT:
+                        variants.append({**config, "agreement": agreement, "rejected": True})
+                        log.info("Autotune variant rejected", precision=precision, backend=backend, agreement=agreement)
+                        continue
+
+                    for threads in thread_counts:
+                        torch.set_num_threads(threads)
+                        latency_ms = _median_ms(forward, candidate, samples[:1])
+                        variants.append({**config, "threads": threads, "agreement": agreement, "latency_ms": latency_ms})
+                        log.info("Autotune variant", precision=precision, backend=backend, threads=threads,
+                                 latency_ms=latency_ms, agreement=agreement)
+                        if best is None or latency_ms < best[0]["latency_ms"]:
+                            best = (variants[-1], candidate)
+
+            if best is None:
+                raise RuntimeError("no execution variant ran")
+
+            winner, candidate = best
+            torch.set_num_threads(winner["threads"])
+            per_image_ms = {
+                batch_size: _median_ms(forward, candidate, samples[:batch_size]) / batch_size
+                for batch_size in BUFFER_BATCH_BUCKETS
+            }
+    finally:
+        torch.set_num_threads(default_threads)
+
+    config = {key: winner[key] for key in DEFAULT_EXECUTION_CONFIG}
+    config["batch_size"] = min(per_image_ms, key=per_image_ms.get)
+    result = {
+        "config": config,
+        "latency_ms": winner["latency_ms"],
+        "agreement": winner["agreement"],
+        "per_image_ms": {str(size): round(ms, 1) for size, ms in per_image_ms.items()},
+        "variants": variants,
+        "host": host_fingerprint(),
+        "tuned_at": datetime.now().isoformat(),
+        "tune_seconds": round(time.time() - tune_start, 1),
+    }
+    log.info("Autotuned", **config, latency_ms=winner["latency_ms"], tune_s=result["tune_seconds"])
+    return result
+
+
+def _topk_agreement(reference: torch.Tensor, predicted: torch.Tensor) -> float:
+    """
+    Mean share of each reference top-k (as a set) that is also in the variant's top-k.
+    """
+    shares = [
+        len(set(expected) & set(actual)) / len(expected)
+        for expected, actual in zip(reference.tolist(), predicted.tolist())
+    ]
+    return round(sum(shares) / len(shares), 4)
+
+
+def _median_ms(forward: Callable, model: nn.Module, batch: torch.Tensor) -> float:
+    """
+    Median wall time of a forward pass after one warm-up run.
+    """
+    forward(model, batch)
+    timings = []
+    for _ in range(AUTOTUNE_REPEATS):
+        start = time.perf_counter()
+        forward(model, batch)
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings) * 1000, 1)
@@ -0,0 +1,365 @@
+"""
+Chat Session Service for server-side follow-up conversations.
+Keeps the full history per session, folds older turns into a compact
+summary, and tracks the estimated prompt size so each /chat request only
+needs to carry the new message.
+
+Sessions live in the shared storage backend, so any replica can answer the
+next message of a conversation. Session capacity is the backend's (the
+memory:// backend keeps the 1000 most recently used).
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from .gemini_service import (
+    generate_chat_response,
+    generate_chat_response_async,
+    summarize_conversation,
+)
+from .storage_backend import storage_get, storage_set
+
+# Serializes read-modify-write of sessions within this process; replicas
+# writing the same session concurrently resolve last-writer-wins
+_sessions_lock = threading.Lock()
+
+# Session limits
+CHAT_SESSION_NAMESPACE = "chat"
+CHAT_SESSION_TTL_SECONDS = 60 * 60  # Drop sessions idle for more than 1 hour
+COMPACTION_STALE_SECONDS = 120  # Ignore a compaction marker older than this (its replica died)
+
+# Compaction: recent turns stay verbatim, older ones are folded into the summary
+RECENT_MESSAGES_KEPT = 6  # Messages always sent verbatim
+COMPACTION_TRIGGER_MESSAGES = 10  # Compact once this many verbatim messages pile up
+PROMPT_TOKEN_BUDGET = 1500  # Compact early if the estimated prompt exceeds this
+EXPLANATION_CONTEXT_CHARS = 500  # Initial explanation characters kept as context
+FALLBACK_SUMMARY_MAX_CHARS = 1200  # Cap for the summary when Gemini is unavailable
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the token count of a text (about 4 characters per token).
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Estimated number of tokens
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def create_chat_session(analysis_context: dict = None, conversation_history: list = None) -> str:
+    """
+    Create a new chat session seeded with an analysis and optional history.
+
+    Args:
+        analysis_context: Context from initial analysis {"condition": str, "confidence": float, "explanation": str}
+        conversation_history: Existing messages [{"role": "user"|"assistant", "content": str}]
+
+    Returns:
+        str: The new session ID
+    """
+    analysis_context = dict(analysis_context or {})
+    if analysis_context.get("explanation"):
+        analysis_context["explanation"] = analysis_context["explanation"][:EXPLANATION_CONTEXT_CHARS]
+
+    now = time.time()
+    session_id = uuid.uuid4().hex
+    session = {
+        "id": session_id,
+        "analysis_context": analysis_context,
+        "summary": "",
+        "messages": [
+            {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+            for msg in (conversation_history or [])
+        ],
+        "archived_messages": [],
+        "summarized_messages": 0,
+        "total_messages": len(conversation_history or []),
+        "compacting_since": None,
+        "created_at": now,
+        "last_active": now,
+    }
+
+    _save_session(session)
+    return session_id
+
+
+def get_chat_session(session_id: str) -> Optional[Dict]:
+    """
+    Get a copy of a session's state.
+
+    Args:
+        session_id: Session ID returned by create_chat_session
+
+    Returns:
+        dict: Session state, or None if the session does not exist or expired
+    """
+    return storage_get(CHAT_SESSION_NAMESPACE, session_id)
+
+
+def generate_session_reply(session_id: str, user_message: str) -> Dict:
+    """
+    Answer a follow-up question within a session.
+    The prompt is built from the stored analysis context, the compact summary
+    and the recent verbatim turns. Older turns are compacted in the background
+    after the reply so compaction never adds to the user's latency.
+
+    Args:
+        session_id: Session ID returned by create_chat_session
+        user_message: The user's follow-up question
+
+    Returns:
+        dict: Result dictionary with format:
+            {
+                "success": bool,
+                "explanation": str (if success) or None,
+                "error": str (if failed) or None,
+                "prompt_tokens": int (estimated prompt size)
+            }
+    """
+    chat_args = _begin_session_reply(session_id, user_message)
+    if chat_args is None:
+        return _session_not_found()
+
+    result = generate_chat_response(**chat_args)
+    return _finish_session_reply(session_id, user_message, result, chat_args)
+
+
+async def generate_session_reply_async(session_id: str, user_message: str) -> Dict:
+    """
+    Async variant of generate_session_reply for the ASGI server.
+
+    Args:
+        session_id: Session ID returned by create_chat_session
+        user_message: The user's follow-up question
+
+    Returns:
+        dict: Same format as generate_session_reply
+    """
+    # Session reads and writes may be network round trips, so they stay off the loop
+    chat_args = await asyncio.to_thread(_begin_session_reply, session_id, user_message)
+    if chat_args is None:
+        return _session_not_found()
+
+    result = await generate_chat_response_async(**chat_args)
+    return await asyncio.to_thread(_finish_session_reply, session_id, user_message, result, chat_args)
+
+
+def _begin_session_reply(session_id: str, user_message: str) -> Optional[Dict]:
+    """
+    Snapshot the session context needed to answer a new message.
+
+    Args:
+        session_id: Session ID
+        user_message: The user's follow-up question
+
+    Returns:
+        dict: Keyword arguments for generate_chat_response, or None if the session is gone
+    """
+    session = get_chat_session(session_id)
+    if session is None:
+        return None
+    return {
+        "user_message": user_message,
+        "conversation_history": session["messages"],
+        "analysis_context": session["analysis_context"],
+        "conversation_summary": session["summary"],
+        "max_history_messages": None,
+    }
+
+
+def _finish_session_reply(session_id: str, user_message: str, result: Dict, chat_args: Dict) -> Dict:
+    """
+    Record a successful reply in the session and schedule compaction if needed.
+
+    Args:
+        session_id: Session ID
+        user_message: The user's follow-up question
+        result: Result of generate_chat_response
+        chat_args: Arguments the reply was generated with
+
+    Returns:
+        dict: The result with the estimated prompt size added
+    """
+    result["prompt_tokens"] = _estimate_prompt_tokens(
+        chat_args["analysis_context"],
+        chat_args["conversation_summary"],
+        chat_args["conversation_history"],
+        user_message,
+    )
+
+    if not result["success"]:
+        return result
+
+    with _sessions_lock:
+        session = get_chat_session(session_id)
+        if session is None:
+            return result
+        now = time.time()
+        session["messages"].append({"role": "user", "content": user_message})
+        session["messages"].append({"role": "assistant", "content": result["explanation"]})
+        session["total_messages"] += 2
+        session["last_active"] = now
+        needs_compaction = _needs_compaction(session) and not _is_compacting(session, now)
+        if needs_compaction:
+            session["compacting_since"] = now
+        _save_session(session)
+
+    if needs_compaction:
+        threading.Thread(target=compact_chat_session, args=(session_id,), daemon=True).start()
+
+    return result
+
+
+def _session_not_found() -> Dict:
+    """
+    Build the result for an unknown or expired session.
+
+    Returns:
+        dict: Failed chat result
+    """
+    return {
+        "success": False,
+        "explanation": None,
+        "error": "Chat session not found or expired",
+    }
+
+
+def compact_chat_session(session_id: str) -> bool:
+    """
+    Fold the oldest verbatim turns of a session into its running summary.
+    Uses Gemini when available and a truncating fallback otherwise.
+
+    Args:
+        session_id: Session ID returned by create_chat_session
+
+    Returns:
+        bool: True if any turns were compacted
+    """
+    session = get_chat_session(session_id)
+    if session is None:
+        return False
+    fold_count = max(len(session["messages"]) - RECENT_MESSAGES_KEPT, 0)
+    to_fold = session["messages"][:fold_count]
+    previous_summary = session["summary"]
+
+    summary = None
+    if to_fold:
+        # Summarize without holding the lock - other turns may be appended meanwhile
+        summary_result = summarize_conversation(previous_summary, to_fold)
+        if summary_result["success"]:
+            summary = summary_result["summary"]
+        else:
+            summary = _fallback_summary(previous_summary, to_fold)
+
+    # Re-read: the stored session may have gained turns while summarizing
+    with _sessions_lock:
+        session = get_chat_session(session_id)
+        if session is None:
+            return False
+        folded = summary is not None and session["messages"][:fold_count] == to_fold
+        if folded:
+            # Folded turns leave the prompt but stay in the session's full history
+            session["archived_messages"].extend(to_fold)
+            session["messages"] = session["messages"][fold_count:]
+            session["summary"] = summary
+            session["summarized_messages"] += fold_count
+        session["compacting_since"] = None
+        _save_session(session)
+
+    return folded
+
+
+def _save_session(session: Dict):
+    """
+    Write a session back, restarting its idle expiry.
+
+    Args:
+        session: Session state
+    """
+    storage_set(CHAT_SESSION_NAMESPACE, session["id"], session, CHAT_SESSION_TTL_SECONDS)
+
+
+def _is_compacting(session: Dict, now: float) -> bool:
+    """
+    Check whether a compaction of the session is already running somewhere.
+
+    Args:
+        session: Session state
+        now: Current timestamp
+
+    Returns:
+        bool: True if a recent compaction marker is set
+    """
+    started = session.get("compacting_since")
+    return started is not None and now - started < COMPACTION_STALE_SECONDS
+
+
+def _needs_compaction(session: Dict) -> bool:
+    """
+    Check whether a session has outgrown its verbatim history or token budget.
+
+    Args:
+        session: Stored session
+
+    Returns:
+        bool: True if older turns should be folded into the summary
+    """
+    if len(session["messages"]) <= RECENT_MESSAGES_KEPT:
+        return False
+
+    if len(session["messages"]) >= COMPACTION_TRIGGER_MESSAGES:
+        return True
+
+    estimated = _estimate_prompt_tokens(session["analysis_context"], session["summary"], session["messages"], "")
+    return estimated > PROMPT_TOKEN_BUDGET
+
+
+def _estimate_prompt_tokens(analysis_context: dict, summary: str, messages: list, user_message: str) -> int:
+    """
+    Estimate the prompt size generate_chat_response will send.
+
+    Args:
+        analysis_context: Stored analysis context
+        summary: Running summary of earlier turns
+        messages: Recent verbatim turns
+        user_message: The new question
+
+    Returns:
+        int: Estimated number of prompt tokens
+    """
+    explanation = (analysis_context or {}).get("explanation") or ""
+    history_chars = sum(len(msg["content"]) + 12 for msg in messages)
+    fixed_instructions_tokens = 80
+    return (
+        estimate_tokens(explanation)
+        + estimate_tokens(summary)
+        + estimate_tokens(user_message)
+        + (history_chars + 3) // 4
+        + fixed_instructions_tokens
+    )
+
+
+def _fallback_summary(previous_summary: str, messages: list) -> str:
+    """
+    Build a truncated summary when Gemini summarization is unavailable.
+
+    Args:
+        previous_summary: Existing summary
+        messages: Turns to fold in
+
+    Returns:
+        str: Summary capped at FALLBACK_SUMMARY_MAX_CHARS (most recent content kept)
+    """
+    lines = [previous_summary] if previous_summary else []
+    for msg in messages:
+        speaker = "User" if msg["role"] == "user" else "Assistant"
+        lines.append(f"{speaker}: {msg['content'][:200]}")
+
+    summary = "\n".join(lines)
+    return summary[-FALLBACK_SUMMARY_MAX_CHARS:]
@@ -0,0 +1,220 @@
+"""
+Explanation Library for precomputed condition explanations.
+Stores reference explanations for single conditions and common pairs of
+conditions in one compact indexed file, so explanations can be served
+without calling Gemini.
+
+File layout:
+    MAGIC (8 bytes) | index length (4 bytes, big-endian) | JSON index | data
+The index maps each key to [offset, length] of a zlib-compressed UTF-8
+explanation inside the data section.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+from utils.structured_logging import get_logger
+
+log = get_logger("library")
+
+
+# Global library instance (loaded on startup)
+_index = {}
+_data = None  # mmap of the library file
+_data_offset = 0
+_library_path = None
+_library_lock = threading.Lock()
+
+# File format
+LIBRARY_MAGIC = b"EXPLIB1\n"
+PAIR_SEPARATOR = "||"
+
+
+def make_library_key(conditions: List[str]) -> str:
+    """
+    Build the library key for one condition or a pair of conditions.
+    Pairs are ordered: the pair explanation treats the first condition as
+    the primary diagnosis, so [a, b] and [b, a] are separate entries.
+
+    Args:
+        conditions: One or two condition names, most likely first
+
+    Returns:
+        str: Library key
+    """
+    if len(conditions) == 1:
+        return conditions[0]
+    return PAIR_SEPARATOR.join(conditions[:2])
+
+
+def load_explanation_library(library_path: str = "models/explanation_library.bin") -> bool:
+    """
+    Load the library index and memory-map its data section.
+
+    Args:
+        library_path: Path to the library file
+
+    Returns:
+        bool: True if the library loaded successfully, False otherwise
+    """
+    global _index, _data, _data_offset, _library_path
+
+    _library_path = library_path
+
+    if not os.path.exists(library_path):
+        log.info("Explanation library not found - build it with: python -m scripts.build_explanation_library", library_path=library_path)
+        return False
+
+    try:
+        with open(library_path, "rb") as f:
+            if f.read(len(LIBRARY_MAGIC)) != LIBRARY_MAGIC:
+                raise ValueError("not an explanation library file")
+            (index_length,) = struct.unpack(">I", f.read(4))
+            index = json.loads(f.read(index_length).decode("utf-8"))
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        with _library_lock:
+            _index = index
+            _data = data
+            _data_offset = len(LIBRARY_MAGIC) + 4 + index_length
+
+        singles = sum(1 for key in index if PAIR_SEPARATOR not in key)
+        log.info("Explanation library loaded", conditions=singles, pairs=len(index) - singles)
+        return True
+
+    except Exception as e:
+        log.error("Failed to load explanation library", library_path=library_path, error=str(e))
+        _index = {}
+        _data = None
+        return False
+
+
+def is_library_loaded() -> bool:
+    """
+    Check if the explanation library is loaded.
+
+    Returns:
+        bool: True if the library is loaded, False otherwise
+    """
+    return _data is not None and bool(_index)
+
+
+def get_library_explanation(key: str) -> Optional[str]:
+    """
+    Read a single explanation from the library.
+
+    Args:
+        key: Library key (see make_library_key)
+
+    Returns:
+        str: Explanation text, or None if the key is not in the library
+    """
+    with _library_lock:
+        entry = _index.get(key)
+        if entry is None or _data is None:
+            return None
+        offset, length = entry
+        start = _data_offset + offset
+        compressed = _data[start:start + length]
+
+    return zlib.decompress(compressed).decode("utf-8")
+
+
+def lookup_explanation(detections: list) -> Optional[str]:
+    """
+    Find the best precomputed explanation for a list of detections.
+    Prefers the pair of the top two conditions, then the top condition alone.
+
+    Args:
+        detections: List of detection dictionaries with 'rash_label', ranked
+
+    Returns:
+        str: Explanation text, or None if nothing matches
+    """
+    if not is_library_loaded() or not detections:
+        return None
+
+    labels = [detection.get("rash_label") for detection in detections[:2]]
+    if len(labels) == 2 and labels[1]:
+        explanation = get_library_explanation(make_library_key(labels))
+        if explanation:
+            return explanation
+
+    return get_library_explanation(make_library_key(labels[:1]))
+
+
+def read_library_entries(library_path: str) -> Dict[str, str]:
+    """
+    Read every entry of a library file (used when extending a library).
+
+    Args:
+        library_path: Path to the library file
+
+    Returns:
+        dict: Mapping of key to explanation text (empty if the file is missing)
+    """
+    if not os.path.exists(library_path):
+        return {}
+
+    with open(library_path, "rb") as f:
+        if f.read(len(LIBRARY_MAGIC)) != LIBRARY_MAGIC:
+            raise ValueError(f"Not an explanation library file: {library_path}")
+        (index_length,) = struct.unpack(">I", f.read(4))
+        index = json.loads(f.read(index_length).decode("utf-8"))
+        data = f.read()
+
+    return {
+        key: zlib.decompress(data[offset:offset + length]).decode("utf-8")
+        for key, (offset, length) in index.items()
+    }
+
+
+def write_explanation_library(library_path: str, entries: Dict[str, str]):
+    """
+    Write a library file atomically (written to a temp file, then renamed).
+
+    Args:
+        library_path: Destination path
+        entries: Mapping of key to explanation text
+    """
+    index = {}
+    blobs = []
+    offset = 0
+    for key in sorted(entries):
+        blob = zlib.compress(entries[key].encode("utf-8"), 9)
+        index[key] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    temp_path = library_path + ".tmp"
+
+    with open(temp_path, "wb") as f:
+        f.write(LIBRARY_MAGIC)
+        f.write(struct.pack(">I", len(index_bytes)))
+        f.write(index_bytes)
+        for blob in blobs:
+            f.write(blob)
+
+    os.replace(temp_path, library_path)
+
+
+def get_library_info() -> Dict:
+    """
+    Get information about the loaded explanation library.
+
+    Returns:
+        dict: Library status and entry counts
+    """
+    singles = sum(1 for key in _index if PAIR_SEPARATOR not in key)
+    return {
+        "loaded": is_library_loaded(),
+        "path": _library_path,
+        "conditions": singles,
+        "pairs": len(_index) - singles,
+    }
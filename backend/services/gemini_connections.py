@@ -0,0 +1,342 @@
+"""
+Warm, pooled gRPC connections to the Gemini API.
+
+google.generativeai opens its channel lazily, so the first explanation
+after startup (or after the channel went idle) pays for DNS, TCP, TLS and
+HTTP/2 setup inside the user's latency. PooledGeminiModel instead owns a
+small pool of channels that are connected at startup and kept open with
+keepalive pings, and calls are spread over them by in-flight count. Each
+call records how long it waited for a connection separately from how long
+generation took, so connection setup can be seen (and kept out of p50).
+
+The synchronous pool is created with the model; grpc.aio channels belong
+to an event loop, so the async pool is created on the running loop by
+preconnect_async() (or lazily by the first async call).
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import grpc
+import numpy as np
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.ai.generativelanguage_v1beta.services.generative_service.transports import (
+    GenerativeServiceGrpcTransport,
+    GenerativeServiceGrpcAsyncIOTransport,
+)
+from google.api_core import exceptions as google_exceptions
+from google.api_core import retry as retries
+from google.auth import api_key as api_key_credentials
+
+from utils.structured_logging import get_logger
+
+log = get_logger("gemini")
+
+# Configuration
+DEFAULT_API_ENDPOINT = "generativelanguage.googleapis.com"
+CONNECTION_POOL_SIZE = 2  # Channels (one HTTP/2 connection each) kept warm per pool
+KEEPALIVE_TIME_MS = 60 * 1000  # Ping idle connections this often so proxies and NATs keep them open
+KEEPALIVE_TIMEOUT_MS = 10 * 1000  # Reconnect if a ping is not answered within this
+CONNECT_TIMEOUT_SECONDS = 10  # Longest wait for a connection, at pre-connect or per call
+CALL_STATS_WINDOW = 1000  # Recent calls summarized in the stats
+
+# Retries of an unavailable API, as in the client's default policy, but
+# bounded by the call's own timeout instead of the default 600s
+RETRY_INITIAL_SECONDS = 1.0
+RETRY_MAX_SECONDS = 10.0
+RETRY_MULTIPLIER = 1.3
+
+CONNECT_TIMEOUT_MESSAGE = "Connection timeout - Gemini API is unreachable"
+
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", KEEPALIVE_TIME_MS),
+    ("grpc.keepalive_timeout_ms", KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    # Never drop the connection for being idle; keepalive decides when it is dead
+    ("grpc.client_idle_timeout_ms", 2 ** 31 - 1),
+    # Separate connections per channel (grpc shares them between identical channels otherwise)
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+]
+
+
+class _Connection:
+    """
+    One pooled channel and the GenerativeModel bound to it.
+    """
+
+    def __init__(self, channel, model):
+        self.channel = channel
+        self.model = model
+        self.in_flight = 0
+        self.connects = 0
+        self.state = None
+
+
+class PooledGeminiModel:
+    """
+    Gemini model whose calls go over a pool of pre-connected channels.
+
+    Args:
+        model_name: Gemini model name
+        api_key: API key (sent with every call; unused for plaintext endpoints)
+        endpoint: "host[:port]" of the API, or "http://host:port" for a
+            plaintext server such as a local mock
+        pool_size: Channels per pool
+    """
+
+    def __init__(self, model_name: str, api_key: Optional[str], endpoint: str = DEFAULT_API_ENDPOINT,
+                 pool_size: int = CONNECTION_POOL_SIZE):
+        self.model_name = model_name
+        self.plaintext = endpoint.startswith("http://")
+        host = endpoint.split("://", 1)[-1]
+        self.target = host if ":" in host else f"{host}:443"
+        self.credentials = api_key_credentials.Credentials(api_key) if api_key and not self.plaintext else None
+        self.pool_size = pool_size
+
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=CALL_STATS_WINDOW)  # (connect seconds, generation seconds)
+        self._stats = {"calls": 0, "cold_calls": 0, "errors": 0, "preconnect_ms": None}
+        self._connections = [self._connect_sync(index) for index in range(pool_size)]
+        self._async_connections = []
+        self._async_loop = None
+
+    def _connect_sync(self, index: int) -> _Connection:
+        if self.plaintext:
+            channel = grpc.insecure_channel(self.target, options=CHANNEL_OPTIONS)
+        else:
+            channel = GenerativeServiceGrpcTransport.create_channel(
+                self.target, credentials=self.credentials, options=CHANNEL_OPTIONS
+            )
+        client = glm.GenerativeServiceClient(
+            transport=GenerativeServiceGrpcTransport(host=self.target, channel=channel)
+        )
+        connection = _Connection(channel, self._bound_model(client=client))
+        # Track connectivity without forcing a connect (transitions are logged)
+        channel.subscribe(lambda state: self._on_state_change(index, connection, state), try_to_connect=False)
+        return connection
+
+    def _connect_async(self) -> _Connection:
+        if self.plaintext:
+            channel = grpc.aio.insecure_channel(self.target, options=CHANNEL_OPTIONS)
+        else:
+            channel = GenerativeServiceGrpcAsyncIOTransport.create_channel(
+                self.target, credentials=self.credentials, options=CHANNEL_OPTIONS
+            )
+        client = glm.GenerativeServiceAsyncClient(
+            transport=GenerativeServiceGrpcAsyncIOTransport(host=self.target, channel=channel)
+        )
+        return _Connection(channel, self._bound_model(async_client=client))
+
+    def _bound_model(self, client=None, async_client=None):
+        model = genai.GenerativeModel(self.model_name)
+        # GenerativeModel creates default clients only while these are unset
+        model._client = client
+        model._async_client = async_client
+        return model
+
+    def _on_state_change(self, index: int, connection: _Connection, state):
+        previous, connection.state = connection.state, state
+        if state == grpc.ChannelConnectivity.READY:
+            connection.connects += 1
+            if connection.connects > 1:
+                log.info("Gemini connection re-established", connection=index, connects=connection.connects)
+        elif previous == grpc.ChannelConnectivity.READY:
+            log.info("Gemini connection lost", connection=index, state=state.name)
+
+    def preconnect(self, timeout: float = CONNECT_TIMEOUT_SECONDS) -> int:
+        """
+        Connect every synchronous channel.
+
+        Args:
+            timeout: Seconds to wait for each channel
+
+        Returns:
+            int: Channels connected
+        """
+        start_time = time.time()
+        ready = 0
+        for connection in self._connections:
+            try:
+                grpc.channel_ready_future(connection.channel).result(timeout=timeout)
+                ready += 1
+            except grpc.FutureTimeoutError:
+                pass
+        self._stats["preconnect_ms"] = round((time.time() - start_time) * 1000, 1)
+        return ready
+
+    async def preconnect_async(self, timeout: float = CONNECT_TIMEOUT_SECONDS) -> int:
+        """
+        Create the async pool on the running event loop and connect it.
+
+        Args:
+            timeout: Seconds to wait for the channels
+
+        Returns:
+            int: Channels connected
+        """
+        connections = self._async_pool()
+        results = await asyncio.gather(
+            *(asyncio.wait_for(connection.channel.channel_ready(), timeout) for connection in connections),
+            return_exceptions=True,
+        )
+        return sum(1 for result in results if not isinstance(result, BaseException))
+
+    def _async_pool(self) -> List[_Connection]:
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_connections = [self._connect_async() for _ in range(self.pool_size)]
+            self._async_loop = loop
+        return self._async_connections
+
+    def generate_content(self, prompt, **kwargs):
+        kwargs = _bound_retries(kwargs)
+        connection = self._checkout(self._connections)
+        try:
+            start_time = time.time()
+            if connection.state != grpc.ChannelConnectivity.READY:
+                try:
+                    grpc.channel_ready_future(connection.channel).result(timeout=_connect_timeout(kwargs))
+                except grpc.FutureTimeoutError:
+                    raise ConnectionError(CONNECT_TIMEOUT_MESSAGE) from None
+            generation_start = time.time()
+            response = connection.model.generate_content(prompt, **kwargs)
+        except Exception:
+            self._record_error()
+            raise
+        finally:
+            self._checkin(connection)
+        self._record_call(generation_start - start_time, time.time() - generation_start)
+        return response
+
+    async def generate_content_async(self, prompt, **kwargs):
+        kwargs = _bound_retries(kwargs, retries.AsyncRetry)
+        connection = self._checkout(self._async_pool())
+        try:
+            start_time = time.time()
+            if connection.channel.get_state() != grpc.ChannelConnectivity.READY:
+                try:
+                    await asyncio.wait_for(connection.channel.channel_ready(), _connect_timeout(kwargs))
+                except asyncio.TimeoutError:
+                    raise ConnectionError(CONNECT_TIMEOUT_MESSAGE) from None
+            generation_start = time.time()
+            response = await connection.model.generate_content_async(prompt, **kwargs)
+        except Exception:
+            self._record_error()
+            raise
+        finally:
+            self._checkin(connection)
+        self._record_call(generation_start - start_time, time.time() - generation_start)
+        return response
+
+    def _checkout(self, connections: List[_Connection]) -> _Connection:
+        with self._lock:
+            connection = min(connections, key=lambda candidate: candidate.in_flight)
+            connection.in_flight += 1
+        return connection
+
+    def _checkin(self, connection: _Connection):
+        with self._lock:
+            connection.in_flight -= 1
+
+    def _record_call(self, connect_seconds: float, generation_seconds: float):
+        cold = connect_seconds > 0.001
+        with self._lock:
+            self._calls.append((connect_seconds, generation_seconds))
+            self._stats["calls"] += 1
+            self._stats["cold_calls"] += int(cold)
+        log.debug(
+            "Gemini call",
+            connect_ms=round(connect_seconds * 1000, 1),
+            generation_ms=round(generation_seconds * 1000, 1),
+            cold=cold,
+        )
+
+    def _record_error(self):
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def stats(self) -> Dict:
+        """
+        Get connection states and per-call connect vs. generation timings.
+
+        Returns:
+            dict: Endpoint, pool states, call counters and recent
+                connect_ms / generation_ms percentiles
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            calls = list(self._calls)
+            connections = [
+                {
+                    "state": connection.state.name.lower() if connection.state else "idle",
+                    "connects": connection.connects,
+                    "in_flight": connection.in_flight,
+                }
+                for connection in self._connections
+            ]
+
+        timings = {}
+        if calls:
+            for name, values in (("connect_ms", [call[0] for call in calls]), ("generation_ms", [call[1] for call in calls])):
+                values = np.array(values) * 1000
+                timings[f"{name}_p50"] = round(float(np.percentile(values, 50)), 1)
+                timings[f"{name}_p99"] = round(float(np.percentile(values, 99)), 1)
+
+        return {
+            "endpoint": self.target,
+            "pool_size": self.pool_size,
+            "keepalive_ms": KEEPALIVE_TIME_MS,
+            "connections": connections,
+            "async_connections": len(self._async_connections),
+            **stats,
+            **timings,
+        }
+
+
+def _bound_retries(kwargs: Dict, retry_class=retries.Retry) -> Dict:
+    """
+    Make a call's request timeout its total deadline, retries included.
+    The client's default policy retries an unavailable API for up to 600s
+    and applies the timeout to each attempt only.
+
+    Args:
+        kwargs: Keyword arguments of the generate_content call
+        retry_class: retries.Retry, or retries.AsyncRetry for async calls
+
+    Returns:
+        dict: The arguments, with a bounded retry policy if the call has a
+            timeout and no policy of its own
+    """
+    request_options = kwargs.get("request_options") or {}
+    timeout = request_options.get("timeout")
+    if timeout is None or "retry" in request_options:
+        return kwargs
+    retry = retry_class(
+        initial=RETRY_INITIAL_SECONDS,
+        maximum=RETRY_MAX_SECONDS,
+        multiplier=RETRY_MULTIPLIER,
+        predicate=retries.if_exception_type(google_exceptions.ServiceUnavailable),
+        timeout=timeout,
+    )
+    return {**kwargs, "request_options": {**request_options, "retry": retry}}
+
+
+def _connect_timeout(kwargs: Dict) -> float:
+    """
+    Bound the wait for a connection by the call's own deadline, if it has one.
+
+    Args:
+        kwargs: Keyword arguments of the generate_content call
+
+    Returns:
+        float: Seconds to wait for the channel
+    """
+    timeout = (kwargs.get("request_options") or {}).get("timeout")
+    return CONNECT_TIMEOUT_SECONDS if timeout is None else min(CONNECT_TIMEOUT_SECONDS, timeout)
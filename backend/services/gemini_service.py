@@ -3,11 +3,27 @@ Gemini API Service for generating AI explanations from YOLOv8 detection results.
 Handles API client initialization, prompt formatting, and explanation generation.
 """
 
+import asyncio
+import contextvars
 import os
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from typing import Dict, Optional
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from .admission_control import MAX_CONCURRENT_REQUESTS
+from .explanation_library import lookup_explanation
+from .gemini_connections import PooledGeminiModel, DEFAULT_API_ENDPOINT
+from .storage_backend import storage_get, storage_set, content_key
+from .traffic_capture import CapturingGeminiModel, ReplayGeminiModel
+from .tracing import span
+from utils.structured_logging import get_logger
+
+log = get_logger("gemini")
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,10 +31,42 @@ load_dotenv()
 # Global model instance (loaded on startup)
 _gemini_model = None
 _gemini_available = False
+_gemini_connections = None  # PooledGeminiModel behind _gemini_model (None in replay mode)
 
 # Configuration
 GEMINI_MODEL = "gemini-2.0-flash-001"  # Fast model optimized for speed
-TIMEOUT_SECONDS = 30  # API request timeout
+TIMEOUT_SECONDS = 30  # API request timeout (the RPC deadline unless the caller needs a shorter one)
+MIN_CALL_TIMEOUT_SECONDS = 0.05  # Shortest RPC deadline sent (a call started at its deadline fails fast)
+EXPLANATION_LATENCY_BUDGET_SECONDS = 6  # Serve the library entry if Gemini is slower than this
+EXPLANATION_CACHE_NAMESPACE = "explanations"  # Live explanations, keyed by prompt (see storage_backend)
+EXPLANATION_CACHE_TTL_SECONDS = 24 * 60 * 60
+GEMINI_REPLAY_PATH = os.getenv("GEMINI_REPLAY_PATH", "")  # Answer from a traffic capture instead of the API (see traffic_capture)
+GEMINI_REPLAY_LATENCY_SCALE = float(os.getenv("GEMINI_REPLAY_LATENCY_SCALE", "1.0"))  # Multiplier for recorded latencies
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", DEFAULT_API_ENDPOINT)  # "http://host:port" for a plaintext mock server
+
+# Hedged requests: when a call is slower than usual, a duplicate is sent and the first answer wins
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0"))  # Hedge calls slower than this percentile of recent latency (0 disables)
+HEDGE_MIN_DELAY_SECONDS = 0.5  # Never hedge sooner than this
+HEDGE_MIN_SAMPLES = 20  # Recent latencies needed before hedging starts
+HEDGE_LATENCY_WINDOW = 500  # Recent successful calls the percentile is taken over
+HEDGE_BUDGET_RATIO = 0.05  # Extra requests allowed per call (caps hedges at 5% of traffic)
+HEDGE_BUDGET_BURST = 5  # Hedges that may be fired back to back once the budget has built up
+
+# Primary and duplicate calls of hedged requests run here: both calls of
+# every admitted request, plus losers still on the wire after their request
+# returned (at most a budget burst), so calls never queue for a thread
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=2 * MAX_CONCURRENT_REQUESTS + HEDGE_BUDGET_BURST, thread_name_prefix="gemini-hedge"
+)
+
+# Hedging state
+_hedge_lock = threading.Lock()
+_call_latencies = deque(maxlen=HEDGE_LATENCY_WINDOW)
+_hedge_budget = float(HEDGE_BUDGET_BURST)
+_hedge_stats = {
+    "calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "budget_exhausted": 0,
+    "uncancelled_losers": 0,  # Sync losers already on the wire; they run to their deadline
+}
 
 # Generation config for faster responses
 GENERATION_CONFIG = {
@@ -28,6 +76,14 @@ GENERATION_CONFIG = {
     "max_output_tokens": 600,  # Increased for multiple conditions analysis
 }
 
+# Generation config for chat history summaries (short and factual)
+SUMMARY_GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 200,
+}
+
 
 def get_gemini_api_key() -> Optional[str]:
     """
@@ -51,14 +107,30 @@ def load_gemini_client() -> bool:
     Returns:
         bool: True if client initialized successfully, False otherwise
     """
-    global _gemini_model, _gemini_available
+    global _gemini_model, _gemini_available, _gemini_connections
+
+    if GEMINI_REPLAY_PATH:
+        try:
+            replay_model = ReplayGeminiModel(GEMINI_REPLAY_PATH, GEMINI_REPLAY_LATENCY_SCALE)
+        except OSError as e:
+            log.error("Failed to load Gemini replay capture", path=GEMINI_REPLAY_PATH, error=str(e))
+            _gemini_available = False
+            return False
+        log.warning(
+            "Gemini replay mode - answering from recorded responses",
+            path=GEMINI_REPLAY_PATH,
+            requests=len(replay_model.by_request),
+            latency_scale=GEMINI_REPLAY_LATENCY_SCALE,
+        )
+        # Still captured, so a replay's own capture can be compared with the original
+        _gemini_model = CapturingGeminiModel(replay_model)
+        _gemini_available = True
+        return True
 
     api_key = get_gemini_api_key()
 
     if not api_key:
-        print(" [WARN] Gemini API key not found in environment variables")
-        print(" [INFO] Set GOOGLE_API_KEY or GEMINI_API_KEY in .env file")
-        print(" [INFO] AI explanations will be unavailable")
+        log.warning("Gemini API key not found - set GOOGLE_API_KEY or GEMINI_API_KEY in .env; AI explanations will be unavailable")
         _gemini_available = False
         return False
 
@@ -66,22 +138,53 @@ def load_gemini_client() -> bool:
         # Configure Gemini API
         genai.configure(api_key=api_key)
 
-        # Initialize model
-        print(f" [LOAD] Initializing Gemini API client")
-        print(f" [INFO] Model: {GEMINI_MODEL}")
-        _gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+        # Initialize model over a pool of warm connections
+        log.info("Initializing Gemini API client", model=GEMINI_MODEL, endpoint=GEMINI_API_ENDPOINT)
+        _gemini_connections = PooledGeminiModel(GEMINI_MODEL, api_key, GEMINI_API_ENDPOINT)
+        # Responses are recorded into traffic captures when capture is on
+        _gemini_model = CapturingGeminiModel(_gemini_connections)
         _gemini_available = True
 
-        print(" [SUCCESS] Gemini API client initialized successfully!")
+        # Connect in the background so startup does not wait on the network
+        threading.Thread(target=_preconnect, name="gemini-preconnect", daemon=True).start()
+
+        log.info("Gemini API client initialized")
         return True
 
     except Exception as e:
-        print(f" [ERROR] Failed to initialize Gemini API: {str(e)}")
-        print(" [INFO] AI explanations will be unavailable")
+        log.error("Failed to initialize Gemini API - AI explanations will be unavailable", error=str(e))
         _gemini_available = False
         return False
 
 
+def _preconnect():
+    """
+    Open the pooled Gemini connections (run in a background thread at startup).
+    """
+    connected = _gemini_connections.preconnect()
+    if connected:
+        log.info("Gemini connections ready", connected=connected, preconnect_ms=_gemini_connections.stats()["preconnect_ms"])
+    else:
+        log.warning("Gemini pre-connect failed - connections will be opened on first use", endpoint=GEMINI_API_ENDPOINT)
+
+
+async def preconnect_gemini_async() -> int:
+    """
+    Open the async Gemini connections on the running event loop (ASGI startup).
+
+    Returns:
+        int: Connections ready (0 if Gemini is not configured or unreachable)
+    """
+    if _gemini_connections is None:
+        return 0
+    connected = await _gemini_connections.preconnect_async()
+    if connected:
+        log.info("Async Gemini connections ready", connected=connected)
+    else:
+        log.warning("Async Gemini pre-connect failed - connections will be opened on first use", endpoint=GEMINI_API_ENDPOINT)
+    return connected
+
+
 def is_gemini_available() -> bool:
     """
     Check if Gemini API is available and ready to use.
@@ -158,12 +261,23 @@ Keep response under 400 words. Emphasize this is informational only, not medical
     return prompt
 
 
-def generate_explanation(detections: list, user_context: str = "") -> Dict:
+def generate_explanation(
+    detections: list,
+    user_context: str = "",
+    use_library: bool = True,
+    deadline: Optional[float] = None
+) -> Dict:
     """
     Generate AI explanation from YOLOv8 detection results using Gemini API.
     Handles multiple detections (top 3) and user-provided context.
     Provides comprehensive analysis incorporating both model detections and user description.
 
+    Without user context the precomputed explanation library answers
+    immediately. With user context Gemini is called live, and the library
+    entry is served instead if Gemini fails or misses
+    EXPLANATION_LATENCY_BUDGET_SECONDS. The Gemini call never outlives the
+    request deadline, when one is given.
+
     Args:
         detections: List of detection dictionaries, each containing:
             - 'rash_label': str - Condition name
@@ -171,104 +285,616 @@ def generate_explanation(detections: list, user_context: str = "") -> Dict:
             - 'bounding_box': dict - Bounding box coordinates
             Can also accept a single detection dict for backward compatibility.
         user_context: Optional user-provided text description/context about their condition
+        use_library: Whether the precomputed explanation library may be used
+        deadline: Absolute time (time.time()) by which the result is needed
 
     Returns:
         dict: Result dictionary with format:
             {
                 "success": bool,
                 "explanation": str (if success) or None,
-                "error": str (if failed) or None
+                "error": str (if failed) or None,
+                "source": "gemini" | "library" | "library_fallback" (if success),
+                "cached": bool (True if a previous live explanation was reused)
             }
     """
-    # Check if Gemini is available
-    if not is_gemini_available():
-        return {
-            "success": False,
-            "explanation": None,
-            "error": "Gemini API not available - API key not configured",
-        }
+    with span("explanation", personalized=bool(user_context)):
+        result, prompt, library_explanation = _prepare_explanation(detections, user_context, use_library)
+        if result is not None:
+            return result
+
+        timeout = _explanation_timeout(library_explanation, deadline)
+        if timeout is not None and timeout <= 0:
+            return _timed_out_result(library_explanation)
+
+        try:
+            # The deadline rides on the RPC itself, so a slow call ends (and
+            # frees this thread) when the request stops waiting for it
+            explanation = _call_gemini(prompt, timeout=timeout)
+            return _explanation_result(explanation, prompt)
+
+        except (google_exceptions.DeadlineExceeded, TimeoutError):
+            return _timed_out_result(library_explanation)
+
+        except Exception as e:
+            if library_explanation:
+                return _library_result(library_explanation, "library_fallback")
 
-    try:
-        # Handle both list and single dict (for backward compatibility)
-        if isinstance(detections, dict):
-            # Single detection - convert to list
-            detections = [detections]
-        elif not isinstance(detections, list) or len(detections) == 0:
             return {
                 "success": False,
                 "explanation": None,
-                "error": "Invalid detection results: detections must be a list",
+                "error": _describe_gemini_error(e),
             }
 
-        # Validate detections have required fields
-        for detection in detections:
-            if (
-                not detection.get("rash_label")
-                or detection.get("rash_label") == "unknown"
-            ):
-                return {
-                    "success": False,
-                    "explanation": None,
-                    "error": "Invalid detection results: missing rash_label in one or more detections",
-                }
-
-        # Format prompt with all detections and user context
-        prompt = format_prompt_for_gemini(detections, user_context=user_context)
 
-        # Call Gemini API with optimized generation config for speed
-        start_time = time.time()
-        response = _gemini_model.generate_content(
-            prompt, generation_config=genai.types.GenerationConfig(**GENERATION_CONFIG)
+async def generate_explanation_async(
+    detections: list,
+    user_context: str = "",
+    use_library: bool = True,
+    deadline: Optional[float] = None
+) -> Dict:
+    """
+    Async variant of generate_explanation for the ASGI server.
+    The Gemini call runs on the event loop instead of blocking a thread, and
+    a call that misses the latency budget is cancelled.
+
+    Args:
+        detections: List of detection dictionaries (see generate_explanation)
+        user_context: Optional user-provided text description/context about their condition
+        use_library: Whether the precomputed explanation library may be used
+        deadline: Absolute time (time.time()) by which the result is needed
+
+    Returns:
+        dict: Same format as generate_explanation
+    """
+    with span("explanation", personalized=bool(user_context)):
+        # Cache lookups may be network round trips, so they stay off the loop
+        result, prompt, library_explanation = await asyncio.to_thread(
+            _prepare_explanation, detections, user_context, use_library
         )
-        api_time = time.time() - start_time
+        if result is not None:
+            return result
+
+        timeout = _explanation_timeout(library_explanation, deadline)
+        if timeout is not None and timeout <= 0:
+            return _timed_out_result(library_explanation)
+
+        try:
+            if timeout is None:
+                explanation = await _call_gemini_async(prompt)
+            else:
+                explanation = await asyncio.wait_for(_call_gemini_async(prompt, timeout=timeout), timeout=timeout)
 
-        # Extract explanation text
-        if hasattr(response, "text") and response.text:
-            explanation = response.text.strip()
-        else:
-            # Fallback if response format is unexpected
-            explanation = str(response).strip()
+            return await asyncio.to_thread(_explanation_result, explanation, prompt)
+
+        except (google_exceptions.DeadlineExceeded, asyncio.TimeoutError):
+            return _timed_out_result(library_explanation)
+
+        except Exception as e:
+            if library_explanation:
+                return _library_result(library_explanation, "library_fallback")
 
-        if not explanation:
             return {
                 "success": False,
                 "explanation": None,
-                "error": "Gemini API returned empty response",
+                "error": _describe_gemini_error(e),
             }
 
-        return {
-            "success": True,
-            "explanation": explanation,
-            "error": None,
-        }
 
-    except Exception as e:
-        error_message = str(e)
+def _explanation_timeout(library_explanation: Optional[str], deadline: Optional[float]) -> Optional[float]:
+    """
+    Decide how long to wait for a live Gemini explanation.
+
+    Args:
+        library_explanation: Library entry ready as a fallback, if any
+        deadline: Absolute request deadline, if any
+
+    Returns:
+        float: Seconds to wait, or None to wait for Gemini without a bound
+    """
+    timeout = EXPLANATION_LATENCY_BUDGET_SECONDS if library_explanation else None
+    if deadline is not None:
+        remaining = deadline - time.time()
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+
+def _timed_out_result(library_explanation: Optional[str]) -> Dict:
+    """
+    Build the result when Gemini cannot answer in time.
+
+    Args:
+        library_explanation: Library entry to fall back to, if any
+
+    Returns:
+        dict: Library fallback result, or a failed result
+    """
+    if library_explanation:
+        return _library_result(library_explanation, "library_fallback")
+
+    return {
+        "success": False,
+        "explanation": None,
+        "error": "Explanation timed out - please try again",
+    }
+
+
+def _prepare_explanation(detections, user_context: str, use_library: bool):
+    """
+    Validate detections and decide whether the library can answer directly.
+
+    Args:
+        detections: List of detection dictionaries (or a single dict)
+        user_context: Optional user-provided description
+        use_library: Whether the precomputed explanation library may be used
+
+    Returns:
+        tuple: (final result or None, prompt or None, library explanation or None).
+            When the first element is set, no Gemini call is needed.
+    """
+    # Handle both list and single dict (for backward compatibility)
+    if isinstance(detections, dict):
+        # Single detection - convert to list
+        detections = [detections]
+    elif not isinstance(detections, list) or len(detections) == 0:
+        return {
+            "success": False,
+            "explanation": None,
+            "error": "Invalid detection results: detections must be a list",
+        }, None, None
 
-        # Handle specific error types
+    # Validate detections have required fields
+    for detection in detections:
         if (
-            "API key" in error_message.lower()
-            or "authentication" in error_message.lower()
+            not detection.get("rash_label")
+            or detection.get("rash_label") == "unknown"
         ):
-            error_msg = "Invalid API key or authentication error"
-        elif "quota" in error_message.lower() or "rate limit" in error_message.lower():
-            error_msg = "API quota exceeded or rate limit reached"
-        elif "timeout" in error_message.lower():
-            error_msg = "Request timeout - API took too long to respond"
-        else:
-            error_msg = f"Gemini API error: {error_message}"
+            return {
+                "success": False,
+                "explanation": None,
+                "error": "Invalid detection results: missing rash_label in one or more detections",
+            }, None, None
+
+    library_explanation = lookup_explanation(detections) if use_library else None
+    has_user_context = bool(user_context and user_context.strip())
+
+    # Non-personalized requests are served from the library with no network call
+    if library_explanation and (not has_user_context or not is_gemini_available()):
+        return _library_result(library_explanation, "library"), None, None
+
+    # Check if Gemini is available
+    if not is_gemini_available():
+        return {
+            "success": False,
+            "explanation": None,
+            "error": "Gemini API not available - API key not configured",
+        }, None, None
+
+    # Format prompt with all detections and user context
+    with span("prompt.format", detections=len(detections) if isinstance(detections, list) else 1):
+        prompt = format_prompt_for_gemini(detections, user_context=user_context)
+
+    # Any replica may already have answered this exact prompt
+    with span("cache.lookup", namespace=EXPLANATION_CACHE_NAMESPACE):
+        cached = storage_get(EXPLANATION_CACHE_NAMESPACE, _explanation_cache_key(prompt))
+    if cached is not None:
+        return {**cached, "cached": True}, None, None
+
+    return None, prompt, library_explanation
+
+
+def _library_result(explanation: str, source: str) -> Dict:
+    """
+    Build a successful result served from the explanation library.
+
+    Args:
+        explanation: Library explanation text
+        source: "library" or "library_fallback"
+
+    Returns:
+        dict: Explanation result
+    """
+    return {
+        "success": True,
+        "explanation": explanation,
+        "error": None,
+        "source": source,
+    }
+
+
+def _explanation_result(explanation: str, prompt: str) -> Dict:
+    """
+    Build the result for a live Gemini explanation and cache it by prompt.
+
+    Args:
+        explanation: Response text (may be empty)
+        prompt: Prompt the explanation answers
 
+    Returns:
+        dict: Explanation result
+    """
+    if not explanation:
         return {
             "success": False,
             "explanation": None,
-            "error": error_msg,
+            "error": "Gemini API returned empty response",
         }
 
+    result = {
+        "success": True,
+        "explanation": explanation,
+        "error": None,
+        "source": "gemini",
+    }
+    storage_set(EXPLANATION_CACHE_NAMESPACE, _explanation_cache_key(prompt), result, EXPLANATION_CACHE_TTL_SECONDS)
+    return result
+
+
+def _explanation_cache_key(prompt: str) -> str:
+    """
+    Key a live explanation by the model and the exact prompt it answers.
+
+    Args:
+        prompt: Formatted Gemini prompt
+
+    Returns:
+        str: Cache key
+    """
+    return content_key(GEMINI_MODEL, prompt)
+
+
+def _call_gemini(prompt: str, generation_config: dict = None, timeout: Optional[float] = None) -> str:
+    """
+    Send a prompt to Gemini and extract the response text, hedging the
+    request when hedging is enabled and the call is slower than usual.
+
+    Args:
+        prompt: Prompt text
+        generation_config: Generation settings (default: GENERATION_CONFIG)
+        timeout: RPC deadline in seconds (default: TIMEOUT_SECONDS); a hedge
+            gets what is left of it
+
+    Returns:
+        str: Stripped response text (may be empty)
+
+    Raises:
+        google.api_core.exceptions.DeadlineExceeded: If Gemini did not answer in time
+    """
+    deadline = time.time() + (TIMEOUT_SECONDS if timeout is None else timeout)
+    hedge_delay = _hedge_delay()
+    if hedge_delay is None:
+        return _timed_gemini_call(prompt, generation_config, deadline - time.time())
+
+    started = threading.Event()
+
+    def run_primary():
+        started.set()
+        return _timed_gemini_call(prompt, generation_config, deadline - time.time())
+
+    # Both calls run in the request's context so logs and captures follow them
+    primary = _hedge_executor.submit(contextvars.copy_context().run, run_primary)
+    # The hedge delay counts from when the call is sent, not from when it was queued
+    started.wait()
+    try:
+        return primary.result(timeout=hedge_delay)
+    except FutureTimeoutError:
+        pass
+    if not _take_hedge_budget():
+        return primary.result()
+
+    hedge = _hedge_executor.submit(
+        contextvars.copy_context().run, _timed_gemini_call, prompt, generation_config, deadline - time.time()
+    )
+    pending = {primary: "primary", hedge: "hedge"}
+    error = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            winner = pending.pop(future)
+            if future.exception() is None:
+                # A sync call already on the wire cannot be recalled: it runs
+                # until it answers or hits its deadline, and its answer is dropped
+                _record_hedge_winner(winner, uncancelled=sum(not loser.cancel() for loser in pending))
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _call_gemini_async(prompt: str, generation_config: dict = None, timeout: Optional[float] = None) -> str:
+    """
+    Async variant of _call_gemini. The losing call of a hedged request is cancelled.
+
+    Args:
+        prompt: Prompt text
+        generation_config: Generation settings (default: GENERATION_CONFIG)
+        timeout: RPC deadline in seconds (default: TIMEOUT_SECONDS)
+
+    Returns:
+        str: Stripped response text (may be empty)
+    """
+    deadline = time.time() + (TIMEOUT_SECONDS if timeout is None else timeout)
+    hedge_delay = _hedge_delay()
+    if hedge_delay is None:
+        return await _timed_gemini_call_async(prompt, generation_config, deadline - time.time())
+
+    primary = _timed_gemini_call_async(prompt, generation_config, deadline - time.time())
+    pending = {asyncio.ensure_future(primary): "primary"}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+        if not done and _take_hedge_budget():
+            hedge = _timed_gemini_call_async(prompt, generation_config, deadline - time.time())
+            pending[asyncio.ensure_future(hedge)] = "hedge"
+        hedged = len(pending) > 1
+
+        error = None
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                winner = pending.pop(task)
+                if task.exception() is None:
+                    if hedged:
+                        _record_hedge_winner(winner)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Losers, and both calls if the caller gave up, are cancelled on the wire
+        for task in pending:
+            task.cancel()
+
+
+def _timed_gemini_call(prompt: str, generation_config: dict = None, timeout: float = TIMEOUT_SECONDS) -> str:
+    """
+    Send a prompt to Gemini once and record the latency of a successful call.
+
+    Args:
+        prompt: Prompt text
+        generation_config: Generation settings (default: GENERATION_CONFIG)
+        timeout: RPC deadline in seconds
+
+    Returns:
+        str: Stripped response text (may be empty)
+    """
+    start_time = time.time()
+    # Call Gemini API with optimized generation config for speed
+    with span("gemini.call", kind="client", prompt_chars=len(prompt)):
+        response = _gemini_model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(**(generation_config or GENERATION_CONFIG)),
+            request_options={"timeout": max(timeout, MIN_CALL_TIMEOUT_SECONDS)},
+        )
+    _record_call_latency(time.time() - start_time)
+
+    # Extract explanation text
+    if hasattr(response, "text") and response.text:
+        return response.text.strip()
+
+    # Fallback if response format is unexpected
+    return str(response).strip()
+
+
+async def _timed_gemini_call_async(prompt: str, generation_config: dict = None, timeout: float = TIMEOUT_SECONDS) -> str:
+    """
+    Async variant of _timed_gemini_call.
+
+    Args:
+        prompt: Prompt text
+        generation_config: Generation settings (default: GENERATION_CONFIG)
+        timeout: RPC deadline in seconds
+
+    Returns:
+        str: Stripped response text (may be empty)
+    """
+    start_time = time.time()
+    with span("gemini.call", kind="client", prompt_chars=len(prompt)):
+        response = await _gemini_model.generate_content_async(
+            prompt,
+            generation_config=genai.types.GenerationConfig(**(generation_config or GENERATION_CONFIG)),
+            request_options={"timeout": max(timeout, MIN_CALL_TIMEOUT_SECONDS)},
+        )
+    _record_call_latency(time.time() - start_time)
+
+    if hasattr(response, "text") and response.text:
+        return response.text.strip()
+    return str(response).strip()
+
+
+def _hedge_delay() -> Optional[float]:
+    """
+    Count a call against the hedge budget and decide when to hedge it.
+
+    Returns:
+        float: Seconds to wait before sending a duplicate, or None to not hedge
+    """
+    global _hedge_budget
+
+    if GEMINI_HEDGE_PERCENTILE <= 0:
+        return None
+    with _hedge_lock:
+        _hedge_stats["calls"] += 1
+        _hedge_budget = min(HEDGE_BUDGET_BURST, _hedge_budget + HEDGE_BUDGET_RATIO)
+    return _hedge_threshold()
+
+
+def _hedge_threshold() -> Optional[float]:
+    """
+    Compute the hedge delay from recent call latencies.
+
+    Returns:
+        float: GEMINI_HEDGE_PERCENTILE of recent latencies (at least
+            HEDGE_MIN_DELAY_SECONDS), or None until enough calls were seen
+    """
+    with _hedge_lock:
+        if len(_call_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(_call_latencies)
+    index = min(len(latencies) - 1, int(len(latencies) * GEMINI_HEDGE_PERCENTILE / 100))
+    return max(HEDGE_MIN_DELAY_SECONDS, latencies[index])
+
+
+def _take_hedge_budget() -> bool:
+    """
+    Spend one hedge from the budget.
+
+    Returns:
+        bool: True if a duplicate request may be sent
+    """
+    global _hedge_budget
+
+    with _hedge_lock:
+        if _hedge_budget < 1:
+            _hedge_stats["budget_exhausted"] += 1
+            return False
+        _hedge_budget -= 1
+        _hedge_stats["hedged"] += 1
+        return True
+
+
+def _record_hedge_winner(winner: str, uncancelled: int = 0):
+    """
+    Count which call of a hedged request answered first.
+
+    Args:
+        winner: "primary" or "hedge"
+        uncancelled: Losing calls that could not be cancelled
+    """
+    with _hedge_lock:
+        _hedge_stats[f"{winner}_wins"] += 1
+        _hedge_stats["uncancelled_losers"] += uncancelled
+
+
+def _record_call_latency(seconds: float):
+    """
+    Add a successful call's latency to the window hedge delays are taken from.
+
+    Args:
+        seconds: Call latency
+    """
+    with _hedge_lock:
+        _call_latencies.append(seconds)
+
+
+def get_hedge_stats() -> Dict:
+    """
+    Get hedging policy settings and counters.
+
+    Returns:
+        dict: Whether hedging is on, the current hedge delay, and how often
+            hedges fired, won, or were refused by the budget, and how many
+            losing sync calls kept running because they could not be cancelled
+    """
+    with _hedge_lock:
+        stats = dict(_hedge_stats)
+        samples = len(_call_latencies)
+        budget = _hedge_budget
+    delay = _hedge_threshold() if GEMINI_HEDGE_PERCENTILE > 0 else None
+    return {
+        "enabled": GEMINI_HEDGE_PERCENTILE > 0,
+        "percentile": GEMINI_HEDGE_PERCENTILE,
+        "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+        "latency_samples": samples,
+        "budget": round(budget, 2),
+        **stats,
+        "hedge_rate": round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else None,
+        "hedge_win_rate": round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else None,
+    }
+
+
+def _describe_gemini_error(error: Exception) -> str:
+    """
+    Map a Gemini API exception to a user-facing error message.
+
+    Args:
+        error: The raised exception
+
+    Returns:
+        str: Error message
+    """
+    error_message = str(error)
+
+    # Handle specific error types
+    if (
+        "API key" in error_message.lower()
+        or "authentication" in error_message.lower()
+    ):
+        return "Invalid API key or authentication error"
+    elif "quota" in error_message.lower() or "rate limit" in error_message.lower():
+        return "API quota exceeded or rate limit reached"
+    elif "timeout" in error_message.lower():
+        return "Request timeout - API took too long to respond"
+    return f"Gemini API error: {error_message}"
+
+
+def format_chat_prompt(
+    user_message: str,
+    conversation_history: list = None,
+    analysis_context: dict = None,
+    conversation_summary: str = "",
+    max_history_messages: Optional[int] = 5
+) -> str:
+    """
+    Build the prompt for a follow-up chat question.
+
+    Args:
+        user_message: The user's follow-up question
+        conversation_history: List of previous messages [{"role": "user"|"assistant", "content": str}]
+        analysis_context: Context from initial analysis {"condition": str, "confidence": float, "explanation": str}
+        conversation_summary: Compact summary of earlier turns not included in conversation_history
+        max_history_messages: Only include this many recent messages (None includes all)
+
+    Returns:
+        str: Formatted prompt string for Gemini API
+    """
+    # Build context-aware prompt
+    context_parts = []
+
+    # Add analysis context if available
+    if analysis_context:
+        condition = analysis_context.get("condition", "unknown")
+        confidence = analysis_context.get("confidence", 0)
+        initial_explanation = analysis_context.get("explanation", "")
+
+        context_parts.append(f"""Initial Analysis Context:
+- Detected Condition: {condition} ({confidence}% confidence)
+- Initial Explanation: {initial_explanation[:500]}...""")
+
+    # Add summary of earlier turns (server-side chat sessions)
+    if conversation_summary:
+        context_parts.append(f"\nEarlier Conversation Summary:\n{conversation_summary}")
+
+    # Add conversation history
+    if conversation_history:
+        if max_history_messages is not None:
+            conversation_history = conversation_history[-max_history_messages:]
+        history_text = "\n".join([
+            f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+            for msg in conversation_history
+        ])
+        context_parts.append(f"\nRecent Conversation:\n{history_text}")
+
+    # Build full prompt
+    context = "\n\n".join(context_parts) if context_parts else "No prior context."
+
+    return f"""{context}
+
+User's Follow-up Question: {user_message}
+
+Please provide a helpful, concise response that:
+1. Directly answers the user's question
+2. References the initial analysis when relevant
+3. Maintains conversation continuity
+4. Stays under 300 words
+5. Reminds that this is informational only, not medical advice
+
+Response:"""
+
 
 def generate_chat_response(
     user_message: str,
     conversation_history: list = None,
-    analysis_context: dict = None
+    analysis_context: dict = None,
+    conversation_summary: str = "",
+    max_history_messages: Optional[int] = 5
 ) -> Dict:
     """
     Generate a chat response from Gemini API for follow-up questions.
@@ -278,6 +904,8 @@ def generate_chat_response(
         user_message: The user's follow-up question
         conversation_history: List of previous messages [{"role": "user"|"assistant", "content": str}]
         analysis_context: Context from initial analysis {"condition": str, "confidence": float, "explanation": str}
+        conversation_summary: Compact summary of earlier turns not included in conversation_history
+        max_history_messages: Only include this many recent messages (None includes all)
 
     Returns:
         dict: Result dictionary with format:
@@ -295,86 +923,150 @@ def generate_chat_response(
         }
 
     try:
-        # Build context-aware prompt
-        context_parts = []
+        prompt = format_chat_prompt(
+            user_message, conversation_history, analysis_context, conversation_summary, max_history_messages
+        )
+        return _chat_result(_call_gemini(prompt))
 
-        # Add analysis context if available
-        if analysis_context:
-            condition = analysis_context.get("condition", "unknown")
-            confidence = analysis_context.get("confidence", 0)
-            initial_explanation = analysis_context.get("explanation", "")
+    except Exception as e:
+        return {
+            "success": False,
+            "explanation": None,
+            "error": _describe_gemini_error(e),
+        }
 
-            context_parts.append(f"""Initial Analysis Context:
-- Detected Condition: {condition} ({confidence}% confidence)
-- Initial Explanation: {initial_explanation[:500]}...""")
 
-        # Add conversation history
-        if conversation_history:
-            history_text = "\n".join([
-                f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
-                for msg in conversation_history[-5:]  # Last 5 messages for context
-            ])
-            context_parts.append(f"\nRecent Conversation:\n{history_text}")
+async def generate_chat_response_async(
+    user_message: str,
+    conversation_history: list = None,
+    analysis_context: dict = None,
+    conversation_summary: str = "",
+    max_history_messages: Optional[int] = 5
+) -> Dict:
+    """
+    Async variant of generate_chat_response for the ASGI server.
+
+    Args:
+        user_message: The user's follow-up question
+        conversation_history: List of previous messages [{"role": "user"|"assistant", "content": str}]
+        analysis_context: Context from initial analysis
+        conversation_summary: Compact summary of earlier turns not included in conversation_history
+        max_history_messages: Only include this many recent messages (None includes all)
 
-        # Build full prompt
-        context = "\n\n".join(context_parts) if context_parts else "No prior context."
+    Returns:
+        dict: Same format as generate_chat_response
+    """
+    if not is_gemini_available():
+        return {
+            "success": False,
+            "explanation": None,
+            "error": "Gemini API not available - API key not configured",
+        }
 
-        prompt = f"""{context}
+    try:
+        prompt = format_chat_prompt(
+            user_message, conversation_history, analysis_context, conversation_summary, max_history_messages
+        )
+        return _chat_result(await _call_gemini_async(prompt))
 
-User's Follow-up Question: {user_message}
+    except Exception as e:
+        return {
+            "success": False,
+            "explanation": None,
+            "error": _describe_gemini_error(e),
+        }
 
-Please provide a helpful, concise response that:
-1. Directly answers the user's question
-2. References the initial analysis when relevant
-3. Maintains conversation continuity
-4. Stays under 300 words
-5. Reminds that this is informational only, not medical advice
 
-Response:"""
+def _chat_result(explanation: str) -> Dict:
+    """
+    Build the result for a chat response.
+
+    Args:
+        explanation: Response text (may be empty)
+
+    Returns:
+        dict: Chat result
+    """
+    if not explanation:
+        return {
+            "success": False,
+            "explanation": None,
+            "error": "Gemini API returned empty response",
+        }
+
+    return {
+        "success": True,
+        "explanation": explanation,
+        "error": None,
+    }
+
+
+def summarize_conversation(previous_summary: str, messages: list) -> Dict:
+    """
+    Fold older chat turns into a compact running summary using Gemini API.
+
+    Args:
+        previous_summary: Existing summary of even older turns (may be empty)
+        messages: Turns to fold in [{"role": "user"|"assistant", "content": str}]
+
+    Returns:
+        dict: Result dictionary with format:
+            {
+                "success": bool,
+                "summary": str (if success) or None,
+                "error": str (if failed) or None
+            }
+    """
+    if not is_gemini_available():
+        return {
+            "success": False,
+            "summary": None,
+            "error": "Gemini API not available - API key not configured",
+        }
+
+    try:
+        turns_text = "\n".join([
+            f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+            for msg in messages
+        ])
+
+        prompt = f"""Update the running summary of a conversation between a user and a medical AI assistant about a skin condition analysis.
+
+Current Summary:
+{previous_summary or "(none)"}
+
+New Turns:
+{turns_text}
+
+Write the updated summary in under 120 words. Keep facts the user shared about their symptoms, history and concerns, and the key points the assistant already explained. Do not add new medical advice.
+
+Updated Summary:"""
 
-        # Call Gemini API
-        start_time = time.time()
         response = _gemini_model.generate_content(
             prompt,
-            generation_config=genai.types.GenerationConfig(**GENERATION_CONFIG)
+            generation_config=genai.types.GenerationConfig(**SUMMARY_GENERATION_CONFIG),
+            request_options={"timeout": TIMEOUT_SECONDS},
         )
-        api_time = time.time() - start_time
 
-        # Extract response
-        if hasattr(response, "text") and response.text:
-            explanation = response.text.strip()
-        else:
-            explanation = str(response).strip()
-
-        if not explanation:
+        summary = response.text.strip() if hasattr(response, "text") and response.text else ""
+        if not summary:
             return {
                 "success": False,
-                "explanation": None,
+                "summary": None,
                 "error": "Gemini API returned empty response",
             }
 
         return {
             "success": True,
-            "explanation": explanation,
+            "summary": summary,
             "error": None,
         }
 
     except Exception as e:
-        error_message = str(e)
-
-        if "API key" in error_message.lower() or "authentication" in error_message.lower():
-            error_msg = "Invalid API key or authentication error"
-        elif "quota" in error_message.lower() or "rate limit" in error_message.lower():
-            error_msg = "API quota exceeded or rate limit reached"
-        elif "timeout" in error_message.lower():
-            error_msg = "Request timeout - API took too long to respond"
-        else:
-            error_msg = f"Gemini API error: {error_message}"
-
         return {
             "success": False,
-            "explanation": None,
-            "error": error_msg,
+            "summary": None,
+            "error": f"Gemini API error: {str(e)}",
         }
 
 
@@ -389,4 +1081,7 @@ def get_gemini_info() -> Dict:
         "available": is_gemini_available(),
         "model": GEMINI_MODEL if _gemini_available else None,
         "api_key_configured": get_gemini_api_key() is not None,
+        "replay": dict(_gemini_model.model.stats) if isinstance(getattr(_gemini_model, "model", None), ReplayGeminiModel) else None,
+        "connections": _gemini_connections.stats() if _gemini_connections is not None else None,
+        "hedging": get_hedge_stats(),
     }
@@ -0,0 +1,569 @@
+"""
+Inference Pool for running model forward passes in worker processes.
+Request threads copy preprocessed batches into a shared-memory slot and read
+outputs back from the same slot; only small control messages (slot index,
+shape, model version) cross the process boundary, so image data is never
+pickled. A supervisor thread collects results, detects crashed workers,
+fails the request they were running and restarts them.
+
+Workers are forked from the server process so they inherit the loaded model
+without re-reading the checkpoint (CPU inference only). A new model version is
+broadcast to every worker with preload_version before it receives traffic.
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import torch
+
+from utils.structured_logging import get_logger
+from .tracing import record_span
+
+log = get_logger("inference")
+
+
+# Global pool state (started on startup)
+_context = multiprocessing.get_context("fork")
+_shared_memory = None
+_inputs = None  # (num_slots, max input floats) float32 view of the shared block
+_outputs = None  # (num_slots, max batch, max outputs) float32 view
+_workers = []  # worker index -> {"process", "conn", "token", "started_at", "quick_crashes", "alive"}
+_free_slots = None  # queue.Queue of slot indices (the ring of shared buffers)
+_idle_workers = None  # queue.Queue of worker indices ready for a task
+_pending = {}  # token -> {"slot", "event", "width", "error", "abandoned"}; slot is None for a preload
+_pending_lock = threading.Lock()
+_tokens = itertools.count()
+_supervisor_thread = None
+_wakeup_reader = None
+_wakeup_writer = None
+_stopping = False
+_load_model = None
+_threads_per_worker = 1
+_stats = {"requests": 0, "fallbacks": 0, "restarts": 0}
+_stats_lock = threading.Lock()
+
+# Configuration
+SLOTS_PER_WORKER = 2  # Shared buffers per worker (lets requests stage input while workers are busy)
+MAX_BATCH_SIZE = 9  # Largest batch a slot holds (full TTA)
+MAX_INPUT_SHAPE = (3, 256, 256)  # Largest per-image input a slot holds
+MAX_OUTPUTS = 1280  # Output values per image (e.g. logits, pooled features and a saliency map)
+INFERENCE_TIMEOUT_SECONDS = 30  # Give up on the pool (and run in-process) after this
+PRELOAD_TIMEOUT_SECONDS = 300  # Stop waiting for workers to load a new version after this
+PRELOAD_POLL_SECONDS = 0.05  # Wait between claims when only workers that already loaded are idle
+WORKER_MIN_UPTIME_SECONDS = 5  # Crashes sooner than this after a start count as a crash loop
+MAX_QUICK_CRASHES = 3  # Stop restarting a worker after this many consecutive quick crashes
+
+
+def start_inference_pool(
+    num_workers: int,
+    load_model: Callable[[str, str, str], Callable[..., torch.Tensor]],
+    threads_per_worker: Optional[int] = None
+) -> bool:
+    """
+    Allocate the shared-memory slots and fork the worker processes.
+
+    Args:
+        num_workers: Number of worker processes
+        load_model: Function run inside a worker to get the model for
+            (version_id, model_path, checkpoint_digest); called again when the
+            version changes, and expected to raise if the file at model_path
+            is no longer the checkpoint with that digest. The model maps a
+            batch (and the options given to pooled_forward) to a 2-D output
+            (N, values per image)
+        threads_per_worker: Torch intra-op threads per worker (default: CPUs / workers)
+
+    Returns:
+        bool: True if the pool started, False otherwise
+    """
+    global _shared_memory, _inputs, _outputs, _free_slots, _idle_workers
+    global _supervisor_thread, _wakeup_reader, _wakeup_writer, _stopping
+    global _load_model, _threads_per_worker
+
+    if num_workers <= 0 or is_inference_pool_running():
+        return False
+
+    try:
+        num_slots = num_workers * SLOTS_PER_WORKER
+        input_floats = MAX_BATCH_SIZE * int(np.prod(MAX_INPUT_SHAPE))
+        output_floats = MAX_BATCH_SIZE * MAX_OUTPUTS
+        _shared_memory = SharedMemory(create=True, size=num_slots * (input_floats + output_floats) * 4)
+
+        buffer = np.ndarray((num_slots * (input_floats + output_floats),), dtype=np.float32, buffer=_shared_memory.buf)
+        _inputs = buffer[:num_slots * input_floats].reshape(num_slots, input_floats)
+        _outputs = buffer[num_slots * input_floats:].reshape(num_slots, MAX_BATCH_SIZE, MAX_OUTPUTS)
+
+        _free_slots = queue.Queue()
+        for slot in range(num_slots):
+            _free_slots.put(slot)
+        _idle_workers = queue.Queue()
+
+        _load_model = load_model
+        _threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        _stopping = False
+
+        _workers.clear()
+        for index in range(num_workers):
+            _workers.append({"quick_crashes": 0})
+            _start_worker(index)
+
+        _wakeup_reader, _wakeup_writer = _context.Pipe(duplex=False)
+        _supervisor_thread = threading.Thread(target=_supervise, name="inference-supervisor", daemon=True)
+        _supervisor_thread.start()
+        atexit.register(stop_inference_pool)
+
+        size_mb = _shared_memory.size / (1024 * 1024)
+        log.info("Inference pool ready", processes=num_workers, slots=num_slots, shared_mb=round(size_mb))
+        return True
+
+    except Exception as e:
+        log.error("Failed to start inference pool - inference will run in the request threads", error=str(e))
+        stop_inference_pool()
+        return False
+
+
+def is_inference_pool_running() -> bool:
+    """
+    Check if at least one worker process can take requests.
+
+    Returns:
+        bool: True if the pool is running, False otherwise
+    """
+    return not _stopping and any(worker.get("alive") for worker in _workers)
+
+
+def pooled_forward(batch: torch.Tensor, version_id: str, model_path: str, checkpoint_digest: str,
+                   options: Optional[Dict] = None) -> Optional[torch.Tensor]:
+    """
+    Run a forward pass on a worker process.
+
+    Args:
+        batch: Preprocessed CPU float batch (N, C, H, W)
+        version_id: Model version the worker should use
+        model_path: Checkpoint to load if the worker does not have that version
+        checkpoint_digest: SHA-256 the checkpoint must have for that version
+        options: Keyword arguments for the worker's model callable
+
+    Returns:
+        torch.Tensor: Model outputs (N, values per image), or None if the pool could not
+            serve the request (the caller should run the model in-process)
+    """
+    if not is_inference_pool_running() or not _fits_slot(batch):
+        return None
+
+    with _stats_lock:
+        _stats["requests"] += 1
+
+    deadline = time.time() + INFERENCE_TIMEOUT_SECONDS
+    try:
+        slot = _free_slots.get(timeout=INFERENCE_TIMEOUT_SECONDS)
+    except queue.Empty:
+        return _fallback("no free slot")
+
+    # Stage the input while waiting for a worker
+    torch.from_numpy(_inputs[slot, :batch.numel()]).view(batch.shape).copy_(batch)
+
+    token = next(_tokens)
+    request = {"slot": slot, "event": threading.Event(), "width": 0, "error": None, "timing": None, "abandoned": False}
+    with _pending_lock:
+        _pending[token] = request
+
+    worker_index = _acquire_worker(token, deadline)
+    if worker_index is None:
+        with _pending_lock:
+            _pending.pop(token, None)
+        _free_slots.put(slot)
+        return _fallback("no worker available")
+
+    try:
+        _workers[worker_index]["conn"].send(
+            (token, slot, tuple(batch.shape), version_id, model_path, checkpoint_digest, options or {})
+        )
+    except (OSError, ValueError):
+        # Worker died after being claimed; the supervisor fails the token
+        pass
+
+    if not request["event"].wait(max(deadline - time.time(), 0)):
+        with _pending_lock:
+            if _pending.get(token) is request:
+                request["abandoned"] = True  # Supervisor frees the slot when the worker finishes
+                return _fallback("timed out")
+
+    if request["error"]:
+        _free_slots.put(slot)
+        return _fallback(request["error"])
+
+    outputs = torch.from_numpy(_outputs[slot, :batch.shape[0], :request["width"]].copy())
+    _free_slots.put(slot)
+    if request["timing"] is not None:
+        # The worker's own forward pass, as a child of the caller's span
+        record_span("inference.worker", *request["timing"], worker=worker_index, batch=batch.shape[0])
+    return outputs
+
+
+def preload_version(version_id: str, model_path: str, checkpoint_digest: str,
+                    timeout: float = PRELOAD_TIMEOUT_SECONDS) -> int:
+    """
+    Have every live worker load (and warm) a model version before it is activated,
+    so the first requests on the new version do not pay for the load.
+    Workers load in parallel; each one stays available to requests while the
+    others are loading.
+
+    Args:
+        version_id: Model version to load
+        model_path: Checkpoint of that version
+        checkpoint_digest: SHA-256 the checkpoint must have for that version
+        timeout: Seconds to wait for all workers
+
+    Returns:
+        int: Number of workers that loaded the version (the rest load it on their first request)
+    """
+    if not is_inference_pool_running():
+        return 0
+
+    deadline = time.time() + timeout
+    remaining_workers = {index for index, worker in enumerate(_workers) if worker.get("alive")}
+    requests = {}  # worker index -> preload request
+    loaded = 0
+
+    while remaining_workers and time.time() < deadline:
+        token = next(_tokens)
+        request = {"slot": None, "event": threading.Event(), "width": 0, "error": None, "timing": None, "abandoned": False}
+        with _pending_lock:
+            _pending[token] = request
+
+        index = _acquire_worker(token, deadline)
+        if index is None:
+            with _pending_lock:
+                _pending.pop(token, None)
+            break
+        if index not in remaining_workers:
+            # Already loaded (or restarted with the version pending); hand it back to requests
+            with _pending_lock:
+                _pending.pop(token, None)
+                _workers[index]["token"] = None
+            _idle_workers.put(index)
+            time.sleep(PRELOAD_POLL_SECONDS)
+            continue
+
+        remaining_workers.discard(index)
+        requests[index] = request
+        try:
+            _workers[index]["conn"].send((token, None, None, version_id, model_path, checkpoint_digest, {}))
+        except (OSError, ValueError):
+            pass  # Worker died after being claimed; the supervisor fails the token
+
+    for index, request in requests.items():
+        if not request["event"].wait(max(deadline - time.time(), 0)):
+            request["abandoned"] = True
+            log.warning("Worker did not load the new version in time", worker=index, version=version_id)
+        elif request["error"]:
+            log.warning("Worker could not load the new version", worker=index, version=version_id, error=request["error"])
+        else:
+            loaded += 1
+
+    log.info("Workers preloaded version", version=version_id, loaded=loaded, workers=len(_workers))
+    return loaded
+
+
+def stop_inference_pool():
+    """
+    Stop the worker processes and release the shared memory.
+    """
+    global _stopping, _shared_memory, _inputs, _outputs
+
+    _stopping = True
+
+    if _wakeup_writer is not None:
+        try:
+            _wakeup_writer.send(None)
+        except (OSError, ValueError):
+            pass
+    if _supervisor_thread is not None and _supervisor_thread is not threading.current_thread():
+        _supervisor_thread.join(timeout=5)
+
+    for worker in _workers:
+        process = worker.get("process")
+        if process is None:
+            continue
+        try:
+            worker["conn"].send(None)
+        except (OSError, ValueError):
+            pass
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+        worker["alive"] = False
+
+    if _shared_memory is not None:
+        _inputs = None
+        _outputs = None
+        try:
+            _shared_memory.close()
+            _shared_memory.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+        _shared_memory = None
+
+
+def get_inference_pool_info() -> Dict:
+    """
+    Get worker status and pool counters.
+
+    Returns:
+        dict: Pool status, per-worker PIDs and request/fallback/restart counts
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+
+    return {
+        "enabled": is_inference_pool_running(),
+        "workers": [
+            {
+                "pid": worker["process"].pid if worker.get("process") else None,
+                "alive": bool(worker.get("alive")),
+                "busy": worker.get("token") is not None,
+            }
+            for worker in _workers
+        ],
+        "threads_per_worker": _threads_per_worker if _workers else None,
+        "free_slots": _free_slots.qsize() if _free_slots is not None else 0,
+        **stats,
+    }
+
+
+def _fits_slot(batch: torch.Tensor) -> bool:
+    """
+    Check whether a batch fits in a shared-memory slot.
+
+    Args:
+        batch: Input batch
+
+    Returns:
+        bool: True if the batch can be sent to a worker
+    """
+    return (
+        batch.device.type == "cpu"
+        and batch.dtype == torch.float32
+        and batch.dim() == 4
+        and batch.shape[0] <= MAX_BATCH_SIZE
+        and batch.numel() <= _inputs.shape[1]
+    )
+
+
+def _acquire_worker(token: int, deadline: float) -> Optional[int]:
+    """
+    Wait for an idle, live worker and claim it for a request.
+
+    Args:
+        token: Request token the worker will run
+        deadline: Timestamp after which to give up
+
+    Returns:
+        int: Worker index, or None on timeout
+    """
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0 or not is_inference_pool_running():
+            return None
+        try:
+            index = _idle_workers.get(timeout=remaining)
+        except queue.Empty:
+            return None
+
+        # Restarts can leave stale entries behind; only a live, unclaimed worker counts
+        with _pending_lock:
+            worker = _workers[index]
+            if worker.get("alive") and worker["token"] is None:
+                worker["token"] = token
+                return index
+
+
+def _fallback(reason: str) -> None:
+    """
+    Count a request the pool could not serve.
+
+    Args:
+        reason: Why the request falls back to in-process inference
+
+    Returns:
+        None
+    """
+    with _stats_lock:
+        _stats["fallbacks"] += 1
+    log.warning("Pool unavailable - running in-process", reason=reason)
+    return None
+
+
+def _start_worker(index: int):
+    """
+    Fork (or re-fork) one worker process and mark it idle.
+
+    Args:
+        index: Worker index
+    """
+    parent_conn, child_conn = _context.Pipe()
+    process = _context.Process(
+        target=_worker_main,
+        args=(index, child_conn, _inputs, _outputs, _load_model, _threads_per_worker),
+        name=f"inference-worker-{index}",
+        daemon=True,
+    )
+    process.start()
+    child_conn.close()
+
+    _workers[index].update({
+        "process": process,
+        "conn": parent_conn,
+        "token": None,
+        "started_at": time.time(),
+        "alive": True,
+    })
+    _idle_workers.put(index)
+
+
+def _supervise():
+    """
+    Supervisor body: deliver worker results and restart crashed workers.
+    """
+    while not _stopping:
+        waitables = {_wakeup_reader: None}
+        for index, worker in enumerate(_workers):
+            if worker.get("alive"):
+                waitables[worker["conn"]] = index
+                waitables[worker["process"].sentinel] = index
+
+        for ready in connection.wait(list(waitables)):
+            index = waitables[ready]
+            if index is None or _stopping:
+                continue
+            worker = _workers[index]
+            if not worker.get("alive") or ready not in (worker["conn"], worker["process"].sentinel):
+                continue  # Belongs to a process that was already handled and replaced
+
+            if ready is worker["conn"]:
+                try:
+                    token, width, error, timing = worker["conn"].recv()
+                except (EOFError, OSError):
+                    _handle_worker_exit(index)
+                    continue
+                _complete(token, width, error, timing)
+                with _pending_lock:
+                    worker["token"] = None
+                worker["quick_crashes"] = 0
+                _idle_workers.put(index)
+            else:
+                _handle_worker_exit(index)
+
+
+def _handle_worker_exit(index: int):
+    """
+    Fail the crashed worker's request and restart it unless it is crash-looping.
+
+    Args:
+        index: Worker index
+    """
+    worker = _workers[index]
+    with _pending_lock:
+        worker["alive"] = False
+        token, worker["token"] = worker["token"], None
+    worker["process"].join(timeout=1)
+    worker["conn"].close()
+    exit_code = worker["process"].exitcode
+
+    if token is not None:
+        _complete(token, 0, f"worker {index} crashed (exit code {exit_code})")
+
+    if time.time() - worker["started_at"] < WORKER_MIN_UPTIME_SECONDS:
+        worker["quick_crashes"] += 1
+    else:
+        worker["quick_crashes"] = 0
+
+    if worker["quick_crashes"] >= MAX_QUICK_CRASHES:
+        log.error("Worker keeps crashing - not restarting", worker=index, exit_code=exit_code)
+        return
+
+    log.warning("Worker exited - restarting", worker=index, exit_code=exit_code)
+    with _stats_lock:
+        _stats["restarts"] += 1
+    _start_worker(index)
+
+
+def _complete(token: int, width: int, error: Optional[str], timing: Optional[tuple] = None):
+    """
+    Wake the request waiting on a token (or free its slot if it gave up).
+
+    Args:
+        token: Request token
+        width: Number of output values written per image
+        error: Error message, or None on success
+        timing: (start, end) of the worker's forward pass in Unix nanoseconds
+    """
+    with _pending_lock:
+        request = _pending.pop(token, None)
+    if request is None:
+        return
+
+    if request["abandoned"]:
+        if request["slot"] is not None:
+            _free_slots.put(request["slot"])
+        return
+
+    request["width"] = width
+    request["error"] = error
+    request["timing"] = timing
+    request["event"].set()
+
+
+def _worker_main(index, conn, inputs, outputs, load_model, threads):
+    """
+    Worker process body: run forward passes on slots named by the parent
+    (a task without a slot only loads its model version).
+
+    Args:
+        index: Worker index
+        conn: Pipe to the parent
+        inputs: Shared input slots (inherited mapping)
+        outputs: Shared output slots (inherited mapping)
+        load_model: Function returning the model for (version_id, model_path, checkpoint_digest)
+        threads: Torch intra-op threads
+    """
+    torch.set_num_threads(threads)
+    models = {}  # version_id -> model; at most the current and the previous version
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+
+        token, slot, shape, version_id, model_path, checkpoint_digest, options = task
+        try:
+            model = models.get(version_id)
+            if model is None:
+                model = load_model(version_id, model_path, checkpoint_digest)
+                # Keep the previous version for requests still pinned to it during a hot-swap
+                models = dict(list(models.items())[-1:])
+                models[version_id] = model
+            if slot is None:
+                conn.send((token, 0, None, None))
+                continue
+
+            start_ns = time.time_ns()
+            batch = torch.from_numpy(inputs[slot, :int(np.prod(shape))]).view(shape)
+            with torch.no_grad():
+                result = model(batch, **options)
+            outputs[slot, :shape[0], :result.shape[1]] = result.numpy()
+            conn.send((token, result.shape[1], None, (start_ns, time.time_ns())))
+        except Exception as e:
+            conn.send((token, 0, f"worker {index} error: {str(e)}", None))
@@ -0,0 +1,243 @@
+"""
+Reusable input batch buffers and per-request memory accounting.
+
+Preprocessing writes images straight into preallocated float32 batch
+buffers (pinned when a GPU is present, so host-to-device copies can be
+asynchronous) instead of allocating a tensor per view and stacking them.
+Buffers are kept per batch-size bucket; a request takes the smallest bucket
+that fits and gives it back when its forward pass is done. A pinned buffer
+only goes back once the device copies queued from it have finished, since
+the next borrower overwrites it. Requests also
+note the large allocations they do make (decoded images, resized views,
+blur-check arrays), and the counts and estimated peak working memory per
+request are reported with the pool counters.
+"""
+
+import contextlib
+import contextvars
+import os
+import resource
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+
+# Configuration
+BUFFER_BATCH_BUCKETS = (1, 2, 5, 9)  # Batch sizes buffers are allocated for (base view, flips, five crops, full TTA)
+BUFFERS_PREALLOCATED_PER_BUCKET = 1  # Allocated up front by configure_input_buffers
+MAX_IDLE_BUFFERS_PER_BUCKET = 4  # Buffers kept for reuse beyond this are freed
+REQUEST_STATS_WINDOW = 1000  # Recent requests summarized in the stats
+
+# Pool state
+_input_shape = None
+_pin_memory = False
+_free_buffers = {bucket: [] for bucket in BUFFER_BATCH_BUCKETS}
+_pool_lock = threading.Lock()
+_stats = {"checkouts": 0, "reused": 0, "allocated": 0, "freed": 0, "oversized": 0}
+_recent_requests = deque(maxlen=REQUEST_STATS_WINDOW)  # (allocations, peak bytes) per request
+
+# Accounting of the request being handled
+_current_usage = contextvars.ContextVar("input_memory_usage", default=None)
+
+
+def configure_input_buffers(input_shape: tuple, pin_memory: Optional[bool] = None):
+    """
+    Set the per-image input shape and preallocate the buffers.
+    Buffers of a previous shape are dropped.
+
+    Args:
+        input_shape: (channels, height, width) of one preprocessed image
+        pin_memory: Use page-locked buffers (default: when CUDA is available)
+    """
+    global _input_shape, _pin_memory
+
+    with _pool_lock:
+        if _input_shape == tuple(input_shape):
+            return
+        _input_shape = tuple(input_shape)
+        _pin_memory = torch.cuda.is_available() if pin_memory is None else pin_memory
+        for bucket in BUFFER_BATCH_BUCKETS:
+            _free_buffers[bucket] = [_allocate(bucket) for _ in range(BUFFERS_PREALLOCATED_PER_BUCKET)]
+
+
+def _allocate(bucket: int) -> torch.Tensor:
+    """
+    Allocate one batch buffer (caller holds _pool_lock or owns the buffer).
+    """
+    _stats["allocated"] += 1
+    return torch.empty((bucket, *_input_shape), dtype=torch.float32, pin_memory=_pin_memory)
+
+
+@contextlib.contextmanager
+def input_batch(batch_size: int):
+    """
+    Borrow a buffer for a batch of preprocessed images.
+
+    Args:
+        batch_size: Images in the batch
+
+    Yields:
+        torch.Tensor: (batch_size, *input shape) float32 view, contents undefined
+    """
+    bucket = next((size for size in BUFFER_BATCH_BUCKETS if size >= batch_size), None)
+    buffer = None
+    with _pool_lock:
+        _stats["checkouts"] += 1
+        if bucket is None:
+            _stats["oversized"] += 1
+        elif _free_buffers[bucket]:
+            buffer = _free_buffers[bucket].pop()
+            _stats["reused"] += 1
+
+    allocated = buffer is None
+    if allocated:
+        with _pool_lock:
+            buffer = _allocate(bucket or batch_size)
+
+    nbytes = buffer.numel() * buffer.element_size()
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.allocations += int(allocated)
+        usage.hold(nbytes)
+    try:
+        yield buffer[:batch_size]
+    finally:
+        if _pin_memory and buffer.is_pinned():
+            _wait_for_device_copies()
+        if usage is not None:
+            usage.release(nbytes)
+        with _pool_lock:
+            if bucket is not None and len(_free_buffers[bucket]) < MAX_IDLE_BUFFERS_PER_BUCKET:
+                _free_buffers[bucket].append(buffer)
+            else:
+                _stats["freed"] += 1
+
+
+def _wait_for_device_copies():
+    """
+    Block until the asynchronous copies this thread queued have run.
+    Copies with non_blocking=True are queued on the current CUDA stream, so
+    an event recorded after them completes once they have read the buffer
+    (the forward passes queued since may still be running).
+    """
+    copied = torch.cuda.Event()
+    copied.record()
+    copied.synchronize()
+
+
+class RequestMemoryUsage:
+    """
+    Allocation count and working-set estimate of one request.
+    """
+
+    def __init__(self):
+        self.allocations = 0
+        self.current_bytes = 0
+        self.peak_bytes = 0
+
+    def hold(self, nbytes: int):
+        self.current_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+
+    def release(self, nbytes: int):
+        self.current_bytes -= nbytes
+
+
+@contextlib.contextmanager
+def track_request_memory():
+    """
+    Account the allocations noted while the block runs to one request.
+
+    Yields:
+        RequestMemoryUsage: The request's counters
+    """
+    usage = RequestMemoryUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        with _pool_lock:
+            _recent_requests.append((usage.allocations, usage.peak_bytes))
+
+
+def note_allocation(nbytes: int, transient: bool = False):
+    """
+    Record a large allocation made for the current request.
+
+    Args:
+        nbytes: Size of the allocation
+        transient: The memory is freed right away (counts toward the peak only)
+    """
+    usage = _current_usage.get()
+    if usage is None:
+        return
+    usage.allocations += 1
+    usage.hold(nbytes)
+    if transient:
+        usage.release(nbytes)
+
+
+def note_release(nbytes: int):
+    """
+    Record that memory noted with note_allocation was freed.
+
+    Args:
+        nbytes: Size of the freed allocation
+    """
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.release(nbytes)
+
+
+def get_input_buffer_stats() -> Dict:
+    """
+    Get pool counters, per-request allocation statistics and process memory.
+
+    Returns:
+        dict: Buffer reuse, idle buffers per bucket, recent per-request
+            allocations and peak bytes (p50/p99/max), and RSS
+    """
+    with _pool_lock:
+        stats = dict(_stats)
+        idle = {str(bucket): len(buffers) for bucket, buffers in _free_buffers.items()}
+        recent = list(_recent_requests)
+
+    request_stats = {"count": len(recent)}
+    if recent:
+        allocations = np.array([entry[0] for entry in recent])
+        peaks = np.array([entry[1] for entry in recent]) / (1024 * 1024)
+        request_stats.update({
+            "allocations_p50": float(np.percentile(allocations, 50)),
+            "allocations_p99": float(np.percentile(allocations, 99)),
+            "peak_mb_p50": round(float(np.percentile(peaks, 50)), 2),
+            "peak_mb_p99": round(float(np.percentile(peaks, 99)), 2),
+            "peak_mb_max": round(float(peaks.max()), 2),
+        })
+
+    return {
+        "input_shape": list(_input_shape) if _input_shape else None,
+        "pinned": _pin_memory,
+        "buckets": list(BUFFER_BATCH_BUCKETS),
+        "idle_buffers": idle,
+        "reuse_rate": round(stats["reused"] / stats["checkouts"], 4) if stats["checkouts"] else None,
+        **stats,
+        "requests": request_stats,
+        "rss_mb": _current_rss_mb(),
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _current_rss_mb() -> Optional[float]:
+    """
+    Resident set size of this process (Linux), or None where unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
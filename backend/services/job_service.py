@@ -0,0 +1,329 @@
+"""
+Job Service for asynchronous analysis requests.
+Runs submitted jobs on a bounded worker pool and keeps their results in a
+local SQLite store with TTL, so HTTP workers return immediately and clients
+poll (or long-poll) for the result.
+"""
+
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from utils.structured_logging import get_logger
+
+log = get_logger("jobs")
+
+
+# Global job queue state (initialized on startup)
+_db = None
+_db_lock = threading.Lock()
+_executor = None
+_handler = None
+_pending = None  # Semaphore bounding queued + running jobs
+_job_events = {}  # job_id -> threading.Event set when the job finishes
+_events_lock = threading.Lock()
+_last_purge = 0.0
+_owner = None  # (process instance, PID) recorded on this process's jobs (see _process_instance)
+
+# Configuration
+JOB_WORKERS = 4  # Concurrent analysis jobs
+JOB_MAX_PENDING = 64  # Queued + running jobs before submissions are rejected
+JOB_TTL_SECONDS = 60 * 60  # Keep job results for 1 hour
+JOB_MAX_WAIT_SECONDS = 30  # Longest long-poll a client may request
+PURGE_INTERVAL_SECONDS = 60  # Minimum time between expired-job purges
+
+# Job states
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def init_job_queue(
+    db_path: str,
+    handler: Callable[[Dict], tuple],
+    max_workers: int = JOB_WORKERS,
+    max_pending: int = JOB_MAX_PENDING
+) -> bool:
+    """
+    Open the job store and start the worker pool.
+
+    Args:
+        db_path: Path to the SQLite database file
+        handler: Function run for each job, taking the job parameters and
+            returning (response body dict, HTTP status)
+        max_workers: Number of worker threads
+        max_pending: Maximum queued + running jobs
+
+    Returns:
+        bool: True if the job queue is ready, False otherwise
+    """
+    global _db, _executor, _handler, _pending, _owner
+
+    try:
+        _db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                params TEXT NOT NULL,
+                result TEXT,
+                http_status INTEGER,
+                owner_instance TEXT,
+                owner_pid INTEGER
+            )"""
+        )
+        columns = {row[1] for row in _db.execute("PRAGMA table_info(jobs)")}
+        if "owner_pid" not in columns:
+            # Stores created before jobs recorded their owner
+            _db.execute("ALTER TABLE jobs ADD COLUMN owner_instance TEXT")
+            _db.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+        _db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs (expires_at)")
+        _db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+        _owner = (_process_instance(os.getpid()), os.getpid())
+        _fail_orphaned_jobs()
+
+        _handler = handler
+        _pending = threading.BoundedSemaphore(max_pending)
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+
+        log.info("Job queue ready", workers=max_workers, max_pending=max_pending)
+        return True
+
+    except Exception as e:
+        log.error("Failed to initialize job queue - async analysis will be unavailable", error=str(e))
+        _db = None
+        return False
+
+
+def is_job_queue_available() -> bool:
+    """
+    Check if the job queue is initialized.
+
+    Returns:
+        bool: True if jobs can be submitted, False otherwise
+    """
+    return _db is not None and _executor is not None
+
+
+def submit_job(params: Dict) -> Optional[str]:
+    """
+    Queue a job for background execution.
+
+    Args:
+        params: JSON-serializable job parameters passed to the handler
+
+    Returns:
+        str: Job ID, or None if the queue is full or unavailable
+    """
+    if not is_job_queue_available() or not _pending.acquire(blocking=False):
+        return None
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+
+    try:
+        with _db_lock:
+            _db.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at, expires_at, params, owner_instance, owner_pid)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, now, now, now + JOB_TTL_SECONDS, json.dumps(params), *_owner),
+            )
+
+        with _events_lock:
+            _job_events[job_id] = threading.Event()
+
+        # The job logs under the submitting request's ID
+        _executor.submit(contextvars.copy_context().run, _run_job, job_id, params)
+    except Exception:
+        # The job never reached a worker, so its slot would never be released
+        _pending.release()
+        with _events_lock:
+            _job_events.pop(job_id, None)
+        raise
+
+    _purge_expired_jobs(now)
+
+    return job_id
+
+
+def get_job(job_id: str, wait_seconds: float = 0) -> Optional[Dict]:
+    """
+    Get a job's status and result, optionally waiting for it to finish.
+
+    Args:
+        job_id: Job ID returned by submit_job
+        wait_seconds: Long-poll up to this many seconds (capped at JOB_MAX_WAIT_SECONDS)
+
+    Returns:
+        dict: Job record with format:
+            {
+                "job_id": str,
+                "status": "queued" | "running" | "done" | "failed",
+                "created_at": float,
+                "updated_at": float,
+                "result": dict or None,
+                "http_status": int or None
+            }
+            or None if the job does not exist or has expired
+    """
+    if not is_job_queue_available():
+        return None
+
+    if wait_seconds > 0:
+        with _events_lock:
+            event = _job_events.get(job_id)
+        if event is not None:
+            event.wait(min(wait_seconds, JOB_MAX_WAIT_SECONDS))
+
+    with _db_lock:
+        row = _db.execute(
+            "SELECT status, created_at, updated_at, expires_at, result, http_status FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+
+    if row is None or row[3] < time.time():
+        return None
+
+    status, created_at, updated_at, _, result, http_status = row
+    return {
+        "job_id": job_id,
+        "status": status,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "result": json.loads(result) if result else None,
+        "http_status": http_status,
+    }
+
+
+def _run_job(job_id: str, params: Dict):
+    """
+    Worker body: run the handler and store its result.
+
+    Args:
+        job_id: Job ID
+        params: Job parameters
+    """
+    try:
+        _update_job(job_id, STATUS_RUNNING)
+
+        try:
+            body, http_status = _handler(params)
+            status = STATUS_DONE if http_status < 500 else STATUS_FAILED
+        except Exception as e:
+            body, http_status = {"success": False, "error": f"Job error: {str(e)}"}, 500
+            status = STATUS_FAILED
+
+        _update_job(job_id, status, result=body, http_status=http_status)
+
+    except Exception as e:
+        log.error("Failed to record job", job_id=job_id, error=str(e))
+
+    finally:
+        _pending.release()
+        with _events_lock:
+            event = _job_events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+
+def _update_job(job_id: str, status: str, result: Dict = None, http_status: int = None):
+    """
+    Update a job's status (and result, when finished).
+
+    Args:
+        job_id: Job ID
+        status: New status
+        result: Response body to store
+        http_status: HTTP status of the stored response
+    """
+    with _db_lock:
+        _db.execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, result = ?, http_status = ? WHERE id = ?",
+            (status, time.time(), json.dumps(result) if result is not None else None, http_status, job_id),
+        )
+
+
+def _fail_orphaned_jobs():
+    """
+    Fail unfinished jobs whose process is gone; they will never finish.
+    Jobs of other live processes sharing the store are left alone.
+    """
+    with _db_lock:
+        owners = _db.execute(
+            "SELECT DISTINCT owner_instance, owner_pid FROM jobs WHERE status IN (?, ?)",
+            (STATUS_QUEUED, STATUS_RUNNING),
+        ).fetchall()
+
+    now = time.time()
+    interrupted = json.dumps({"success": False, "error": "Job interrupted by server restart"})
+    for instance, pid in owners:
+        if pid is not None and _process_instance(pid) == instance:
+            continue
+        with _db_lock:
+            cursor = _db.execute(
+                "UPDATE jobs SET status = ?, result = ?, http_status = 500, updated_at = ?"
+                " WHERE status IN (?, ?) AND owner_instance IS ? AND owner_pid IS ?",
+                (STATUS_FAILED, interrupted, now, STATUS_QUEUED, STATUS_RUNNING, instance, pid),
+            )
+        log.warning("Failed jobs of a stopped process", pid=pid, jobs=cursor.rowcount)
+
+
+def _process_instance(pid: int) -> Optional[str]:
+    """
+    Identify the process running under a PID, so a PID reused after a
+    restart or reboot (e.g. PID 1 in a container) is not taken for the
+    process that recorded it.
+
+    Args:
+        pid: Process ID
+
+    Returns:
+        str: Boot ID and process start time (empty where /proc is not
+            available), or None if no process has this PID
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass  # Exists, owned by another user
+
+    try:
+        with open("/proc/sys/kernel/random/boot_id", "r") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # The command name may contain spaces; start time is field 22
+            start_time = f.read().rpartition(")")[2].split()[19]
+    except (OSError, IndexError):
+        return ""
+    return f"{boot_id}:{start_time}"
+
+
+def _purge_expired_jobs(now: float):
+    """
+    Delete expired jobs, at most once per PURGE_INTERVAL_SECONDS.
+
+    Args:
+        now: Current timestamp
+    """
+    global _last_purge
+
+    if now - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = now
+
+    with _db_lock:
+        _db.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
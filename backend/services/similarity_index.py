@@ -0,0 +1,445 @@
+"""
+Similarity Index for finding reference cases that look like an upload.
+Stores L2-normalized image embeddings as a memory-mapped float16 matrix and
+searches it with vectorized NumPy dot products (cosine similarity). Large
+libraries can add an IVF partitioning: embeddings are assigned to k-means
+centroids and a search only scores the lists nearest to the query.
+
+Index directory layout:
+    index.json           dim, model version, IVF settings
+    embeddings.f16       N x dim float16, appended in place
+    cases.jsonl          one JSON record per row (label, path, ...)
+    ivf_centroids.npy    nlist x dim float32 (optional)
+    ivf_assignments.i32  N int32 centroid ids, appended in place (optional)
+Rows are append-only, so new cases are added without rebuilding the index.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.structured_logging import get_logger
+
+log = get_logger("index")
+
+
+# Global index state (loaded on startup)
+_index_dir = None
+_meta = None  # Contents of index.json
+_embeddings = None  # np.memmap (N, dim) float16
+_cases = []  # Row -> case record
+_cases_bytes = 0  # Size of the complete records in cases.jsonl
+_centroids = None  # (nlist, dim) float32, or None without IVF
+_assignments = None  # (N,) int32 centroid id per row
+_list_order = None  # Row ids sorted by centroid
+_list_offsets = None  # (nlist + 1,) start of each list in _list_order
+_index_lock = threading.Lock()
+
+# Files
+INDEX_META_FILE = "index.json"
+EMBEDDINGS_FILE = "embeddings.f16"
+CASES_FILE = "cases.jsonl"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.i32"
+
+# Search configuration
+SEARCH_CHUNK_ROWS = 65536  # Rows converted to float32 at a time in exact search
+IVF_DEFAULT_NPROBE = 8  # Nearest lists scored per query
+IVF_TRAIN_SAMPLE = 50000  # Rows used to train the centroids
+IVF_TRAIN_ITERATIONS = 15
+
+
+def create_similarity_index(index_dir: str, dim: int, model_version: Optional[str] = None):
+    """
+    Create an empty index directory.
+
+    Args:
+        index_dir: Directory to create
+        dim: Embedding dimension
+        model_version: Model version the embeddings come from
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    _write_meta(index_dir, {"dim": dim, "model_version": model_version, "ivf": False})
+    for name in (EMBEDDINGS_FILE, CASES_FILE):
+        open(os.path.join(index_dir, name), "ab").close()
+
+
+def load_similarity_index(index_dir: str = "models/similar_cases") -> bool:
+    """
+    Load the case records and memory-map the embeddings (and IVF lists).
+
+    Args:
+        index_dir: Index directory
+
+    Returns:
+        bool: True if the index loaded successfully, False otherwise
+    """
+    global _index_dir
+
+    _index_dir = index_dir
+
+    if not os.path.exists(os.path.join(index_dir, INDEX_META_FILE)):
+        log.info("Similar-case index not found - build it with: python -m scripts.build_similarity_index", index_dir=index_dir)
+        return False
+
+    try:
+        with _index_lock:
+            _load_locked(index_dir)
+
+        log.info("Similar-case index loaded", cases=len(_cases), ivf_lists=len(_centroids) if _centroids is not None else 0)
+        return True
+
+    except Exception as e:
+        log.error("Failed to load similar-case index", index_dir=index_dir, error=str(e))
+        _reset_locked()
+        return False
+
+
+def is_similarity_index_loaded() -> bool:
+    """
+    Check if the similar-case index is loaded and non-empty.
+
+    Returns:
+        bool: True if searches can be served, False otherwise
+    """
+    return _embeddings is not None and len(_cases) > 0
+
+
+def search_similar_cases(embedding, k: int = 5, nprobe: int = IVF_DEFAULT_NPROBE) -> List[Dict]:
+    """
+    Find the reference cases most similar to an embedding.
+
+    Args:
+        embedding: L2-normalized query embedding (list or array of dim floats)
+        k: Number of cases to return
+        nprobe: IVF lists to score (ignored without IVF)
+
+    Returns:
+        list: Case records with an added 'similarity' (cosine, -1..1), best first
+    """
+    with _index_lock:
+        embeddings, cases = _embeddings, _cases
+        centroids, order, offsets = _centroids, _list_order, _list_offsets
+
+    if embeddings is None or not cases:
+        return []
+
+    query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if query.shape[0] != embeddings.shape[1]:
+        raise ValueError(f"embedding has {query.shape[0]} dimensions, index has {embeddings.shape[1]}")
+
+    if centroids is not None:
+        rows = _probe_rows(query, centroids, order, offsets, nprobe)
+        scores = embeddings[rows].astype(np.float32) @ query
+    else:
+        rows = None
+        scores = np.empty(len(embeddings), dtype=np.float32)
+        for start in range(0, len(embeddings), SEARCH_CHUNK_ROWS):
+            chunk = embeddings[start:start + SEARCH_CHUNK_ROWS]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ query
+
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+
+    return [
+        {**cases[int(rows[i] if rows is not None else i)], "similarity": round(float(scores[i]), 4)}
+        for i in top
+    ]
+
+
+def add_reference_cases(embeddings: np.ndarray, cases: List[Dict]) -> int:
+    """
+    Append reference cases to the loaded index (no rebuild needed).
+    With IVF, new rows join the list of their nearest existing centroid.
+
+    Args:
+        embeddings: (N, dim) L2-normalized embeddings
+        cases: N case records (JSON-serializable), e.g. {"label": str, "path": str}
+
+    Returns:
+        int: Total number of cases in the index
+    """
+    if len(embeddings) != len(cases):
+        raise ValueError("embeddings and cases must have the same length")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float16)
+
+    with _index_lock:
+        if _meta is None:
+            raise RuntimeError("similar-case index is not loaded")
+        if embeddings.shape[1] != _meta["dim"]:
+            raise ValueError(f"embeddings have {embeddings.shape[1]} dimensions, index has {_meta['dim']}")
+
+        start_row = len(_cases)
+        _truncate_to_loaded_rows()
+
+        new_assignments = None
+        with open(os.path.join(_index_dir, EMBEDDINGS_FILE), "ab") as f:
+            f.write(embeddings.tobytes())
+        if _centroids is not None:
+            new_assignments = _assign_to_centroids(embeddings.astype(np.float32), _centroids).astype(np.int32)
+            with open(os.path.join(_index_dir, ASSIGNMENTS_FILE), "ab") as f:
+                f.write(new_assignments.tobytes())
+
+        # Case records last: a row only counts once its record is complete
+        records = [{**case, "id": row} for row, case in enumerate(cases, start_row)]
+        with open(os.path.join(_index_dir, CASES_FILE), "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+        _append_locked(records, new_assignments)
+        return len(_cases)
+
+
+def build_ivf(nlist: int, seed: int = 0) -> int:
+    """
+    Train IVF centroids over the loaded index and assign every row to a list.
+    Run again if many cases have been added since the last training.
+
+    Args:
+        nlist: Number of lists (about sqrt(N) works well)
+        seed: Random seed for the training sample and initial centroids
+
+    Returns:
+        int: Number of lists built
+    """
+    with _index_lock:
+        if _embeddings is None or not len(_cases):
+            raise RuntimeError("similar-case index is not loaded or empty")
+        embeddings = _embeddings[:len(_cases)]
+
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(nlist, len(embeddings)))
+        sample_rows = np.sort(rng.choice(len(embeddings), size=min(IVF_TRAIN_SAMPLE, len(embeddings)), replace=False))
+        sample = embeddings[sample_rows].astype(np.float32)
+
+        # Spherical k-means: centroids stay unit length, so dot product ranks lists
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = _assign_to_centroids(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            centroids = np.where(empty[:, None], centroids, sums / np.maximum(norms, 1e-12))
+
+        assignments = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), SEARCH_CHUNK_ROWS):
+            chunk = embeddings[start:start + SEARCH_CHUNK_ROWS].astype(np.float32)
+            assignments[start:start + len(chunk)] = _assign_to_centroids(chunk, centroids)
+
+        np.save(os.path.join(_index_dir, CENTROIDS_FILE + ".tmp.npy"), centroids.astype(np.float32))
+        os.replace(os.path.join(_index_dir, CENTROIDS_FILE + ".tmp.npy"), os.path.join(_index_dir, CENTROIDS_FILE))
+        assignments.tofile(os.path.join(_index_dir, ASSIGNMENTS_FILE + ".tmp"))
+        os.replace(os.path.join(_index_dir, ASSIGNMENTS_FILE + ".tmp"), os.path.join(_index_dir, ASSIGNMENTS_FILE))
+        _write_meta(_index_dir, {**_meta, "ivf": True, "nlist": nlist})
+
+        _load_locked(_index_dir)
+        return nlist
+
+
+def get_indexed_paths() -> set:
+    """
+    Get the source paths already in the index (to skip them when extending it).
+
+    Returns:
+        set: 'path' values of the indexed cases
+    """
+    with _index_lock:
+        return {case.get("path") for case in _cases}
+
+
+def get_similarity_index_info() -> Dict:
+    """
+    Get information about the loaded similar-case index.
+
+    Returns:
+        dict: Index status, size and IVF settings
+    """
+    return {
+        "loaded": is_similarity_index_loaded(),
+        "path": _index_dir,
+        "cases": len(_cases),
+        "dim": _meta["dim"] if _meta else None,
+        "model_version": _meta.get("model_version") if _meta else None,
+        "ivf_lists": len(_centroids) if _centroids is not None else None,
+    }
+
+
+def _load_locked(index_dir: str):
+    """
+    (Re)load the index files (caller holds the lock).
+
+    Args:
+        index_dir: Index directory
+    """
+    global _meta, _embeddings, _cases, _cases_bytes, _centroids
+
+    with open(os.path.join(index_dir, INDEX_META_FILE), "r") as f:
+        meta = json.load(f)
+    dim = meta["dim"]
+
+    cases = []
+    case_offsets = [0]  # Byte offset after each complete record
+    with open(os.path.join(index_dir, CASES_FILE), "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            cases.append(json.loads(line))
+            case_offsets.append(case_offsets[-1] + len(line))
+
+    embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+    rows = os.path.getsize(embeddings_path) // (dim * 2)
+
+    centroids = None
+    assignments = None
+    assignments_path = os.path.join(index_dir, ASSIGNMENTS_FILE)
+    if meta.get("ivf") and os.path.exists(assignments_path):
+        centroids = np.load(os.path.join(index_dir, CENTROIDS_FILE))
+        assignments = np.fromfile(assignments_path, dtype=np.int32)
+        rows = min(rows, len(assignments))
+
+    # A partially written append leaves extra rows in some files; use the complete ones
+    count = min(rows, len(cases))
+    cases = cases[:count]
+    cases_bytes = case_offsets[count]
+    embeddings = np.memmap(embeddings_path, dtype=np.float16, mode="r", shape=(count, dim)) if count else None
+
+    if assignments is not None:
+        assignments = assignments[:count]
+
+    _meta = meta
+    _embeddings = embeddings
+    _cases = cases
+    _cases_bytes = cases_bytes
+    _centroids = centroids
+    _set_assignments_locked(assignments)
+
+
+def _append_locked(records: List[Dict], new_assignments: Optional[np.ndarray]):
+    """
+    Extend the in-memory index after rows were appended (caller holds the lock).
+
+    Args:
+        records: Case records of the appended rows
+        new_assignments: IVF list of each appended row, or None without IVF
+    """
+    global _embeddings, _cases, _cases_bytes
+
+    count = len(_cases) + len(records)
+    path = os.path.join(_index_dir, EMBEDDINGS_FILE)
+    _embeddings = np.memmap(path, dtype=np.float16, mode="r", shape=(count, _meta["dim"]))
+    _cases_bytes += sum(len(json.dumps(record)) + 1 for record in records)
+    # New list objects, so searches holding the previous snapshot stay consistent
+    _cases = _cases + records
+
+    if new_assignments is not None:
+        _set_assignments_locked(np.concatenate([_assignments, new_assignments]))
+
+
+def _set_assignments_locked(assignments: Optional[np.ndarray]):
+    """
+    Rebuild the IVF inverted lists from per-row assignments (caller holds the lock).
+
+    Args:
+        assignments: (N,) centroid id per row, or None without IVF
+    """
+    global _assignments, _list_order, _list_offsets
+
+    _assignments = assignments
+    if assignments is None:
+        _list_order = _list_offsets = None
+        return
+
+    _list_order = np.argsort(assignments, kind="stable").astype(np.int64)
+    _list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=len(_centroids)))])
+
+
+def _truncate_to_loaded_rows():
+    """
+    Cut off anything a crashed append left past the loaded rows, so new rows
+    line up across files (caller holds the lock).
+    """
+    count = len(_cases)
+    files = [
+        (EMBEDDINGS_FILE, count * _meta["dim"] * 2),
+        (CASES_FILE, _cases_bytes),
+    ]
+    if _centroids is not None:
+        files.append((ASSIGNMENTS_FILE, count * 4))
+
+    for name, size in files:
+        path = os.path.join(_index_dir, name)
+        if os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+
+def _reset_locked():
+    """
+    Clear the loaded index.
+    """
+    global _meta, _embeddings, _cases, _cases_bytes, _centroids, _assignments, _list_order, _list_offsets
+
+    _meta = None
+    _embeddings = None
+    _cases = []
+    _cases_bytes = 0
+    _centroids = None
+    _assignments = None
+    _list_order = None
+    _list_offsets = None
+
+
+def _probe_rows(query: np.ndarray, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int) -> np.ndarray:
+    """
+    Collect the rows of the IVF lists nearest to a query.
+
+    Args:
+        query: (dim,) float32 query
+        centroids: (nlist, dim) centroids
+        order: Row ids sorted by list
+        offsets: List boundaries in order
+        nprobe: Number of lists to collect
+
+    Returns:
+        np.ndarray: Row ids, sorted for sequential reads from the memory map
+    """
+    nprobe = min(max(nprobe, 1), len(centroids))
+    centroid_scores = centroids @ query
+    lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+    rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+    return np.sort(rows)
+
+
+def _assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Find the nearest centroid (highest dot product) for each vector.
+
+    Args:
+        vectors: (N, dim) float32
+        centroids: (nlist, dim) float32
+
+    Returns:
+        np.ndarray: (N,) centroid ids
+    """
+    return np.argmax(vectors @ centroids.T, axis=1)
+
+
+def _write_meta(index_dir: str, meta: Dict):
+    """
+    Write index.json atomically.
+
+    Args:
+        index_dir: Index directory
+        meta: Index metadata
+    """
+    temp_path = os.path.join(index_dir, INDEX_META_FILE + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(temp_path, os.path.join(index_dir, INDEX_META_FILE))
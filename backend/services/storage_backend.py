@@ -0,0 +1,489 @@
+"""
+Storage Backend for state shared between server replicas.
+Prediction results, Gemini explanations and chat sessions are kept through
+one pluggable key-value backend chosen by URL:
+
+    memory://                    per-process LRU (single server, the default)
+    disk:///var/lib/skin-cache   files on a local or shared volume
+    redis://[:password@]host:6379/0   Redis or any RESP-compatible server
+
+With a shared backend every replica behind the load balancer sees the same
+cache and sessions, so hit rates do not fall to 1/N as replicas are added.
+Values are JSON documents. Storage failures are logged and treated as a
+miss, so an unavailable backend degrades to recomputing rather than errors.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.resp_client import RespClient, RespConnectionError, RespError
+from utils.structured_logging import get_logger
+
+log = get_logger("storage")
+
+# Backend configuration
+DEFAULT_STORAGE_URL = "memory://"
+MEMORY_MAX_ENTRIES_PER_NAMESPACE = 1000  # LRU capacity of each namespace in memory://
+DISK_PRUNE_EVERY_WRITES = 500  # Remove expired files from disk:// after this many writes
+REDIS_KEY_PREFIX = "skin:"  # Namespaces keys when the Redis database is shared
+REDIS_POOL_SIZE = 16  # Connections per process
+REDIS_TIMEOUT_SECONDS = 1.0  # Connect/reply timeout (a slow cache must not stall requests)
+
+# Configured backend and per-namespace counters
+_backend = None
+_backend_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+class StorageBackend:
+    """
+    Key-value store for JSON-encoded bytes with per-key expiry.
+    Subclasses implement the raw operations; bulk operations default to
+    one call per key and are overridden where the backend can batch.
+    """
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, bytes], ttl_seconds: float):
+        for key, value in items.items():
+            self.set(key, value, ttl_seconds)
+
+    def info(self) -> Dict:
+        return {}
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Per-process LRU with expiry; each namespace has its own capacity.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries_per_namespace: int = MEMORY_MAX_ENTRIES_PER_NAMESPACE):
+        self.max_entries = max_entries_per_namespace
+        self._lock = threading.Lock()
+        self._namespaces = {}  # namespace -> OrderedDict(key -> (expires_at, value)), oldest first
+
+    def get(self, key):
+        namespace = self._namespace(key)
+        with self._lock:
+            entry = namespace.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del namespace[key]
+                return None
+            namespace.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl_seconds):
+        namespace = self._namespace(key)
+        with self._lock:
+            namespace[key] = (time.time() + ttl_seconds, value)
+            namespace.move_to_end(key)
+            while len(namespace) > self.max_entries:
+                namespace.popitem(last=False)
+
+    def delete(self, key):
+        namespace = self._namespace(key)
+        with self._lock:
+            namespace.pop(key, None)
+
+    def info(self):
+        with self._lock:
+            return {"entries": {name: len(entries) for name, entries in self._namespaces.items()}}
+
+    def _namespace(self, key):
+        name = key.split(":", 1)[0]
+        with self._lock:
+            return self._namespaces.setdefault(name, OrderedDict())
+
+
+class DiskBackend(StorageBackend):
+    """
+    One file per key: an 8-byte expiry timestamp followed by the value.
+    Writes go through a temporary file and an atomic rename, so processes
+    (or hosts sharing the volume) never read a partial value.
+    """
+
+    name = "disk"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        (expires_at,) = struct.unpack(">d", data[:8])
+        if expires_at <= time.time():
+            self._remove(path)
+            return None
+        return data[8:]
+
+    def set(self, key, value, ttl_seconds):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(struct.pack(">d", time.time() + ttl_seconds))
+            f.write(value)
+        os.replace(temp_path, path)
+
+        with self._writes_lock:
+            self._writes += 1
+            prune = self._writes % DISK_PRUNE_EVERY_WRITES == 0
+        if prune:
+            threading.Thread(target=self.prune_expired, daemon=True).start()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def prune_expired(self) -> int:
+        """
+        Delete expired entries.
+
+        Returns:
+            int: Number of files removed
+        """
+        removed = 0
+        now = time.time()
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".bin"):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with open(path, "rb") as f:
+                    (expires_at,) = struct.unpack(">d", f.read(8))
+            except (OSError, struct.error):
+                continue
+            if expires_at <= now:
+                self._remove(path)
+                removed += 1
+        return removed
+
+    def info(self):
+        return {"directory": self.directory}
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".bin")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class RedisBackend(StorageBackend):
+    """
+    Redis-protocol backend over a pooled connection set. Bulk gets use MGET
+    and bulk sets are pipelined, so both cost one round trip.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        self.client = RespClient(url, pool_size=REDIS_POOL_SIZE, timeout=REDIS_TIMEOUT_SECONDS)
+        self.url = f"redis://{self.client.host}:{self.client.port}/{self.client.db}"
+
+    def get(self, key):
+        return self.client.execute("GET", REDIS_KEY_PREFIX + key)
+
+    def set(self, key, value, ttl_seconds):
+        self.client.execute("SET", REDIS_KEY_PREFIX + key, value, "PX", max(int(ttl_seconds * 1000), 1))
+
+    def delete(self, key):
+        self.client.execute("DEL", REDIS_KEY_PREFIX + key)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return self.client.execute("MGET", *[REDIS_KEY_PREFIX + key for key in keys])
+
+    def set_many(self, items, ttl_seconds):
+        ttl_ms = max(int(ttl_seconds * 1000), 1)
+        replies = self.client.pipeline([
+            ("SET", REDIS_KEY_PREFIX + key, value, "PX", ttl_ms) for key, value in items.items()
+        ])
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+
+    def info(self):
+        return {"url": self.url, **self.client.get_stats()}
+
+
+def configure_storage(url: Optional[str] = None) -> bool:
+    """
+    Select the storage backend shared by caches and chat sessions.
+
+    Args:
+        url: Backend URL (memory://, disk:///path, redis://host:port/db);
+            default DEFAULT_STORAGE_URL
+
+    Returns:
+        bool: True if the backend is ready, False if it fell back to memory://
+    """
+    global _backend
+
+    url = url or DEFAULT_STORAGE_URL
+    try:
+        backend = _create_backend(url)
+        if isinstance(backend, RedisBackend):
+            backend.client.execute("PING")
+    except Exception as e:
+        log.error("Storage backend unavailable - using memory://", url=_redact(url), error=str(e))
+        with _backend_lock:
+            _backend = MemoryBackend()
+        return False
+
+    with _backend_lock:
+        _backend = backend
+    log.info("Storage backend ready", backend=backend.name, url=_redact(url))
+    return True
+
+
+def storage_get(namespace: str, key: str) -> Optional[Dict]:
+    """
+    Read a value.
+
+    Args:
+        namespace: Kind of data ("predictions", "explanations", "chat", ...)
+        key: Key within the namespace
+
+    Returns:
+        dict: Stored value, or None on a miss or storage error
+    """
+    return storage_get_many(namespace, [key])[0]
+
+
+def storage_get_many(namespace: str, keys: List[str]) -> List[Optional[Dict]]:
+    """
+    Read several values in one round trip where the backend supports it.
+
+    Args:
+        namespace: Kind of data
+        keys: Keys within the namespace
+
+    Returns:
+        list: Stored value or None for each key, in order
+    """
+    if not keys:
+        return []
+
+    backend = _get_backend()
+    try:
+        raw_values = backend.get_many([f"{namespace}:{key}" for key in keys])
+        values = [json.loads(raw) if raw is not None else None for raw in raw_values]
+    except (OSError, ValueError, RespConnectionError, RespError) as e:
+        log.warning("Storage read failed", namespace=namespace, keys=len(keys), error=str(e))
+        _count(namespace, "errors")
+        values = [None] * len(keys)
+
+    hits = sum(1 for value in values if value is not None)
+    _count(namespace, "hits", hits)
+    _count(namespace, "misses", len(keys) - hits)
+    return values
+
+
+def storage_set(namespace: str, key: str, value: Dict, ttl_seconds: float) -> bool:
+    """
+    Write a value.
+
+    Args:
+        namespace: Kind of data
+        key: Key within the namespace
+        value: JSON-serializable value
+        ttl_seconds: Time until the value expires
+
+    Returns:
+        bool: True if stored
+    """
+    return storage_set_many(namespace, {key: value}, ttl_seconds)
+
+
+def storage_set_many(namespace: str, items: Dict[str, Dict], ttl_seconds: float) -> bool:
+    """
+    Write several values in one round trip where the backend supports it.
+
+    Args:
+        namespace: Kind of data
+        items: Key to JSON-serializable value
+        ttl_seconds: Time until the values expire
+
+    Returns:
+        bool: True if all were stored
+    """
+    if not items:
+        return True
+
+    backend = _get_backend()
+    try:
+        encoded = {
+            f"{namespace}:{key}": json.dumps(value, separators=(",", ":")).encode("utf-8")
+            for key, value in items.items()
+        }
+        if len(encoded) == 1:
+            backend.set(*next(iter(encoded.items())), ttl_seconds)
+        else:
+            backend.set_many(encoded, ttl_seconds)
+    except (OSError, TypeError, ValueError, RespConnectionError, RespError) as e:
+        log.warning("Storage write failed", namespace=namespace, keys=len(items), error=str(e))
+        _count(namespace, "errors")
+        return False
+
+    _count(namespace, "writes", len(items))
+    return True
+
+
+def storage_delete(namespace: str, key: str):
+    """
+    Delete a value (missing keys are ignored).
+
+    Args:
+        namespace: Kind of data
+        key: Key within the namespace
+    """
+    try:
+        _get_backend().delete(f"{namespace}:{key}")
+    except (OSError, RespConnectionError, RespError) as e:
+        log.warning("Storage delete failed", namespace=namespace, error=str(e))
+        _count(namespace, "errors")
+
+
+def content_key(*parts) -> str:
+    """
+    Build a fixed-length key from the parts that determine a value.
+
+    Args:
+        *parts: Strings, numbers or bytes
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def get_storage_info() -> Dict:
+    """
+    Get the backend in use and hit rates per namespace.
+
+    Returns:
+        dict: Backend name and details, plus counters per namespace
+    """
+    backend = _get_backend()
+    with _stats_lock:
+        namespaces = {}
+        for namespace, counters in _stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            namespaces[namespace] = {
+                **counters,
+                "hit_rate": round(counters["hits"] / lookups, 3) if lookups else None,
+            }
+
+    try:
+        details = backend.info()
+    except Exception as e:
+        details = {"error": str(e)}
+
+    return {"backend": backend.name, **details, "namespaces": namespaces}
+
+
+def _get_backend() -> StorageBackend:
+    """
+    Get the configured backend, defaulting to memory:// if none was configured.
+
+    Returns:
+        StorageBackend: Active backend
+    """
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = MemoryBackend()
+    return _backend
+
+
+def _create_backend(url: str) -> StorageBackend:
+    """
+    Instantiate the backend for a URL.
+
+    Args:
+        url: Backend URL
+
+    Returns:
+        StorageBackend: New backend
+
+    Raises:
+        ValueError: For an unknown scheme
+    """
+    scheme, _, location = url.partition("://")
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme == "disk":
+        return DiskBackend(location or "storage")
+    if scheme in ("redis", "resp"):
+        return RedisBackend(url)
+    raise ValueError(f"unknown storage backend scheme: {scheme}")
+
+
+def _redact(url: str) -> str:
+    """
+    Hide a password embedded in a backend URL.
+
+    Args:
+        url: Backend URL
+
+    Returns:
+        str: URL safe to log
+    """
+    scheme, _, rest = url.partition("://")
+    if "@" not in rest:
+        return url
+    return f"{scheme}://***@{rest.split('@', 1)[1]}"
+
+
+def _count(namespace: str, counter: str, amount: int = 1):
+    """
+    Increment a per-namespace counter.
+
+    Args:
+        namespace: Kind of data
+        counter: "hits", "misses", "writes" or "errors"
+        amount: Increment
+    """
+    with _stats_lock:
+        counters = _stats.setdefault(namespace, {"hits": 0, "misses": 0, "writes": 0, "errors": 0})
+        counters[counter] += amount
@@ -3,14 +3,50 @@ Swin Transformer Service for skin condition classification.
 Handles model loading, image classification, and result parsing.
 """
 
+import base64
+import functools
+import hashlib
+import io
 import os
+import threading
+import time
+from datetime import datetime
 from typing import Dict, List, Optional
+import numpy as np
 import torch
 import torch.nn as nn
 from torchvision import transforms
 from PIL import Image
 import timm
 
+from .inference_pool import (
+    start_inference_pool,
+    is_inference_pool_running,
+    pooled_forward,
+    preload_version,
+    get_inference_pool_info,
+)
+from .storage_backend import storage_get, storage_set, content_key
+from .tracing import span, record_span
+from .autotune import (
+    DEFAULT_EXECUTION_CONFIG,
+    autotune_execution,
+    apply_execution_config,
+    load_execution_config,
+    save_execution_config,
+)
+from .input_buffers import (
+    configure_input_buffers,
+    input_batch,
+    track_request_memory,
+    note_allocation,
+    note_release,
+    get_input_buffer_stats,
+)
+from utils.structured_logging import get_logger
+
+log = get_logger("model")
+
 
 # Global model instance (loaded on startup)
 _swin_model = None
@@ -18,6 +54,27 @@ _model_loaded = False
 _model_path = None
 _device = None
 
+# Versioned model registry: requests snapshot _active_version once, so a
+# hot-swap never mixes one version's weights with another's class names
+_active_version = None
+_version_counter = 0
+_registry_lock = threading.Lock()
+_reload_thread = None
+_reload_status = {"state": "idle", "model_path": None, "version": None, "error": None}
+_failed_checkpoint = None  # (path, mtime, size) of the last checkpoint that failed to load; the watcher skips it
+_refused_versions = {}  # Inside an inference worker: version -> why its checkpoint was refused
+
+# Execution configuration per model architecture (tuned or loaded on first use, see services/autotune.py)
+_execution_configs = {}
+_autotune_enabled = False
+
+# Cascade first-stage model (cheap scorer, loaded optionally on startup)
+_cascade_model = None
+_cascade_model_name = None
+_cascade_class_names = None
+_cascade_stats = {"images": 0, "escalated": 0}
+_cascade_stats_lock = threading.Lock()
+
 # Class names for skin conditions (update based on your model's training)
 CLASS_NAMES = [
     "atopic_dermatitis",
@@ -31,100 +88,1029 @@ CLASS_NAMES = [
     "vascular_lesion",
 ]
 
-# Confidence threshold for predictions
-CONFIDENCE_THRESHOLD = 0.01  # Return predictions with >1% confidence
+# Architecture of checkpoints that do not record their timm model name
+DEFAULT_MODEL_NAME = "swinv2_small_window16_256"
+
+# Confidence threshold for predictions
+CONFIDENCE_THRESHOLD = 0.01  # Return predictions with >1% confidence
+
+# Cascade configuration: a cheap timm model scores every image first and only
+# uncertain images are escalated to the full Swin model
+CASCADE_MODEL_NAME = "mobilenetv3_large_100"  # Default first-stage architecture
+CASCADE_CONFIDENCE_THRESHOLD = 0.80  # Escalate if top-1 confidence is below this
+CASCADE_MARGIN_THRESHOLD = 0.30  # Escalate if top-1 minus top-2 is below this
+
+# Adaptive TTA: augmented views are only added while the prediction stays uncertain
+TTA_ENTROPY_THRESHOLD = 1.5  # Augment if prediction entropy (nats) is above this
+TTA_MARGIN_THRESHOLD = 0.20  # Augment if top-1 minus top-2 is below this
+# Seconds to wait for in-flight requests before releasing a replaced model
+MODEL_DRAIN_TIMEOUT_SECONDS = 60
+
+ADAPTIVE_TTA_STAGES = [
+    [1, 2],  # Horizontal and vertical flips
+    [3],  # Center crop
+    [4, 5, 6, 7, 8],  # Five crops
+]  # Indices into TTA_VIEW_SPECS (get_tta_transforms() order), tried in order
+
+# Preprocessing (must match get_image_transform / get_tta_transforms)
+INPUT_SIZE = 256
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+# TTA views as (resized side, crop or flip), in get_tta_transforms() order
+TTA_VIEW_SPECS = [
+    (INPUT_SIZE, None),  # Original
+    (INPUT_SIZE, "hflip"),
+    (INPUT_SIZE, "vflip"),
+    (int(INPUT_SIZE * 1.1), "center"),  # Center crop
+    (int(INPUT_SIZE * 1.2), "top_left"),  # Five crops
+    (int(INPUT_SIZE * 1.2), "top_right"),
+    (int(INPUT_SIZE * 1.2), "bottom_left"),
+    (int(INPUT_SIZE * 1.2), "bottom_right"),
+    (int(INPUT_SIZE * 1.2), "center"),
+]
+# ToTensor + Normalize folded into one multiply and subtract per channel
+_NORMALIZE_SCALE = (1.0 / (255.0 * torch.tensor(IMAGENET_STD))).view(3, 1, 1)
+_NORMALIZE_SHIFT = (torch.tensor(IMAGENET_MEAN) / torch.tensor(IMAGENET_STD)).view(3, 1, 1)
+
+# Tiled inference (overlapping INPUT_SIZE windows instead of one squashed view)
+TILE_MAX_SIDE = 1024  # Longer image side is reduced to this before tiling (smaller images keep native scale)
+TILE_OVERLAP = 0.25  # Fraction of a tile shared with its neighbour
+TILE_BATCH_SIZE = 9  # Tiles per forward pass (the largest input buffer and inference pool batch)
+TILE_POOLING_METHODS = ("max", "mean", "attention")
+TILE_POOLING = "attention"  # Default tile aggregation
+TILE_ATTENTION_TEMPERATURE = 0.25  # Lower concentrates attention pooling on the most confident tiles
+TILE_REPORT_COUNT = 3  # Most informative tiles returned with a tiled result
+
+# Saliency heatmaps (class activation maps of the last Swin stage)
+SALIENCY_PNG_SIZE = 64  # Side of the returned heatmap PNG (the native map is INPUT_SIZE / 32 per side)
+
+# Multi-frame input (animated GIF/WebP and bursts of shots, see _predict_frames)
+MAX_FRAMES = 9  # Frames scored per request, in one forward pass (the largest input buffer and inference pool batch)
+
+# Quality tiers: the same weights run at a lower input resolution for cheap
+# screening. SwinV2 computes its relative position bias with a small MLP over
+# log-spaced coordinates, so the bias is rebuilt for the smaller grid rather
+# than interpolated. Each stage's token grid (side / 4, / 8, / 16, / 32) must
+# be a multiple of the window (16) or no larger than it, e.g. 128 or 256
+QUALITY_INPUT_SIZES = {
+    "full": INPUT_SIZE,
+    "reduced": 128,  # A quarter of the tokens; base view only (no TTA, tiling or cascade)
+}
+
+# Upload-time preprocessing (see preprocess_upload)
+PREPROCESSED_UPLOAD_SUFFIX = ".npy"  # Base view saved next to an upload as "<upload>.npy"
+
+# Image embeddings (pooled Swin features before head.fc) for similar-case search
+EMBEDDING_BATCH_SIZE = 8  # Images per forward pass in extract_embeddings
+
+# Prediction cache (shared across replicas when the storage backend is)
+PREDICTION_CACHE_NAMESPACE = "predictions"
+PREDICTION_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+class ModelVersion:
+    """
+    A loaded and warmed checkpoint together with its metadata.
+    Counts in-flight requests so a replaced version can be drained; a
+    retired version drops its weights once the last request releases it.
+    """
+
+    def __init__(self, version, model, class_names, model_path, model_name,
+                 file_mtime, load_seconds, warmup_seconds, execution=None, reduced_models=None, digest=None):
+        self.version = version
+        self.model = model
+        self.class_names = class_names
+        self.model_path = model_path
+        self.model_name = model_name
+        self.file_mtime = file_mtime
+        self.digest = digest  # SHA-256 of the checkpoint; workers refuse a file that no longer matches
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.execution = execution or dict(DEFAULT_EXECUTION_CONFIG)
+        self.reduced_models = reduced_models or {}  # Quality tier -> model sharing the weights at a lower resolution
+        self.loaded_at = datetime.now().isoformat()
+        self.in_flight = 0
+        self.retired = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                if self.retired:
+                    self._release_weights()
+                self._condition.notify_all()
+
+    def retire(self):
+        """
+        Mark the version as replaced; its weights are released now if it is
+        idle, otherwise by the release() of its last in-flight request.
+        """
+        with self._condition:
+            self.retired = True
+            if self.in_flight == 0:
+                self._release_weights()
+
+    def _release_weights(self):
+        self.model = None
+        self.reduced_models = {}
+
+    def wait_drained(self, timeout: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self.in_flight == 0, timeout=timeout)
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": self.version,
+            "model_path": self.model_path,
+            "model_name": self.model_name,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_seconds": round(self.warmup_seconds, 3),
+            "execution": self.execution,
+            "qualities": ["full", *self.reduced_models],
+            "in_flight": self.in_flight,
+        }
+
+
+def load_swin_model(model_path: str = "models/swin_best.pt", autotune: bool = False) -> bool:
+    """
+    Load Swin Transformer model from file and make it the active version.
+
+    Args:
+        model_path: Path to the Swin model file (.pt format)
+        autotune: Benchmark the execution variants (precision, backend,
+            threads, batch size) if this host has no tuned configuration for
+            the model yet (see services/autotune.py). A saved configuration
+            is used either way
+
+    Returns:
+        bool: True if model loaded successfully, False otherwise
+    """
+    global _model_loaded, _model_path, _autotune_enabled
+
+    # Always set model path (even if loading fails)
+    _model_path = model_path
+    _autotune_enabled = autotune
+
+    try:
+        # Check if model file exists
+        if not os.path.exists(model_path):
+            log.warning("Model file not found - using mock mode until it is available", model_path=model_path)
+            _model_loaded = _active_version is not None
+            return False
+
+        version = _load_model_version(model_path)
+        if is_inference_pool_running():
+            # Workers load the version before it gets traffic, not inside its first requests
+            preload_version(version.version, version.model_path, version.digest)
+        _activate_model_version(version)
+
+        log.info("Model loaded", classes=len(version.class_names), device=str(_device), version=version.version)
+
+        return True
+
+    except Exception as e:
+        log.error("Failed to load model - using mock mode", error=str(e))
+        _model_loaded = _active_version is not None
+        return False
+
+
+def _load_model_version(model_path: str) -> ModelVersion:
+    """
+    Load a checkpoint into a new, warmed ModelVersion without activating it.
+    Safe to call from a background thread while requests are being served.
+
+    Args:
+        model_path: Path to the Swin model file (.pt format)
+
+    Returns:
+        ModelVersion: The loaded version (raises on failure)
+    """
+    global _device, _version_counter
+
+    load_start = time.time()
+
+    # Determine device (GPU if available, otherwise CPU)
+    if _device is None:
+        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    log.info("Loading model", model_path=model_path, device=str(_device))
+
+    file_mtime = os.path.getmtime(model_path)
+    digest = _file_digest(model_path)
+
+    model, class_names, model_name = _build_model(model_path)
+    log.info("Checkpoint read", classes=len(class_names), model_name=model_name)
+    reduced_models = build_reduced_models(model, model_name)
+
+    execution = _execution_config_for(model, model_name)
+    _apply_execution(model, reduced_models, execution)
+    if execution["threads"]:
+        torch.set_num_threads(execution["threads"])
+
+    load_seconds = time.time() - load_start
+
+    # Warm up before the version can receive traffic
+    warmup_start = time.time()
+    _warm_up(model, reduced_models)
+    warmup_seconds = time.time() - warmup_start
+    log.info(
+        "Model warmed up",
+        load_s=round(load_seconds, 2),
+        warmup_s=round(warmup_seconds, 2),
+        precision=execution["precision"],
+        backend=execution["backend"],
+        threads=torch.get_num_threads(),
+        qualities=",".join(["full", *reduced_models]),
+    )
+
+    with _registry_lock:
+        _version_counter += 1
+        version_id = f"v{_version_counter}-{digest[:12]}"
+
+    return ModelVersion(
+        version=version_id,
+        model=model,
+        class_names=class_names,
+        model_path=model_path,
+        model_name=model_name,
+        file_mtime=file_mtime,
+        load_seconds=load_seconds,
+        warmup_seconds=warmup_seconds,
+        execution=execution,
+        reduced_models=reduced_models,
+        digest=digest,
+    )
+
+
+def _warm_up(model: nn.Module, reduced_models: Dict[str, nn.Module]):
+    """
+    Run one forward pass per quality tier so the first request does not pay
+    for lazy allocations.
+
+    Args:
+        model: Full-quality model
+        reduced_models: Reduced-tier models (see build_reduced_models)
+    """
+    with torch.no_grad():
+        model(torch.zeros(1, 3, 256, 256, device=_device))
+        for quality, reduced_model in reduced_models.items():
+            size = QUALITY_INPUT_SIZES[quality]
+            reduced_model(torch.zeros(1, 3, size, size, device=_device))
+
+
+def build_reduced_models(model: nn.Module, model_name: str) -> Dict[str, nn.Module]:
+    """
+    Create the lower-resolution quality tiers of a freshly loaded model.
+    Each tier is the same architecture built for its input size, with the
+    full model's parameters assigned rather than copied, so the tiers add
+    no fp32 weight memory (_apply_execution keeps int8 weights shared too).
+    Tiers the architecture cannot run at (window and grid sizes that do not
+    fit) are skipped.
+
+    Args:
+        model: Eager fp32 model, before apply_execution_config
+        model_name: timm model name
+
+    Returns:
+        dict: Quality tier -> eval-mode model (tiers at INPUT_SIZE excluded)
+    """
+    reduced_models = {}
+    num_classes = model.get_classifier().out_features
+    state_dict = model.state_dict(keep_vars=True)
+    for quality, size in QUALITY_INPUT_SIZES.items():
+        if size == INPUT_SIZE:
+            continue
+        try:
+            reduced_model = timm.create_model(model_name, pretrained=False, num_classes=num_classes, img_size=size)
+            # Position tables and attention masks are buffers outside the
+            # state dict, so they keep the values computed for this size
+            reduced_model.load_state_dict(state_dict, assign=True)
+            reduced_model = reduced_model.to(_device).eval()
+            with torch.no_grad():
+                reduced_model(torch.zeros(1, 3, size, size, device=_device))
+        except Exception as e:
+            log.warning("Quality tier unavailable", quality=quality, input_size=size, model_name=model_name, error=str(e))
+            continue
+        reduced_models[quality] = reduced_model
+    return reduced_models
+
+
+def downscale_for_quality(batch: torch.Tensor, quality: str) -> torch.Tensor:
+    """
+    Resize a preprocessed INPUT_SIZE batch to a quality tier's input size.
+    Normalization is affine, so resizing after it matches resizing the
+    pixels (the base view, often the upload-time artifact, is reused
+    without decoding the image again).
+
+    Args:
+        batch: Normalized (N, 3, INPUT_SIZE, INPUT_SIZE) batch
+        quality: Key of QUALITY_INPUT_SIZES
+
+    Returns:
+        torch.Tensor: (N, 3, size, size) batch
+    """
+    size = QUALITY_INPUT_SIZES[quality]
+    if size == batch.shape[-1]:
+        return batch
+    return torch.nn.functional.interpolate(batch, size=(size, size), mode="bilinear", align_corners=False, antialias=True)
+
+
+def _apply_execution(model: nn.Module, reduced_models: Dict[str, nn.Module], execution: Dict):
+    """
+    Convert a model and its quality tiers to an execution configuration.
+    Linear layers do not depend on the input size, so the tiers reuse the
+    full model's quantized layers instead of packing their own int8 copy.
+
+    Args:
+        model: Full-resolution model
+        reduced_models: Result of build_reduced_models (share the model's parameters)
+        execution: Execution configuration (see DEFAULT_EXECUTION_CONFIG)
+    """
+    apply_execution_config(model, execution, (3, INPUT_SIZE, INPUT_SIZE))
+    quantized_layers = {
+        name: module for name, module in model.named_modules()
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+    }
+    for quality, reduced_model in reduced_models.items():
+        for name, module in quantized_layers.items():
+            parent_name, _, child_name = name.rpartition(".")
+            setattr(reduced_model.get_submodule(parent_name), child_name, module)
+        size = QUALITY_INPUT_SIZES[quality]
+        apply_execution_config(reduced_model, execution, (3, size, size))
+
+
+def _execution_config_for(model: nn.Module, model_name: str) -> Dict:
+    """
+    Get the execution configuration for a model architecture on this host:
+    the saved tuning result, a new one if autotuning is enabled, or eager
+    fp32. Only CPU inference is tuned.
+
+    Args:
+        model: Freshly built eager model (the autotuning reference)
+        model_name: timm model name
+
+    Returns:
+        dict: Execution configuration (see DEFAULT_EXECUTION_CONFIG)
+    """
+    if _device.type != "cpu":
+        return dict(DEFAULT_EXECUTION_CONFIG)
+
+    if model_name not in _execution_configs:
+        result = load_execution_config(model_name)
+        if result is None and _autotune_enabled:
+            log.info("Autotuning execution", model_name=model_name)
+            result = tune_execution(model)
+            try:
+                save_execution_config(model_name, result)
+            except OSError as e:
+                log.warning("Failed to save autotune result", error=str(e))
+        _execution_configs[model_name] = result["config"] if result else dict(DEFAULT_EXECUTION_CONFIG)
+    return _execution_configs[model_name]
+
+
+def tune_execution(model: nn.Module, thread_counts: Optional[List[int]] = None) -> Dict:
+    """
+    Benchmark the execution variants of a model on the request forward
+    pass (see services/autotune.py). The model is not modified.
+
+    Args:
+        model: Eager fp32 model, e.g. from build_model_from_checkpoint
+        thread_counts: Intra-op thread counts to try (default: 1, half and all CPUs)
+
+    Returns:
+        dict: Result of autotune_execution
+    """
+    num_classes = model.get_classifier().out_features
+    return autotune_execution(
+        model,
+        lambda candidate, batch: _logits_and_features(candidate, batch)[:, :num_classes],
+        (3, INPUT_SIZE, INPUT_SIZE),
+        thread_counts,
+    )
+
+
+def _build_model(model_path):
+    """
+    Create the Swin model for a checkpoint and load its weights.
+    Touches no registry state, so it is also safe inside inference workers.
+
+    Args:
+        model_path: Path to the Swin model file (.pt format), or a file object holding one
+
+    Returns:
+        tuple: (model in eval mode on _device, class names, model name)
+    """
+    # Load the checkpoint
+    checkpoint = torch.load(model_path, map_location=_device, weights_only=False)
+
+    # Try to detect the correct model architecture from checkpoint
+    # Check dimensions to identify Swin variant
+    if isinstance(checkpoint, dict):
+        state_dict = checkpoint.get("model_state_dict") or checkpoint.get("state_dict") or checkpoint
+    else:
+        state_dict = checkpoint
+
+    # Distilled students and retrained checkpoints record their architecture
+    model_name = DEFAULT_MODEL_NAME
+    if isinstance(checkpoint, dict) and checkpoint.get("model_name"):
+        model_name = checkpoint["model_name"]
+
+    # Detect number of classes from the final layer
+    class_names = CLASS_NAMES
+    num_classes = len(class_names)
+    if "head.fc.weight" in state_dict:
+        num_classes = state_dict["head.fc.weight"].shape[0]
+    elif "head.weight" in state_dict:
+        num_classes = state_dict["head.weight"].shape[0]
+
+    # Create model architecture with correct number of classes
+    model = timm.create_model(
+        model_name,
+        pretrained=False,
+        num_classes=num_classes
+    )
+
+    # Load state dict
+    model.load_state_dict(state_dict, strict=False)
+
+    # Load class names from checkpoint if available
+    if "class_to_idx" in checkpoint:
+        class_to_idx = checkpoint["class_to_idx"]
+        idx_to_class = {v: k for k, v in class_to_idx.items()}
+        class_names = [idx_to_class[i] for i in range(num_classes)]
+    elif num_classes != len(class_names):
+        # Fallback to generic names if not in checkpoint
+        class_names = [f"class_{i}" for i in range(num_classes)]
+
+    model = model.to(_device)
+    model.eval()
+    return model, class_names, model_name
+
+
+def build_model_from_checkpoint(model_path: str):
+    """
+    Load a checkpoint into a standalone model without activating it
+    (for offline tools such as distillation and evaluation).
+
+    Args:
+        model_path: Path to the Swin model file (.pt format)
+
+    Returns:
+        tuple: (model in eval mode, class names, timm model name)
+    """
+    global _device
+
+    if _device is None:
+        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return _build_model(model_path)
+
+
+def _file_digest(file_path: str) -> str:
+    """
+    Compute the SHA-256 of a checkpoint file (used in version identifiers).
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        str: Hex digest
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _activate_model_version(version: ModelVersion):
+    """
+    Atomically make a loaded version the active one and drain the
+    previous version in the background.
+
+    Args:
+        version: The version to activate
+    """
+    global _active_version, _swin_model, _model_loaded, _model_path, CLASS_NAMES
+
+    # Preprocessing writes into pooled buffers from the first request on
+    configure_input_buffers((3, INPUT_SIZE, INPUT_SIZE))
+
+    with _registry_lock:
+        previous = _active_version
+        _active_version = version
+
+        # Module-level aliases kept for callers that read them directly
+        _swin_model = version.model
+        CLASS_NAMES = version.class_names
+        _model_path = version.model_path
+        _model_loaded = True
+
+    if previous is not None:
+        log.info("Activated model", version=version.version, replaced=previous.version)
+        threading.Thread(target=_drain_model_version, args=(previous,), daemon=True).start()
+
+
+def _drain_model_version(version: ModelVersion):
+    """
+    Retire a replaced version and report when its in-flight requests finish.
+    The weights are released by the last request, never while one still runs.
+
+    Args:
+        version: The replaced version
+    """
+    version.retire()
+    if version.wait_drained(MODEL_DRAIN_TIMEOUT_SECONDS):
+        log.info("Model drained", version=version.version)
+    else:
+        log.warning(
+            "Model not drained - weights are released when its last request finishes",
+            version=version.version,
+            in_flight=version.in_flight,
+            timeout_s=MODEL_DRAIN_TIMEOUT_SECONDS,
+        )
+
+
+def _acquire_active_version() -> Optional[ModelVersion]:
+    """
+    Snapshot the active version and register an in-flight request on it.
+    The caller must call release() on the returned version when done.
+
+    Returns:
+        ModelVersion: The active version, or None if no model is loaded
+    """
+    with _registry_lock:
+        version = _active_version
+        if version is not None:
+            version.acquire()
+    return version
+
+
+def reload_swin_model(model_path: Optional[str] = None) -> Dict:
+    """
+    Load and warm a checkpoint in the background, then swap it in atomically.
+    Requests keep being served by the current version until the swap.
+
+    Args:
+        model_path: Checkpoint to load (default: the active model's path)
+
+    Returns:
+        dict: {"success": bool, "message": str, "status": dict}
+    """
+    global _reload_thread
+
+    model_path = model_path or _model_path
+
+    with _registry_lock:
+        if _reload_thread is not None and _reload_thread.is_alive():
+            return {
+                "success": False,
+                "message": "A model reload is already in progress",
+                "status": dict(_reload_status),
+            }
+
+        if not model_path or not os.path.exists(model_path):
+            return {
+                "success": False,
+                "message": f"Model file not found: {model_path}",
+                "status": dict(_reload_status),
+            }
+
+        _reload_status.update({
+            "state": "loading",
+            "model_path": model_path,
+            "started_at": datetime.now().isoformat(),
+            "error": None,
+        })
+        _reload_thread = threading.Thread(target=_reload_worker, args=(model_path,), daemon=True)
+        _reload_thread.start()
+
+    return {
+        "success": True,
+        "message": f"Reloading model from {model_path}",
+        "status": dict(_reload_status),
+    }
+
+
+def _reload_worker(model_path: str):
+    """
+    Background body of reload_swin_model.
+
+    Args:
+        model_path: Checkpoint to load
+    """
+    global _failed_checkpoint
+
+    checkpoint = _checkpoint_signature(model_path)
+    try:
+        version = _load_model_version(model_path)
+        if is_inference_pool_running():
+            # Workers load the version before it gets traffic, not inside its first requests
+            _reload_status.update({"state": "preloading"})
+            preload_version(version.version, version.model_path, version.digest)
+        _activate_model_version(version)
+        _reload_status.update({"state": "ready", "version": version.version})
+    except Exception as e:
+        log.error("Model reload failed - keeping current version", model_path=model_path, error=str(e))
+        _reload_status.update({"state": "failed", "error": str(e)})
+        _failed_checkpoint = checkpoint
+
+
+def _checkpoint_signature(model_path: str) -> Optional[tuple]:
+    """
+    Identify a checkpoint file's contents cheaply (without hashing it).
+
+    Args:
+        model_path: Checkpoint path
+
+    Returns:
+        tuple: (path, mtime, size), or None if the file is gone
+    """
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+    return (model_path, stat.st_mtime, stat.st_size)
+
+
+def start_model_watcher(interval_seconds: float = 30) -> bool:
+    """
+    Poll the active checkpoint file and hot-swap it when it changes.
+    A change is only picked up once the file's mtime is stable across two
+    polls, so a checkpoint that is still being copied is not loaded. A file
+    that failed to load is not retried until its mtime or size changes.
+
+    Args:
+        interval_seconds: Seconds between polls (0 disables the watcher)
+
+    Returns:
+        bool: True if the watcher was started
+    """
+    if interval_seconds <= 0:
+        return False
+
+    def watch():
+        last_seen = None
+        while True:
+            time.sleep(interval_seconds)
+            version = _active_version
+            checkpoint = version and _checkpoint_signature(version.model_path)
+            if checkpoint is None:
+                continue
+
+            mtime = checkpoint[1]
+            if mtime != version.file_mtime and mtime == last_seen and checkpoint != _failed_checkpoint:
+                log.info("Checkpoint changed on disk", model_path=version.model_path)
+                reload_swin_model(version.model_path)
+            last_seen = mtime
+
+    threading.Thread(target=watch, daemon=True).start()
+    return True
+
+
+def start_inference_workers(num_workers: int) -> bool:
+    """
+    Move Swin forward passes into dedicated worker processes.
+    Workers are forked with the active model already in memory; a hot-swapped
+    version is loaded from its checkpoint by every worker before it is activated.
+    Inference stays in-process when the pool is unavailable.
+
+    Args:
+        num_workers: Number of worker processes (0 disables the pool)
+
+    Returns:
+        bool: True if the pool started, False otherwise
+    """
+    if num_workers <= 0:
+        return False
+
+    if not is_model_loaded():
+        log.info("Inference workers not started (no model loaded)")
+        return False
+
+    if _device.type != "cpu":
+        log.info("Inference workers not started (only used for CPU inference)", device=str(_device))
+        return False
+
+    # Tuned thread count, unless the workers' share of the CPUs is smaller
+    threads_per_worker = None
+    tuned_threads = _active_version.execution["threads"]
+    if tuned_threads:
+        threads_per_worker = min(tuned_threads, max(1, (os.cpu_count() or 1) // num_workers))
+
+    return start_inference_pool(num_workers, _load_worker_model, threads_per_worker)
+
+
+def _load_worker_model(version_id: str, model_path: str, checkpoint_digest: str):
+    """
+    Get the model for a version inside an inference worker.
+    A checkpoint file that was replaced after the parent loaded the version
+    is refused, so the request runs in-process on the parent's weights.
+
+    Args:
+        version_id: Model version requested by the parent
+        model_path: Checkpoint of that version
+        checkpoint_digest: SHA-256 of the checkpoint the parent loaded
+
+    Returns:
+        callable: Batch -> logits and pooled features side by side (see _logits_and_features);
+            takes the quality tier as the "quality" option
+    """
+    # The active version at fork time is already in this process's memory
+    version = _active_version
+    if version is not None and version.version == version_id:
+        model, reduced_models = version.model, version.reduced_models
+    else:
+        if version_id in _refused_versions:
+            raise ValueError(_refused_versions[version_id])
+        # Hash and load the same bytes, so the file cannot change in between
+        with open(model_path, "rb") as f:
+            checkpoint = f.read()
+        if hashlib.sha256(checkpoint).hexdigest() != checkpoint_digest:
+            _refused_versions[version_id] = f"checkpoint {model_path} changed after {version_id} was loaded"
+            log.warning("Checkpoint changed on disk - worker refuses the version", version=version_id, model_path=model_path)
+            raise ValueError(_refused_versions[version_id])
+        model, _, model_name = _build_model(io.BytesIO(checkpoint))
+        reduced_models = build_reduced_models(model, model_name)
+        _apply_execution(model, reduced_models, _execution_configs.get(model_name, DEFAULT_EXECUTION_CONFIG))
+        _warm_up(model, reduced_models)
+
+    return functools.partial(_logits_and_features_at, {"full": model, **reduced_models})
+
+
+def _logits_and_features_at(models: Dict[str, nn.Module], batch: torch.Tensor, quality: str = "full",
+                            with_saliency: bool = False) -> torch.Tensor:
+    """
+    Run _logits_and_features with the model of a quality tier.
+    """
+    return _logits_and_features(models[quality], batch, with_saliency)
+
+
+def _logits_and_features(model: nn.Module, batch: torch.Tensor, with_saliency: bool = False) -> torch.Tensor:
+    """
+    Run the model once and return its logits and pooled pre-classifier
+    features (the image embedding) concatenated per image, optionally
+    followed by the class activation map of each image's top-1 class.
+
+    Args:
+        model: Swin model
+        batch: Preprocessed image batch
+        with_saliency: Also return the top-1 class activation maps (see _class_activation_maps)
+
+    Returns:
+        torch.Tensor: (N, num_classes + num_features [+ map height * width])
+    """
+    feature_map = model.forward_features(batch)
+    features = model.forward_head(feature_map, pre_logits=True)
+    classifier = model.get_classifier()
+    logits = classifier(features)
+    if not with_saliency:
+        return torch.cat([logits, features], dim=1)
+    saliency = _class_activation_maps(feature_map, classifier, logits.argmax(dim=1))
+    return torch.cat([logits, features, saliency.flatten(1)], dim=1)
+
+
+def _class_activation_maps(feature_map: torch.Tensor, classifier: nn.Linear, classes: torch.Tensor) -> torch.Tensor:
+    """
+    Class activation maps from the last Swin stage, reusing the activations
+    of the classification pass. The head average-pools the stage output and
+    applies one linear layer, so projecting each position onto the class
+    weights splits the logit exactly over the feature grid (the map sums
+    to the logit). No gradients or second pass are needed.
+
+    Args:
+        feature_map: (N, H, W, C) output of forward_features
+        classifier: Final linear layer (head.fc)
+        classes: (N,) class to explain per image
+
+    Returns:
+        torch.Tensor: (N, H, W) per-position contributions to each class logit
+    """
+    height, width = feature_map.shape[1:3]
+    weights = classifier.weight[classes]
+    bias = classifier.bias[classes] if classifier.bias is not None else torch.zeros(len(classes))
+    return (
+        torch.einsum("nhwc,nc->nhw", feature_map, weights) + bias[:, None, None]
+    ) / (height * width)
+
+
+def _saliency_result(activation_map: torch.Tensor, condition: str) -> Dict:
+    """
+    Turn a class activation map into the compact heatmap returned to clients.
+
+    Args:
+        activation_map: (H, W) map from _forward(..., return_saliency=True)
+        condition: Class the map explains
+
+    Returns:
+        dict: {"condition", "grid": [H, W], "map": H rows of W uint8 values
+            (0 = no positive contribution, 255 = the strongest), "png": data
+            URI of the map upsampled to SALIENCY_PNG_SIZE}. Both cover the
+            whole image (stretched, as it was for classification)
+    """
+    activation = activation_map.float().cpu().clamp_min(0)
+    peak = float(activation.max())
+    if peak > 0:
+        activation = activation * (255 / peak)
+    heatmap = activation.round().to(torch.uint8).numpy()
+
+    png = io.BytesIO()
+    Image.fromarray(heatmap).resize(
+        (SALIENCY_PNG_SIZE, SALIENCY_PNG_SIZE), Image.BILINEAR
+    ).save(png, format="PNG", optimize=True)
+    return {
+        "condition": condition,
+        "grid": list(heatmap.shape),
+        "map": heatmap.tolist(),
+        "png": "data:image/png;base64," + base64.b64encode(png.getvalue()).decode("ascii"),
+    }
 
 
-def load_swin_model(model_path: str = "models/swin_best.pt") -> bool:
+def _forward(version: ModelVersion, batch: torch.Tensor, return_features: bool = False,
+             return_saliency: bool = False, quality: str = "full"):
     """
-    Load Swin Transformer model from file.
+    Run the Swin model on a batch, in a worker process when the pool is running.
 
     Args:
-        model_path: Path to the Swin model file (.pt format)
+        version: Model version pinned for this request
+        batch: Preprocessed image batch
+        return_features: Also return the pooled features (image embeddings)
+        return_saliency: Also return each image's top-1 class activation map
+        quality: Quality tier whose model runs the batch (the batch must be
+            at that tier's input size; see QUALITY_INPUT_SIZES)
 
     Returns:
-        bool: True if model loaded successfully, False otherwise
+        torch.Tensor: Logits, (logits, pooled features) if return_features, or
+            (logits, pooled features, ((N, H, W) activation maps, (N,) class
+            each map explains)) if return_saliency
     """
-    global _swin_model, _model_loaded, _model_path, _device, CLASS_NAMES
+    options = {}
+    if return_saliency:
+        options["with_saliency"] = True
+    model = version.reduced_models.get(quality)
+    if model is not None:
+        options["quality"] = quality
+    else:
+        model = version.model
 
-    # Always set model path (even if loading fails)
-    _model_path = model_path
+    outputs = None
+    with span("model.forward", batch=batch.shape[0], model_version=version.version, quality=quality) as forward_span:
+        if is_inference_pool_running():
+            outputs = pooled_forward(batch, version.version, version.model_path, version.digest, options or None)
+        if forward_span is not None:
+            forward_span.set(pooled=outputs is not None)
+        if outputs is None:
+            outputs = _logits_and_features(model, batch, return_saliency)
+
+    num_classes = len(version.class_names)
+    if return_saliency:
+        num_features = version.model.num_features
+        saliency = outputs[:, num_classes + num_features:]
+        grid = int(round(saliency.shape[1] ** 0.5))
+        logits = outputs[:, :num_classes]
+        return (
+            logits,
+            outputs[:, num_classes:num_classes + num_features],
+            (saliency.reshape(-1, grid, grid), logits.argmax(dim=1)),
+        )
+    if return_features:
+        return outputs[:, :num_classes], outputs[:, num_classes:]
+    return outputs[:, :num_classes]
+
+
+def extract_embeddings(images: List[Image.Image]) -> Optional[np.ndarray]:
+    """
+    Compute L2-normalized Swin image embeddings (pooled features before
+    head.fc) for a list of images, e.g. to index reference cases.
+
+    Args:
+        images: RGB images
+
+    Returns:
+        np.ndarray: (len(images), num_features) float32, or None if no model is loaded
+    """
+    version = _acquire_active_version()
+    if version is None:
+        return None
 
     try:
-        # Check if model file exists
-        if not os.path.exists(model_path):
-            print(f" [WARN] Model file not found: {model_path}")
-            print(f" [INFO] Using mock mode until model is available")
-            _model_loaded = False
-            return False
+        embeddings = []
+        batch_size = version.execution["batch_size"] or EMBEDDING_BATCH_SIZE
+        with torch.no_grad():
+            for start in range(0, len(images), batch_size):
+                chunk = images[start:start + batch_size]
+                with input_batch(len(chunk)) as batch:
+                    for row, image in enumerate(chunk):
+                        preprocess_views(image, [0], batch[row:row + 1], to_device=False)
+                    _, features = _forward(version, batch.to(_device, non_blocking=True), return_features=True)
+                embeddings.append(_normalize_embedding(features))
+        return np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+    finally:
+        version.release()
 
-        # Determine device (GPU if available, otherwise CPU)
-        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f" [LOAD] Loading model from: {model_path}")
-        print(f" [INFO] Device: {_device}")
 
-        # Load the checkpoint
-        checkpoint = torch.load(model_path, map_location=_device, weights_only=False)
+def _normalize_embedding(features: torch.Tensor) -> np.ndarray:
+    """
+    L2-normalize pooled features so dot products are cosine similarities.
 
-        # Try to detect the correct model architecture from checkpoint
-        # Check dimensions to identify Swin variant
-        if isinstance(checkpoint, dict):
-            state_dict = checkpoint.get("model_state_dict") or checkpoint.get("state_dict") or checkpoint
-        else:
-            state_dict = checkpoint
-
-        # Use fixed model architecture matching test file
-        model_name = "swinv2_small_window16_256"
-
-        # Detect number of classes from the final layer
-        num_classes = len(CLASS_NAMES)
-        if "head.fc.weight" in state_dict:
-            num_classes = state_dict["head.fc.weight"].shape[0]
-        elif "head.weight" in state_dict:
-            num_classes = state_dict["head.weight"].shape[0]
-
-        print(f" [INFO] Detected {num_classes} classes in checkpoint")
-        print(f" [INFO] Model variant: {model_name}")
-
-        # Create model architecture with correct number of classes
-        model = timm.create_model(
-            model_name,
-            pretrained=False,
-            num_classes=num_classes
-        )
+    Args:
+        features: (N, num_features) pooled features
+
+    Returns:
+        np.ndarray: (N, num_features) float32
+    """
+    return torch.nn.functional.normalize(features.float(), dim=1).cpu().numpy()
 
-        # Load state dict
-        model.load_state_dict(state_dict, strict=False)
 
-        # Load class names from checkpoint if available
-        if "class_to_idx" in checkpoint:
-            class_to_idx = checkpoint["class_to_idx"]
-            idx_to_class = {v: k for k, v in class_to_idx.items()}
-            CLASS_NAMES = [idx_to_class[i] for i in range(num_classes)]
-            print(f" [INFO] Loaded {num_classes} class names from checkpoint")
-        elif num_classes != len(CLASS_NAMES):
-            # Fallback to generic names if not in checkpoint
-            CLASS_NAMES = [f"class_{i}" for i in range(num_classes)]
-            print(f" [INFO] Using {num_classes} generic class labels")
+def load_cascade_model(
+    model_path: str = "models/cascade_fast.pt",
+    model_name: str = CASCADE_MODEL_NAME
+) -> bool:
+    """
+    Load the cheap first-stage model used by cascade mode.
+    Must be called after load_swin_model, since the checkpoint has to
+    predict the same classes (in the same order) as the full model. The
+    checkpoint must record its classes ("class_to_idx") and its weights
+    must match the architecture exactly; otherwise the cascade stays off
+    rather than answering from an untrained classifier. Train one with
+    scripts/distill_student.py (see the README).
+
+    Args:
+        model_path: Path to the first-stage checkpoint (.pt format)
+        model_name: timm architecture name, used when the checkpoint
+            does not record its own "model_name"
+
+    Returns:
+        bool: True if the cascade model loaded successfully, False otherwise
+    """
+    global _cascade_model, _cascade_model_name, _cascade_class_names
+
+    _cascade_model = None
+    _cascade_model_name = None
+    _cascade_class_names = None
+
+    if not is_model_loaded():
+        log.info("Cascade disabled - full model not loaded")
+        return False
+
+    if not os.path.exists(model_path):
+        log.info("Cascade model not found - cascade disabled", model_path=model_path)
+        return False
+
+    try:
+        log.info("Loading cascade model", model_path=model_path)
+        checkpoint = torch.load(model_path, map_location=_device, weights_only=False)
+
+        # The first stage must agree with the full model on class indices
+        if not isinstance(checkpoint, dict) or "class_to_idx" not in checkpoint:
+            log.warning("Cascade model does not record its classes - cascade disabled", model_path=model_path)
+            return False
+        idx_to_class = {v: k for k, v in checkpoint["class_to_idx"].items()}
+        cascade_classes = [idx_to_class.get(i) for i in range(len(idx_to_class))]
+        if cascade_classes != CLASS_NAMES:
+            log.warning("Cascade model classes do not match the full model - cascade disabled")
+            return False
 
+        state_dict = checkpoint.get("model_state_dict") or checkpoint.get("state_dict") or checkpoint
+        model_name = checkpoint.get("model_name", model_name)
+
+        model = timm.create_model(model_name, pretrained=False, num_classes=len(CLASS_NAMES))
+        # Raises on missing or unexpected keys and on a head of the wrong size
+        model.load_state_dict(state_dict, strict=True)
         model = model.to(_device)
         model.eval()
 
-        _swin_model = model
-        _model_loaded = True
-
-        print(f" [SUCCESS] Model loaded successfully!")
-        print(f" [INFO] Classes: {num_classes} | Device: {_device}")
+        _cascade_model = model
+        _cascade_model_name = model_name
+        _cascade_class_names = CLASS_NAMES
 
+        log.info(
+            "Cascade model loaded",
+            model_name=model_name,
+            escalation_confidence=CASCADE_CONFIDENCE_THRESHOLD,
+            escalation_margin=CASCADE_MARGIN_THRESHOLD,
+        )
         return True
 
     except Exception as e:
-        print(f" [ERROR] Failed to load model: {str(e)}")
-        print(f" [INFO] Using mock mode")
-        _model_loaded = False
+        log.error("Failed to load cascade model - cascade disabled", error=str(e))
         return False
 
 
+def is_cascade_enabled() -> bool:
+    """
+    Check if cascade mode is available (both stages loaded).
+
+    Returns:
+        bool: True if the first-stage model is loaded, False otherwise
+    """
+    return _cascade_model is not None and is_model_loaded()
+
+
 def is_model_loaded() -> bool:
     """
     Check if Swin Transformer model is loaded.
@@ -228,11 +1214,433 @@ def get_tta_transforms():
     return tta_transforms
 
 
+def preprocess_views(image, view_indices: List[int], batch: torch.Tensor, to_device: bool = True,
+                     base_pixels: Optional[np.ndarray] = None) -> torch.Tensor:
+    """
+    Preprocess TTA views of an image straight into a batch buffer.
+    Same output as the matching get_tta_transforms() pipelines, but each
+    resized size is computed once (the five crops share one resize), flips
+    and crops are views of it, and normalization runs in place.
+
+    Args:
+        image: RGB image, or a function returning it (only called when a
+            view needs a resize that base_pixels does not provide)
+        view_indices: Indices into TTA_VIEW_SPECS, one per batch row
+        batch: Float buffer of shape (len(view_indices), 3, INPUT_SIZE, INPUT_SIZE)
+        to_device: Move the batch to the inference device (False leaves it in the buffer)
+        base_pixels: The image already resized to INPUT_SIZE x INPUT_SIZE
+            (HWC uint8, e.g. the upload-time artifact)
+
+    Returns:
+        torch.Tensor: The preprocessed batch
+    """
+    with span("preprocess", views=len(view_indices), from_artifact=base_pixels is not None):
+        return _preprocess_views(image, view_indices, batch, to_device, base_pixels)
+
+
+def _preprocess_views(image, view_indices: List[int], batch: torch.Tensor, to_device: bool,
+                      base_pixels: Optional[np.ndarray]) -> torch.Tensor:
+    resized = {}
+    for row, view_index in enumerate(view_indices):
+        side, operation = TTA_VIEW_SPECS[view_index]
+        if side == INPUT_SIZE and base_pixels is not None:
+            pixels = base_pixels
+        else:
+            if side not in resized:
+                source = image() if callable(image) else image
+                resized[side] = np.asarray(source.resize((side, side), Image.BILINEAR))
+                note_allocation(resized[side].nbytes)
+            pixels = resized[side]
+
+        offset = side - INPUT_SIZE
+        if operation == "hflip":
+            pixels = pixels[:, ::-1]
+        elif operation == "vflip":
+            pixels = pixels[::-1]
+        elif operation == "center":
+            # Same rounding as torchvision's center_crop
+            top = int(round(offset / 2.0))
+            pixels = pixels[top:top + INPUT_SIZE, top:top + INPUT_SIZE]
+        elif operation is not None:
+            top = offset if operation.startswith("bottom") else 0
+            left = offset if operation.endswith("right") else 0
+            pixels = pixels[top:top + INPUT_SIZE, left:left + INPUT_SIZE]
+
+        # HWC uint8 view -> CHW float rows of the buffer, without intermediate copies
+        np.copyto(batch[row].numpy(), pixels.transpose(2, 0, 1), casting="unsafe")
+
+    for pixels in resized.values():
+        note_release(pixels.nbytes)
+
+    batch.mul_(_NORMALIZE_SCALE).sub_(_NORMALIZE_SHIFT)
+    return batch.to(_device, non_blocking=True) if to_device else batch
+
+
+def _tile_positions(length: int) -> List[int]:
+    """
+    Evenly spaced tile offsets covering one image axis with at least TILE_OVERLAP overlap.
+
+    Args:
+        length: Axis length of the (scaled) image, at least INPUT_SIZE
+
+    Returns:
+        list: Tile start offsets
+    """
+    if length <= INPUT_SIZE:
+        return [0]
+    stride = INPUT_SIZE * (1 - TILE_OVERLAP)
+    count = int(np.ceil((length - INPUT_SIZE) / stride)) + 1
+    return [int(round(offset)) for offset in np.linspace(0, length - INPUT_SIZE, count)]
+
+
+def _predict_tiled(
+    version: ModelVersion,
+    image: Image.Image,
+    pooling: str,
+    return_features: bool = False
+):
+    """
+    Score overlapping INPUT_SIZE tiles of the image and pool their predictions.
+
+    The image is scaled once so its longer side is at most TILE_MAX_SIDE
+    (and its shorter side at least INPUT_SIZE), tiles are cut as views of
+    it, and they are scored TILE_BATCH_SIZE (or the tuned batch size) at a time.
+
+    Args:
+        version: Model version pinned for this request
+        image: RGB image to classify
+        pooling: "max" (per-class maximum, renormalized), "mean", or
+            "attention" (mean weighted by each tile's confidence)
+        return_features: Also return the tile features pooled with the same weights
+
+    Returns:
+        tuple: (pooled softmax probabilities, tile details dict, pooled features or None)
+    """
+    width, height = image.size
+    scale = min(1.0, TILE_MAX_SIDE / max(width, height))
+    scale = max(scale, INPUT_SIZE / min(width, height))
+    scaled_size = (max(INPUT_SIZE, round(width * scale)), max(INPUT_SIZE, round(height * scale)))
+    pixels = np.asarray(image.resize(scaled_size, Image.BILINEAR) if scale != 1.0 else image)
+    note_allocation(pixels.nbytes)
+
+    boxes = [(left, top) for top in _tile_positions(scaled_size[1]) for left in _tile_positions(scaled_size[0])]
+    probability_chunks, feature_chunks = [], []
+    batch_size = version.execution["batch_size"] or TILE_BATCH_SIZE
+    for start in range(0, len(boxes), batch_size):
+        chunk = boxes[start:start + batch_size]
+        with input_batch(len(chunk)) as batch:
+            for row, (left, top) in enumerate(chunk):
+                tile = pixels[top:top + INPUT_SIZE, left:left + INPUT_SIZE]
+                np.copyto(batch[row].numpy(), tile.transpose(2, 0, 1), casting="unsafe")
+            batch.mul_(_NORMALIZE_SCALE).sub_(_NORMALIZE_SHIFT)
+            outputs, features = _forward(version, batch.to(_device, non_blocking=True), return_features=True)
+        probability_chunks.append(torch.nn.functional.softmax(outputs, dim=1))
+        if return_features:
+            feature_chunks.append(features)
+    note_release(pixels.nbytes)
+
+    probabilities = torch.cat(probability_chunks)
+    # Informativeness: low entropy relative to the uniform distribution
+    entropy = -(probabilities * torch.log(probabilities.clamp_min(1e-12))).sum(dim=1)
+    informativeness = 1 - entropy / np.log(probabilities.shape[1])
+    weights = torch.softmax(informativeness / TILE_ATTENTION_TEMPERATURE, dim=0)
+
+    if pooling == "max":
+        pooled = probabilities.max(dim=0, keepdim=True).values
+        pooled = pooled / pooled.sum()
+        feature_weights = torch.nn.functional.one_hot(informativeness.argmax(), len(boxes)).float()
+    elif pooling == "mean":
+        pooled = probabilities.mean(dim=0, keepdim=True)
+        feature_weights = torch.full((len(boxes),), 1.0 / len(boxes))
+    else:
+        pooled = (weights[:, None] * probabilities).sum(dim=0, keepdim=True)
+        feature_weights = weights
+
+    features = None
+    if return_features:
+        features = (feature_weights[:, None] * torch.cat(feature_chunks)).sum(dim=0, keepdim=True)
+
+    # Tile boxes are reported in original image coordinates
+    tile_side = INPUT_SIZE / scale
+    top_tiles = []
+    for index in torch.argsort(informativeness, descending=True)[:TILE_REPORT_COUNT].tolist():
+        left, top = boxes[index]
+        confidence, class_index = probabilities[index].max(dim=0)
+        top_tiles.append({
+            "x": int(round(left / scale)),
+            "y": int(round(top / scale)),
+            "width": int(round(min(tile_side, width))),
+            "height": int(round(min(tile_side, height))),
+            "weight": round(float(weights[index]), 4),
+            "condition": version.class_names[int(class_index)],
+            "confidence": round(float(confidence) * 100, 2),
+        })
+
+    tiles = {
+        "count": len(boxes),
+        "batches": len(probability_chunks),
+        "scale": round(scale, 4),
+        "pooling": pooling,
+        "top_tiles": top_tiles,
+    }
+    return pooled, tiles, features
+
+
+class _UnusableFrames(Exception):
+    """
+    Every sampled frame failed the quality gate (the message is the first frame's error).
+    """
+
+
+def _sample_frame_indices(count: int) -> List[int]:
+    """
+    Pick at most MAX_FRAMES frames evenly spread over a sequence.
+
+    Args:
+        count: Frames in the sequence
+
+    Returns:
+        list: Ascending frame indices, starting at 0
+    """
+    sampled = min(count, MAX_FRAMES)
+    return [index * count // sampled for index in range(sampled)]
+
+
+def _predict_frames(
+    version: ModelVersion,
+    sources: List[Image.Image],
+    return_features: bool = False,
+    return_saliency: bool = False
+):
+    """
+    Score the frames of an animated image, or the shots of a burst, in one
+    batched forward pass and average their predictions.
+
+    Frames are decoded one at a time at evenly spaced indices (a stride of
+    count / MAX_FRAMES), frames failing the quality gate are dropped, and
+    the rest go straight into one batch buffer as base views, so a sequence
+    costs a single forward pass of at most MAX_FRAMES images.
+
+    Args:
+        version: Model version pinned for this request
+        sources: Opened, not yet decoded images: one animated image, or one per shot
+        return_features: Also return the best frame's pooled features
+        return_saliency: Also return the best frame's top-1 class activation map
+
+    Returns:
+        tuple: (averaged softmax probabilities, frame details dict, pooled
+            features or None, (activation maps, explained classes) or None)
+
+    Raises:
+        _UnusableFrames: If no sampled frame passes the quality gate
+    """
+    animated = len(sources) == 1
+    count = sources[0].n_frames if animated else len(sources)
+    indices = _sample_frame_indices(count)
+
+    kept, dropped, quality_error = [], [], None
+    features = saliency = None
+    with input_batch(len(indices)) as batch:
+        for index in indices:
+            source = sources[0] if animated else sources[index]
+            if animated:
+                source.seek(index)
+            with span("image.decode", frame=index):
+                frame = source.convert("RGB")
+            frame_bytes = frame.width * frame.height * 3
+            note_allocation(frame_bytes)
+
+            error = check_image_quality(frame)
+            if error:
+                dropped.append(index)
+                quality_error = quality_error or error
+            else:
+                preprocess_views(frame, [0], batch[len(kept):len(kept) + 1], to_device=False)
+                kept.append(index)
+            del frame
+            note_release(frame_bytes)
+
+        if not kept:
+            raise _UnusableFrames(quality_error)
+
+        frames_batch = batch[:len(kept)].to(_device, non_blocking=True)
+        if return_saliency:
+            outputs, features, saliency = _forward(version, frames_batch, return_saliency=True)
+        elif return_features:
+            outputs, features = _forward(version, frames_batch, return_features=True)
+        else:
+            outputs = _forward(version, frames_batch)
+
+    probabilities = torch.nn.functional.softmax(outputs, dim=1)
+    averaged = probabilities.mean(dim=0, keepdim=True)
+    # The best frame is the one most confident in the sequence's top class
+    best = int(probabilities[:, int(averaged.argmax())].argmax())
+
+    per_frame = []
+    for row, index in enumerate(kept):
+        confidence, class_index = probabilities[row].max(dim=0)
+        per_frame.append({
+            "index": index,
+            "condition": version.class_names[int(class_index)],
+            "confidence": round(float(confidence) * 100, 2),
+        })
+
+    frames = {
+        "source": "animation" if animated else "burst",
+        "count": count,
+        "stride": round(count / len(indices), 2),
+        "sampled": len(indices),
+        "scored": len(kept),
+        "dropped": dropped,
+        "best_frame": kept[best],
+        "per_frame": per_frame,
+    }
+    if features is not None:
+        features = features[best:best + 1]
+    if saliency is not None:
+        activation_maps, explained_classes = saliency
+        saliency = (activation_maps[best:best + 1], explained_classes[best:best + 1])
+    return averaged, frames, features, saliency
+
+
+def _decode_image(image_bytes: bytes) -> Image.Image:
+    """
+    Decode image bytes to RGB, noting the allocations for the request.
+
+    Args:
+        image_bytes: Encoded image
+
+    Returns:
+        Image.Image: Decoded RGB image
+    """
+    with span("image.decode", bytes=len(image_bytes)):
+        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    note_allocation(len(image_bytes))
+    note_allocation(image.width * image.height * 3)
+    return image
+
+
+def check_image_quality(image: Image.Image) -> Optional[str]:
+    """
+    Reject images that are too small or too blurry to classify.
+
+    Args:
+        image: RGB image
+
+    Returns:
+        str: User-facing error message, or None if the image is usable
+    """
+    with span("image.quality_check", width=image.width, height=image.height) as check_span:
+        error = _check_image_quality(image, check_span)
+        if check_span is not None:
+            check_span.set(passed=error is None)
+        return error
+
+
+def _check_image_quality(image: Image.Image, check_span) -> Optional[str]:
+    # Check image dimensions - reject images that are too small or corrupted
+    width, height = image.size
+    if width < 50 or height < 50:
+        return "Image is too small. Please upload a larger, clearer image (minimum 50x50 pixels)."
+
+    # Check if image is too blurry or low quality using variance of Laplacian
+    import cv2
+
+    # Grayscale straight from PIL and a float32 Laplacian whose variance
+    # OpenCV reduces without further full-resolution temporaries
+    gray = np.asarray(image.convert("L"))
+    laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+    laplacian_var = float(cv2.meanStdDev(laplacian)[1][0, 0]) ** 2
+    note_allocation(gray.nbytes + laplacian.nbytes, transient=True)
+    del gray, laplacian
+    if check_span is not None:
+        check_span.set(laplacian_variance=round(laplacian_var, 1))
+
+    # If variance is very low, image is likely too blurry
+    if laplacian_var < 10:
+        return "Image appears to be too blurry or low quality. Please upload a clearer, well-focused image."
+    return None
+
+
+def preprocessed_upload_path(image_path: str) -> str:
+    """
+    Path of the upload-time artifact of an image.
+
+    Args:
+        image_path: Uploaded image
+
+    Returns:
+        str: "<image_path>.npy"
+    """
+    return image_path + PREPROCESSED_UPLOAD_SUFFIX
+
+
+def preprocess_upload(image: Image.Image, image_path: str) -> Optional[str]:
+    """
+    Run the quality gate on a just-uploaded image and save its base view
+    (resized to INPUT_SIZE x INPUT_SIZE, HWC uint8) next to it, so
+    classify_image can skip decoding, the quality gate and the resize.
+
+    Args:
+        image: The decoded upload
+        image_path: Where the upload was saved
+
+    Returns:
+        str: The quality gate's error (no artifact is written), or None.
+            Animated images get no artifact; they are checked frame by frame
+    """
+    with Image.open(image_path) as saved:
+        if getattr(saved, "is_animated", False):
+            return None
+
+    image = image.convert("RGB")
+    quality_error = check_image_quality(image)
+    if quality_error:
+        return quality_error
+
+    pixels = np.asarray(image.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR))
+    artifact_path = preprocessed_upload_path(image_path)
+    temp_path = artifact_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, pixels)
+    os.replace(temp_path, artifact_path)
+    return None
+
+
+def load_preprocessed_upload(image_path: str) -> Optional[np.ndarray]:
+    """
+    Memory-map the upload-time artifact of an image, if there is a current one.
+
+    Args:
+        image_path: Image to classify
+
+    Returns:
+        np.ndarray: (INPUT_SIZE, INPUT_SIZE, 3) uint8 base view, or None
+    """
+    artifact_path = preprocessed_upload_path(image_path)
+    try:
+        if os.path.getmtime(artifact_path) < os.path.getmtime(image_path):
+            return None  # Written for an earlier file at this path
+        pixels = np.load(artifact_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if pixels.shape != (INPUT_SIZE, INPUT_SIZE, 3) or pixels.dtype != np.uint8:
+        return None
+    return pixels
+
+
 def classify_image(
     image_path: str,
     confidence_threshold: float = CONFIDENCE_THRESHOLD,
     top_k: int = 5,
-    use_tta: bool = True
+    use_tta=True,
+    use_cascade: bool = True,
+    return_embedding: bool = False,
+    tiled: bool = False,
+    tile_pooling: str = TILE_POOLING,
+    return_saliency: bool = False,
+    burst_paths: Optional[List[str]] = None,
+    quality: str = "full"
 ) -> Dict:
     """
     Classify skin condition in an image using Swin Transformer with TTA.
@@ -241,7 +1649,29 @@ def classify_image(
         image_path: Path to the image file
         confidence_threshold: Minimum confidence score (0.0 to 1.0)
         top_k: Number of top predictions to return
-        use_tta: Whether to use Test Time Augmentation (slower but more accurate)
+        use_tta: Whether to use Test Time Augmentation (slower but more accurate).
+            Pass "adaptive" to add augmented views only while the prediction
+            is uncertain (see ADAPTIVE_TTA_STAGES)
+        use_cascade: Whether to let the cheap first-stage model answer confident
+            images (only applies without TTA and when a cascade model is loaded)
+        return_embedding: Also return the pooled Swin features of the base
+            view (L2-normalized). Skips the cascade, which has no Swin features
+        tiled: Score overlapping INPUT_SIZE tiles at (up to TILE_MAX_SIDE)
+            native scale instead of the squashed whole image; replaces TTA
+            and the cascade. The embedding is pooled over the tiles
+        tile_pooling: How tile predictions are combined (see TILE_POOLING_METHODS)
+        return_saliency: Also return a heatmap of the regions that drove the
+            base view's top-1 prediction, taken from the same forward pass
+            (see _class_activation_maps). Skips the cascade; not computed in
+            tiled mode, where the top tiles locate the informative regions
+        burst_paths: Further shots of the same lesion. With a burst, or an
+            animated GIF/WebP, up to MAX_FRAMES frames are scored in one
+            batch and averaged (see _predict_frames), instead of TTA, tiling
+            and the cascade; the embedding and saliency are the best frame's
+        quality: "full", or a cheaper tier of QUALITY_INPUT_SIZES that scores
+            the base view at a lower resolution with the same weights
+            (instead of TTA and the cascade; bursts, animations and tiled
+            mode always run at full quality)
 
     Returns:
         dict: Classification results with format:
@@ -253,6 +1683,16 @@ def classify_image(
                         "confidence": float
                     }
                 ],
+                "stage": str ("fast" or "full", model that produced the result),
+                "tta_views": int (number of views scored),
+                "quality": str (quality tier that produced the result),
+                "tiles": dict (if tiled: count, batches, scale, pooling and
+                    the most informative tiles in image coordinates),
+                "frames": dict (for bursts and animations: frame counts,
+                    stride, dropped frames, best_frame and per-frame top-1),
+                "embedding": list of float (if return_embedding),
+                "saliency": dict (if return_saliency, see _saliency_result),
+                "cached": bool (True if served from the prediction cache),
                 "error": str (if success is False)
             }
     """
@@ -260,90 +1700,212 @@ def classify_image(
     if not is_model_loaded():
         return _mock_classification(image_path, top_k)
 
-    try:
-        # Check if image exists
-        if not os.path.exists(image_path):
-            return {
-                "success": False,
-                "predictions": [],
-                "error": f"Image file not found: {image_path}",
-            }
+    # Pin one model version for the whole request (safe against hot-swaps)
+    version = _acquire_active_version()
+    if version is None:
+        return _mock_classification(image_path, top_k)
+    class_names = version.class_names
 
-        # Load and validate image
-        try:
-            image = Image.open(image_path).convert("RGB")
-        except Exception as img_error:
+    try:
+        if tiled and tile_pooling not in TILE_POOLING_METHODS:
             return {
                 "success": False,
                 "predictions": [],
-                "error": "Unable to read the image file. Please ensure it's a valid image format (JPG, PNG, GIF, or WebP).",
+                "error": f"Unknown tile pooling: {tile_pooling}",
             }
-
-        # Check image dimensions - reject images that are too small or corrupted
-        width, height = image.size
-        if width < 50 or height < 50:
+        if quality not in QUALITY_INPUT_SIZES:
             return {
                 "success": False,
                 "predictions": [],
-                "error": "Image is too small. Please upload a larger, clearer image (minimum 50x50 pixels).",
+                "error": f"Unknown quality: {quality}",
             }
 
-        # Check if image is too blurry or low quality using variance of Laplacian
-        import cv2
-        import numpy as np
+        # Check if image exists
+        image_paths = [image_path, *(burst_paths or [])]
+        for path in image_paths:
+            if not os.path.exists(path):
+                return {
+                    "success": False,
+                    "predictions": [],
+                    "error": f"Image file not found: {path}",
+                }
 
-        # Convert PIL image to numpy array for quality check
-        img_array = np.array(image)
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        # The same bytes scored by the same checkpoint and settings give the
+        # same result on every replica, so it is looked up before decoding.
+        # Replicas tuned to a different precision or backend score slightly
+        # differently, so a non-default execution config is part of the key
+        images_bytes = []
+        for path in image_paths:
+            with open(path, "rb") as f:
+                images_bytes.append(f.read())
+        image_bytes = images_bytes[0]
+        cascade_name = _cascade_model_name if use_cascade and is_cascade_enabled() else None
+        precision = version.execution.get("precision", "fp32")
+        backend = version.execution.get("backend", "eager")
+        cache_key = content_key(
+            image_bytes, version.version.split("-", 1)[-1], confidence_threshold,
+            top_k, use_tta, cascade_name, return_embedding,
+            *((TILE_MAX_SIDE, TILE_OVERLAP, tile_pooling) if tiled else ()),
+            *(("saliency", SALIENCY_PNG_SIZE) if return_saliency and not tiled else ()),
+            *(("burst", MAX_FRAMES, *images_bytes[1:]) if burst_paths else ()),
+            *(("quality", quality, QUALITY_INPUT_SIZES[quality]) if quality != "full" else ()),
+            *(("execution", precision, backend) if (precision, backend) != ("fp32", "eager") else ()),
+        )
+        with span("cache.lookup") as lookup_span:
+            cached = storage_get(PREDICTION_CACHE_NAMESPACE, cache_key)
+            if lookup_span is not None:
+                lookup_span.set(hit=cached is not None)
+        if cached is not None:
+            return {**cached, "cached": True}
 
-        # If variance is very low, image is likely too blurry
-        if laplacian_var < 10:
-            return {
-                "success": False,
-                "predictions": [],
-                "error": "Image appears to be too blurry or low quality. Please upload a clearer, well-focused image.",
-            }
+        with track_request_memory():
+            # An upload-time artifact has passed the quality gate and holds the
+            # base view, so the image is only decoded if another view needs it
+            # (artifacts are only written for still images)
+            base_pixels = load_preprocessed_upload(image_path) if not burst_paths else None
+            frame_sources = None
+            if base_pixels is not None:
+                image = functools.lru_cache(maxsize=None)(functools.partial(_decode_image, image_bytes))
+            else:
+                # Load and validate image (bursts and animations frame by frame)
+                try:
+                    sources = [Image.open(io.BytesIO(data)) for data in images_bytes]
+                    if burst_paths or getattr(sources[0], "is_animated", False):
+                        frame_sources = sources
+                    else:
+                        image = _decode_image(image_bytes)
+                except Exception as img_error:
+                    return {
+                        "success": False,
+                        "predictions": [],
+                        "error": "Unable to read the image file. Please ensure it's a valid image format (JPG, PNG, GIF, or WebP).",
+                    }
 
-        if use_tta:
-            # Use Test Time Augmentation for better accuracy
-            tta_transforms = get_tta_transforms()
-            all_outputs = []
+                # Bursts and animations are checked frame by frame
+                if frame_sources is None:
+                    quality_error = check_image_quality(image)
+                    if quality_error:
+                        return {
+                            "success": False,
+                            "predictions": [],
+                            "error": quality_error,
+                        }
 
-            with torch.no_grad():
-                for transform in tta_transforms:
-                    image_tensor = transform(image).unsqueeze(0).to(_device)
-                    outputs = _swin_model(image_tensor)
+            tiles = None
+            frames = None
+            saliency = None
+            quality_used = "full"
+            if frame_sources is not None:
+                # Sampled frames in one batch, averaged
+                try:
+                    with torch.no_grad():
+                        probabilities, frames, features, saliency = _predict_frames(
+                            version, frame_sources, return_embedding, return_saliency
+                        )
+                except _UnusableFrames as e:
+                    return {
+                        "success": False,
+                        "predictions": [],
+                        "error": str(e),
+                    }
+                confidences, indices = torch.topk(probabilities, k=min(top_k, len(class_names)))
+                stage = "full"
+                tta_views = frames["scored"]
+            elif tiled:
+                # Overlapping windows at native scale, scored in a few batches
+                with torch.no_grad():
+                    probabilities, tiles, features = _predict_tiled(
+                        version, image() if callable(image) else image, tile_pooling, return_embedding
+                    )
+                    confidences, indices = torch.topk(probabilities, k=min(top_k, len(class_names)))
+                stage = "full"
+                tta_views = tiles["count"]
+            elif quality in version.reduced_models:
+                # Base view downscaled for the tier's model (same weights, fewer tokens)
+                features = None
+                with torch.no_grad(), input_batch(1) as batch:
+                    image_tensor = downscale_for_quality(
+                        preprocess_views(image, [0], batch, base_pixels=base_pixels), quality
+                    )
+                    if return_saliency:
+                        outputs, features, saliency = _forward(version, image_tensor, return_saliency=True, quality=quality)
+                    elif return_embedding:
+                        outputs, features = _forward(version, image_tensor, return_features=True, quality=quality)
+                    else:
+                        outputs = _forward(version, image_tensor, quality=quality)
                     probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                    all_outputs.append(probabilities)
+                    confidences, indices = torch.topk(probabilities, k=min(top_k, len(class_names)))
+                stage = "full"
+                tta_views = 1
+                quality_used = quality
+            elif use_tta == "adaptive":
+                # Base view first, augmented views only while still uncertain
+                with torch.no_grad():
+                    probabilities, stage, tta_views, features, saliency = _predict_adaptive_tta(
+                        version, image, use_cascade, return_embedding, return_saliency, base_pixels
+                    )
+                    confidences, indices = torch.topk(probabilities, k=min(top_k, len(class_names)))
+            elif use_tta:
+                # Use Test Time Augmentation for better accuracy - all views in one batch
+                view_indices = list(range(len(TTA_VIEW_SPECS)))
+                features = None
 
-            # Average predictions from all augmentations
-            avg_probabilities = torch.mean(torch.stack(all_outputs), dim=0)
-            confidences, indices = torch.topk(avg_probabilities, k=min(top_k, len(CLASS_NAMES)))
-        else:
-            # Single prediction without TTA
-            transform = get_image_transform()
-            image_tensor = transform(image).unsqueeze(0).to(_device)
+                with torch.no_grad(), input_batch(len(view_indices)) as batch:
+                    batch = preprocess_views(image, view_indices, batch, base_pixels=base_pixels)
+                    if return_saliency:
+                        outputs, features, saliency = _forward(version, batch, return_saliency=True)
+                        features = features[:1]
+                    elif return_embedding:
+                        outputs, features = _forward(version, batch, return_features=True)
+                        features = features[:1]
+                    else:
+                        outputs = _forward(version, batch)
 
-            with torch.no_grad():
-                outputs = _swin_model(image_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                confidences, indices = torch.topk(probabilities, k=min(top_k, len(CLASS_NAMES)))
-
-        # Parse results
-        predictions = []
-        for conf, idx in zip(confidences[0], indices[0]):
-            confidence_value = float(conf.cpu().numpy())
-            if confidence_value >= confidence_threshold:
-                predictions.append({
-                    "condition": CLASS_NAMES[int(idx)],
-                    "confidence": round(confidence_value * 100, 2)  # Convert to percentage
-                })
+                    # Average predictions from all augmentations
+                    avg_probabilities = torch.nn.functional.softmax(outputs, dim=1).mean(dim=0, keepdim=True)
+                    confidences, indices = torch.topk(avg_probabilities, k=min(top_k, len(class_names)))
+                stage = "full"
+                tta_views = len(view_indices)
+            else:
+                # Single prediction without TTA - both cascade stages share this tensor
+                with torch.no_grad(), input_batch(1) as batch:
+                    image_tensor = preprocess_views(image, [0], batch, base_pixels=base_pixels)
+                    probabilities, stage, features, saliency = _predict_with_cascade(
+                        version, image_tensor, use_cascade, return_embedding, return_saliency
+                    )
+                    confidences, indices = torch.topk(probabilities, k=min(top_k, len(class_names)))
+                tta_views = 1
 
-        return {
-            "success": True,
-            "predictions": predictions,
-        }
+            with span("postprocess", top_k=top_k):
+                # Parse results
+                predictions = []
+                for conf, idx in zip(confidences[0], indices[0]):
+                    confidence_value = float(conf.cpu().numpy())
+                    if confidence_value >= confidence_threshold:
+                        predictions.append({
+                            "condition": class_names[int(idx)],
+                            "confidence": round(confidence_value * 100, 2)  # Convert to percentage
+                        })
+
+                result = {
+                    "success": True,
+                    "predictions": predictions,
+                    "stage": stage,
+                    "tta_views": tta_views,
+                    "quality": quality_used,
+                }
+                if tiles is not None:
+                    result["tiles"] = tiles
+                if frames is not None:
+                    result["frames"] = frames
+                if return_embedding:
+                    result["embedding"] = _normalize_embedding(features)[0].tolist()
+                if saliency is not None:
+                    activation_maps, explained_classes = saliency
+                    result["saliency"] = _saliency_result(activation_maps[0], class_names[int(explained_classes[0])])
+
+            storage_set(PREDICTION_CACHE_NAMESPACE, cache_key, result, PREDICTION_CACHE_TTL_SECONDS)
+            return {**result, "cached": False}
 
     except Exception as e:
         return {
@@ -351,6 +1913,167 @@ def classify_image(
             "predictions": [],
             "error": f"Classification error: {str(e)}",
         }
+    finally:
+        version.release()
+
+
+def _predict_with_cascade(
+    version: ModelVersion,
+    image_tensor: torch.Tensor,
+    use_cascade: bool = True,
+    return_features: bool = False,
+    return_saliency: bool = False
+):
+    """
+    Score a preprocessed image with the cheap model and escalate to the full
+    Swin model only when the first-stage prediction is uncertain.
+
+    Args:
+        version: Active model version pinned for this request
+        image_tensor: Preprocessed image batch (shared by both stages)
+        use_cascade: Whether to try the first-stage model at all
+        return_features: Also return the Swin pooled features (always runs the full model)
+        return_saliency: Also return the top-1 class activation map (always runs the full model)
+
+    Returns:
+        tuple: (softmax probabilities, stage name "fast" or "full", pooled
+            features or None, (activation maps, explained classes) or None)
+    """
+    # The cascade only applies while its classes match the pinned version
+    if (
+        use_cascade
+        and not return_features
+        and not return_saliency
+        and is_cascade_enabled()
+        and _cascade_class_names == version.class_names
+    ):
+        probabilities = torch.nn.functional.softmax(_cascade_model(image_tensor), dim=1)
+        escalate = _is_uncertain(probabilities)
+
+        with _cascade_stats_lock:
+            _cascade_stats["images"] += 1
+            if escalate:
+                _cascade_stats["escalated"] += 1
+
+        if not escalate:
+            return probabilities, "fast", None, None
+
+    if return_saliency:
+        outputs, features, saliency = _forward(version, image_tensor, return_saliency=True)
+        return torch.nn.functional.softmax(outputs, dim=1), "full", features, saliency
+
+    if return_features:
+        outputs, features = _forward(version, image_tensor, return_features=True)
+        return torch.nn.functional.softmax(outputs, dim=1), "full", features, None
+
+    outputs = _forward(version, image_tensor)
+    return torch.nn.functional.softmax(outputs, dim=1), "full", None, None
+
+
+def _is_uncertain(probabilities: torch.Tensor) -> bool:
+    """
+    Check whether a first-stage prediction should be escalated.
+
+    Args:
+        probabilities: Softmax probabilities for a single image
+
+    Returns:
+        bool: True if top-1 confidence or top-1/top-2 margin is below threshold
+    """
+    top_values = torch.topk(probabilities[0], k=min(2, probabilities.shape[1])).values
+    top1 = float(top_values[0])
+    margin = top1 - float(top_values[1]) if len(top_values) > 1 else top1
+    return top1 < CASCADE_CONFIDENCE_THRESHOLD or margin < CASCADE_MARGIN_THRESHOLD
+
+
+def _predict_adaptive_tta(
+    version: ModelVersion,
+    image: Image.Image,
+    use_cascade: bool = True,
+    return_features: bool = False,
+    return_saliency: bool = False,
+    base_pixels: Optional[np.ndarray] = None
+):
+    """
+    Run the base prediction and progressively add augmented views
+    (flips, then center crop, then five crops) while the averaged
+    prediction is still uncertain. Each stage is scored in one batch.
+
+    Args:
+        version: Active model version pinned for this request
+        image: RGB image to classify, or a function returning it (see preprocess_views)
+        use_cascade: Whether the base view may be answered by the cascade model
+        return_features: Also return the base view's Swin pooled features
+        return_saliency: Also return the base view's top-1 class activation map
+        base_pixels: The image already resized to INPUT_SIZE (see preprocess_views)
+
+    Returns:
+        tuple: (averaged softmax probabilities, stage name, number of views used,
+            base view pooled features or None, base view (activation maps,
+            explained classes) or None)
+    """
+    with input_batch(1) as batch:
+        base_tensor = preprocess_views(image, [0], batch, base_pixels=base_pixels)
+        probabilities, stage, features, saliency = _predict_with_cascade(
+            version, base_tensor, use_cascade, return_features, return_saliency
+        )
+
+    # A confident first-stage answer is never augmented
+    if stage == "fast":
+        return probabilities, stage, 1, None, None
+
+    probability_sum = probabilities.clone()
+    views = 1
+
+    for view_indices in ADAPTIVE_TTA_STAGES:
+        if not _needs_augmentation(probability_sum / views):
+            break
+
+        with input_batch(len(view_indices)) as batch:
+            batch = preprocess_views(image, view_indices, batch, base_pixels=base_pixels)
+            batch_probabilities = torch.nn.functional.softmax(_forward(version, batch), dim=1)
+        probability_sum += batch_probabilities.sum(dim=0, keepdim=True)
+        views += len(view_indices)
+
+    return probability_sum / views, "full", views, features, saliency
+
+
+def _needs_augmentation(probabilities: torch.Tensor) -> bool:
+    """
+    Check whether a prediction is uncertain enough to add TTA views.
+
+    Args:
+        probabilities: Softmax probabilities for a single image
+
+    Returns:
+        bool: True if entropy is above or top-2 margin is below its threshold
+    """
+    entropy = float(-(probabilities * torch.log(probabilities.clamp_min(1e-12))).sum())
+    top_values = torch.topk(probabilities[0], k=min(2, probabilities.shape[1])).values
+    margin = float(top_values[0] - top_values[1]) if len(top_values) > 1 else float(top_values[0])
+    return entropy > TTA_ENTROPY_THRESHOLD or margin < TTA_MARGIN_THRESHOLD
+
+
+def get_cascade_stats() -> Dict:
+    """
+    Get cascade configuration and escalation counters.
+
+    Returns:
+        dict: Cascade status and escalation rate
+    """
+    with _cascade_stats_lock:
+        images = _cascade_stats["images"]
+        escalated = _cascade_stats["escalated"]
+
+    return {
+        "enabled": is_cascade_enabled(),
+        "model": _cascade_model_name,
+        "confidence_threshold": CASCADE_CONFIDENCE_THRESHOLD,
+        "margin_threshold": CASCADE_MARGIN_THRESHOLD,
+        "images": images,
+        "escalated": escalated,
+        "escalation_rate": round(escalated / images, 4) if images else None,
+    }
 
 
 def _mock_classification(image_path: str, top_k: int = 5) -> Dict:
@@ -393,13 +2116,26 @@ def get_model_info() -> Dict:
             "model_path": _model_path,
             "device": str(_device) if _device else "unknown",
             "message": "Model not loaded - using mock mode",
+            "reload": dict(_reload_status),
         }
 
+    version = _active_version
+
     return {
         "loaded": True,
-        "model_path": _model_path,
+        "model_path": version.model_path,
         "device": str(_device),
-        "classes": CLASS_NAMES,
+        "classes": version.class_names,
+        "active_version": version.to_dict(),
+        "reload": dict(_reload_status),
         "confidence_threshold": CONFIDENCE_THRESHOLD,
         "model_type": "Swin Transformer",
+        "cascade": get_cascade_stats(),
+        "adaptive_tta": {
+            "entropy_threshold": TTA_ENTROPY_THRESHOLD,
+            "margin_threshold": TTA_MARGIN_THRESHOLD,
+            "stages": ADAPTIVE_TTA_STAGES,
+        },
+        "inference_pool": get_inference_pool_info(),
+        "input_buffers": get_input_buffer_stats(),
     }
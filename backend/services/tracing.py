@@ -0,0 +1,377 @@
+"""
+Lightweight request tracing with batched span export.
+
+Each HTTP request gets a root span, and the stages it runs through (upload
+save, image decode, blur check, preprocessing, model forward, prompt
+formatting, Gemini calls, ...) open child spans with span(). The current
+span lives in a context variable, so threads started with
+contextvars.copy_context() (the inference executor, explanation and hedge
+threads, job workers) nest their spans under the request's. Inference
+worker processes time their forward pass and the parent records it as a
+span (see record_span).
+
+Finished spans are queued and exported in batches by a background thread,
+as OTLP/JSON: appended to a file (one ExportTraceServiceRequest per line,
+readable by OpenTelemetry's file receivers) or POSTed to an OTLP/HTTP
+collector (Jaeger, Tempo, the OpenTelemetry Collector, ...). Request
+threads never wait on export; when the exporter falls behind, spans are
+dropped and counted. With tracing off, span() costs a context variable
+lookup.
+
+Incoming W3C traceparent headers are honored, so the backend's spans join
+a trace started by the frontend or a proxy.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+from utils.structured_logging import get_logger
+
+log = get_logger("tracing")
+
+# Configuration
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))  # Fraction of requests traced (unless the caller decided)
+TRACE_QUEUE_SIZE = 10000  # Finished spans waiting for export before new ones are dropped
+TRACE_BATCH_SIZE = 512  # Most spans per export
+TRACE_EXPORT_INTERVAL_SECONDS = 2.0  # Longest a finished span waits for its batch
+OTLP_TIMEOUT_SECONDS = 5
+SERVICE_NAME = "skin-analysis-backend"
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+# Tracing state
+_export_url = None
+_queue = None
+_exporter = None
+_stats_lock = threading.Lock()
+_stats = {"traces": 0, "spans": 0, "spans_dropped": 0, "batches_exported": 0, "export_errors": 0}
+
+# Innermost open span of the request being handled (shared with the threads it hands work to)
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """
+    One timed operation of a trace.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str = "internal",
+                 attributes: Optional[Dict] = None, start_ns: Optional[int] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def configure_tracing(url: Optional[str]) -> bool:
+    """
+    Start exporting spans.
+
+    Args:
+        url: "file:///path/to/traces.jsonl" or an OTLP/HTTP collector such
+            as "http://localhost:4318" (spans go to <url>/v1/traces);
+            empty disables tracing
+
+    Returns:
+        bool: True if tracing is enabled
+    """
+    global _export_url, _queue, _exporter
+
+    if not url:
+        return False
+    if _exporter is not None:
+        return True
+
+    if url.startswith("file://"):
+        path = url[len("file://"):]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    elif url.startswith(("http://", "https://")):
+        if not url.rstrip("/").endswith("/v1/traces"):
+            url = url.rstrip("/") + "/v1/traces"
+    else:
+        log.error("Unsupported trace export URL - tracing disabled", url=url)
+        return False
+
+    _export_url = url
+    _queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+    _exporter = threading.Thread(target=_export_spans, name="trace-exporter", daemon=True)
+    _exporter.start()
+
+    log.info("Tracing enabled", export=url, sample_rate=TRACE_SAMPLE_RATE)
+    return True
+
+
+def is_tracing_enabled() -> bool:
+    """
+    Check whether spans are being exported.
+
+    Returns:
+        bool: True if tracing is on
+    """
+    return _exporter is not None
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Optional[Span]:
+    """
+    Open the root span of a request in the current context.
+
+    Args:
+        name: Span name, e.g. "POST /analyze"
+        traceparent: Incoming W3C traceparent header; its trace is joined
+            and its sampling decision kept
+        **attributes: Span attributes
+
+    Returns:
+        Span: The root span, or None if tracing is off or the request is not sampled
+    """
+    if not is_tracing_enabled():
+        return None
+
+    trace_id, parent_id, sampled = _parse_traceparent(traceparent)
+    if sampled is None:
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return None
+
+    span = Span(trace_id or os.urandom(16).hex(), parent_id, name, "server", attributes)
+    _current_span.set(span)
+    with _stats_lock:
+        _stats["traces"] += 1
+    return span
+
+
+def finish_trace(span: Optional[Span], error: Optional[str] = None, **attributes):
+    """
+    Close the root span of a request and detach it from the context.
+
+    Args:
+        span: Span returned by start_trace (None is ignored)
+        error: Error that ended the request, if any
+        **attributes: Attributes to add, e.g. the response status
+    """
+    _current_span.set(None)
+    if span is None or span.end_ns is not None:
+        return
+    span.set(**attributes)
+    span.error = span.error or error
+    _finish(span)
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    Time a stage as a child of the current span (no-op outside a traced request).
+
+    Args:
+        name: Span name, e.g. "model.forward"
+        kind: "internal" or "client" (calls to other services)
+        **attributes: Span attributes
+
+    Yields:
+        Span: The open span (add attributes with .set()), or None when not tracing
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace_id, parent.span_id, name, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(child)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes):
+    """
+    Add an already finished child span to the current span, e.g. timings
+    reported back by a worker process.
+
+    Args:
+        name: Span name
+        start_ns: Start time (Unix nanoseconds)
+        end_ns: End time (Unix nanoseconds)
+        **attributes: Span attributes
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span(parent.trace_id, parent.span_id, name, "internal", attributes, start_ns)
+    child.end_ns = end_ns
+    _enqueue(child)
+
+
+def annotate(**attributes):
+    """
+    Add attributes to the current span, if any.
+
+    Args:
+        **attributes: Span attributes
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    """
+    Get the trace ID of the request being handled.
+
+    Returns:
+        str: 32 hex digits, or None when the request is not traced
+    """
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
+
+
+def get_tracing_stats() -> Dict:
+    """
+    Get tracing counters.
+
+    Returns:
+        dict: Whether tracing is on, the export target, sample rate and counters
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "enabled": is_tracing_enabled(),
+        "export": _export_url,
+        "sample_rate": TRACE_SAMPLE_RATE,
+        "queued": _queue.qsize() if _queue is not None else 0,
+        **stats,
+    }
+
+
+def _finish(span: Span):
+    span.end_ns = time.time_ns()
+    _enqueue(span)
+
+
+def _enqueue(span: Span):
+    try:
+        _queue.put_nowait(span)
+    except queue.Full:
+        with _stats_lock:
+            _stats["spans_dropped"] += 1
+        return
+    with _stats_lock:
+        _stats["spans"] += 1
+
+
+def _parse_traceparent(header: Optional[str]):
+    """
+    Parse "00-<trace id>-<parent span id>-<flags>".
+
+    Returns:
+        tuple: (trace id, parent span id, sampled) or (None, None, None) if absent or malformed
+    """
+    parts = (header or "").strip().lower().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None, None, None
+    try:
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None, None, None
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None, None, None
+    return parts[1], parts[2], sampled
+
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _otlp_request(spans: List[Span]) -> Dict:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _otlp_attribute("service.name", SERVICE_NAME),
+                _otlp_attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }]
+    }
+
+
+def _export_spans():
+    """
+    Exporter thread: gather finished spans into batches and ship them.
+    """
+    while True:
+        batch = [_queue.get()]
+        deadline = time.time() + TRACE_EXPORT_INTERVAL_SECONDS
+        while len(batch) < TRACE_BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            body = json.dumps(_otlp_request(batch), separators=(",", ":"))
+            if _export_url.startswith("file://"):
+                with open(_export_url[len("file://"):], "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            else:
+                request = urllib.request.Request(
+                    _export_url, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+                )
+                with urllib.request.urlopen(request, timeout=OTLP_TIMEOUT_SECONDS) as response:
+                    response.read()
+            with _stats_lock:
+                _stats["batches_exported"] += 1
+        except Exception as e:
+            log.warning("Failed to export spans", spans=len(batch), error=str(e))
+            with _stats_lock:
+                _stats["export_errors"] += 1
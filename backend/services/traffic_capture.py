@@ -0,0 +1,402 @@
+"""
+Opt-in traffic capture and Gemini replay.
+
+When enabled, every /analyze and /chat request is appended to a JSON-lines
+log: the request payload, the SHA-256 of its image (the image itself is
+stored once per hash next to the log), the response status, stage timings
+and every Gemini response with its latency. Records are written by a
+background thread, so capture adds no disk I/O to the request path; when
+the writer falls behind, records are dropped and counted.
+
+scripts/replay_traffic.py drives a local instance with a capture. Started
+with GEMINI_REPLAY_PATH pointing at the same capture, the instance answers
+Gemini calls from the recorded responses (with the recorded latencies)
+instead of calling the API, so replays are deterministic and offline.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional
+
+from google.api_core.exceptions import DeadlineExceeded
+
+from utils.structured_logging import get_logger, current_request_id
+from .storage_backend import content_key
+
+log = get_logger("capture")
+
+# Configuration
+CAPTURED_ENDPOINTS = {"/analyze", "/chat"}
+CAPTURE_QUEUE_SIZE = 1000  # Records waiting for the writer before new ones are dropped
+CAPTURE_FORMAT_VERSION = 1
+IMAGE_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Capture state
+_capture_path = None
+_image_dir = None
+_queue = None
+_writer = None
+_stats_lock = threading.Lock()
+_stats = {"records_written": 0, "records_dropped": 0, "images_stored": 0, "write_errors": 0}
+
+# Record of the request being handled (shared with the threads it hands work to)
+_current_record = contextvars.ContextVar("capture_record", default=None)
+
+
+def configure_traffic_capture(path: Optional[str]) -> bool:
+    """
+    Start appending captured traffic to a log file.
+
+    Args:
+        path: Capture log path (images go to "<path>.images/"); empty disables capture
+
+    Returns:
+        bool: True if capture is enabled
+    """
+    global _capture_path, _image_dir, _queue, _writer
+
+    if not path:
+        return False
+    if _writer is not None:
+        return True
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    _image_dir = path + ".images"
+    os.makedirs(_image_dir, exist_ok=True)
+    _capture_path = path
+    _queue = queue.Queue(maxsize=CAPTURE_QUEUE_SIZE)
+    _writer = threading.Thread(target=_write_records, name="traffic-capture", daemon=True)
+    _writer.start()
+
+    log.warning("Traffic capture enabled - request payloads and images are being recorded", path=path)
+    return True
+
+
+def is_capture_enabled() -> bool:
+    """
+    Check whether traffic capture is on.
+
+    Returns:
+        bool: True if requests are being captured
+    """
+    return _writer is not None
+
+
+def is_capturing_request() -> bool:
+    """
+    Check whether the current request has an open capture record.
+
+    Returns:
+        bool: True between begin_capture and finish_capture of a captured request
+    """
+    return _current_record.get() is not None
+
+
+def begin_capture(endpoint: str):
+    """
+    Start a capture record for the current request.
+
+    Args:
+        endpoint: Request path (only CAPTURED_ENDPOINTS are recorded)
+    """
+    if not is_capture_enabled() or endpoint not in CAPTURED_ENDPOINTS:
+        return
+    _current_record.set({
+        "v": CAPTURE_FORMAT_VERSION,
+        "id": current_request_id(),
+        "ts": time.time(),
+        "endpoint": endpoint,
+        "stages": {},
+        "gemini": [],
+        "_finished": False,
+    })
+
+
+def capture_image(image_path: str):
+    """
+    Attach the request's image to the capture record (hashed and stored by the writer).
+
+    Args:
+        image_path: Path of the image being analyzed
+    """
+    record = _current_record.get()
+    if record is not None and not record["_finished"]:
+        record["_image_path"] = image_path
+
+
+def record_stage(name: str, seconds: float):
+    """
+    Add a stage timing to the capture record.
+
+    Args:
+        name: Stage name (e.g. "classify", "explanation")
+        seconds: Stage duration
+    """
+    record = _current_record.get()
+    if record is not None and not record["_finished"]:
+        record["stages"][name] = round(seconds * 1000, 1)
+
+
+def record_gemini_call(prompt: str, text: Optional[str], latency_seconds: float, error: Optional[str] = None):
+    """
+    Add a Gemini response (or error) to the capture record.
+
+    Args:
+        prompt: Prompt sent
+        text: Response text (None on error)
+        latency_seconds: Time the call took
+        error: Error message if the call failed
+    """
+    record = _current_record.get()
+    if record is None or record["_finished"]:
+        return
+    call = {"key": content_key(prompt), "latency_ms": round(latency_seconds * 1000, 1)}
+    if error is None:
+        call["text"] = text
+    else:
+        call["error"] = error
+    record["gemini"].append(call)
+
+
+def finish_capture(status: int, payload: Optional[dict], response: Optional[dict]):
+    """
+    Complete the current request's record and queue it for writing.
+
+    Args:
+        status: HTTP status returned
+        payload: Parsed JSON request body
+        response: Parsed JSON response body (only session IDs are kept)
+    """
+    record = _current_record.get()
+    if record is None or record["_finished"]:
+        return
+    record["_finished"] = True
+    _current_record.set(None)
+
+    record["status"] = status
+    record["duration_ms"] = round((time.time() - record["ts"]) * 1000, 1)
+    record["payload"] = payload
+    if isinstance(response, dict):
+        session_id = response.get("chat_session_id") or response.get("session_id")
+        if session_id:
+            record["session_id"] = session_id
+
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        with _stats_lock:
+            _stats["records_dropped"] += 1
+
+
+def end_capture():
+    """
+    Drop an unfinished record (the request failed before responding).
+    """
+    _current_record.set(None)
+
+
+def get_capture_stats() -> Dict:
+    """
+    Get capture counters.
+
+    Returns:
+        dict: Whether capture is on, its path and write counters
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "enabled": is_capture_enabled(),
+        "path": _capture_path,
+        "queued": _queue.qsize() if _queue is not None else 0,
+        **stats,
+    }
+
+
+def _write_records():
+    """
+    Writer thread: store images and append records to the capture log.
+    """
+    with open(_capture_path, "a", encoding="utf-8") as f:
+        while True:
+            record = _queue.get()
+            try:
+                # Late threads of the request may still read the record's private keys
+                data = {key: value for key, value in record.items() if not key.startswith("_")}
+                if record.get("_image_path"):
+                    data["image"] = _store_image(record["_image_path"])
+                f.write(json.dumps(data, separators=(",", ":")) + "\n")
+                with _stats_lock:
+                    _stats["records_written"] += 1
+            except Exception as e:
+                log.error("Failed to write capture record", error=str(e))
+                with _stats_lock:
+                    _stats["write_errors"] += 1
+            if _queue.empty():
+                f.flush()
+
+
+def _store_image(image_path: str) -> Optional[Dict]:
+    """
+    Copy an image into the capture's image directory, once per content hash.
+
+    Args:
+        image_path: Image to store
+
+    Returns:
+        dict: {"sha256", "ext"}, or None if the image is gone
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(IMAGE_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+
+    sha256 = digest.hexdigest()
+    ext = os.path.splitext(image_path)[1].lstrip(".").lower() or "bin"
+    stored_path = os.path.join(_image_dir, f"{sha256}.{ext}")
+    if not os.path.exists(stored_path):
+        temp_path = stored_path + ".tmp"
+        shutil.copyfile(image_path, temp_path)
+        os.replace(temp_path, stored_path)
+        with _stats_lock:
+            _stats["images_stored"] += 1
+    return {"sha256": sha256, "ext": ext}
+
+
+def load_capture(path: str) -> Iterator[Dict]:
+    """
+    Read the records of a capture log (a partially written last line is skipped).
+
+    Args:
+        path: Capture log path
+
+    Yields:
+        dict: Captured request records, in write order
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class CapturingGeminiModel:
+    """
+    Wraps a Gemini model and records each response in the current capture record.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate_content(self, prompt, **kwargs):
+        start_time = time.time()
+        try:
+            response = self.model.generate_content(prompt, **kwargs)
+        except Exception as e:
+            record_gemini_call(prompt, None, time.time() - start_time, error=str(e))
+            raise
+        record_gemini_call(prompt, _response_text(response), time.time() - start_time)
+        return response
+
+    async def generate_content_async(self, prompt, **kwargs):
+        start_time = time.time()
+        try:
+            response = await self.model.generate_content_async(prompt, **kwargs)
+        except Exception as e:
+            record_gemini_call(prompt, None, time.time() - start_time, error=str(e))
+            raise
+        record_gemini_call(prompt, _response_text(response), time.time() - start_time)
+        return response
+
+
+class ReplayGeminiModel:
+    """
+    Stands in for the Gemini model during replays, answering from a capture.
+
+    Calls made while handling a replayed request (identified by its original
+    X-Request-ID) get that request's recorded responses in order, so they
+    line up even if a changed model produces different prompts. Other calls
+    are matched by prompt. Each answer waits for the recorded latency, or
+    fails like a live call would if that exceeds the call's request timeout.
+
+    Args:
+        path: Capture log to answer from
+        latency_scale: Multiplier for the recorded latencies (0 answers immediately)
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self.by_request = {}
+        self.by_prompt = {}
+        for record in load_capture(path):
+            calls = record.get("gemini") or []
+            if record.get("id") and calls:
+                self.by_request[record["id"]] = calls
+            for call in calls:
+                self.by_prompt.setdefault(call["key"], call)
+        self._cursors = {}
+        self._lock = threading.Lock()
+        self.stats = {"replayed": 0, "matched_by_prompt": 0, "missing": 0}
+
+    def generate_content(self, prompt, **kwargs):
+        call = self._lookup(prompt)
+        latency, timeout = self._latency(call, kwargs)
+        time.sleep(min(latency, timeout))
+        return self._response(call, latency > timeout)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        call = self._lookup(prompt)
+        latency, timeout = self._latency(call, kwargs)
+        await asyncio.sleep(min(latency, timeout))
+        return self._response(call, latency > timeout)
+
+    def _latency(self, call: Dict, kwargs: Dict) -> tuple:
+        timeout = (kwargs.get("request_options") or {}).get("timeout")
+        return call["latency_ms"] / 1000 * self.latency_scale, float("inf") if timeout is None else timeout
+
+    def _lookup(self, prompt) -> Dict:
+        request_id = current_request_id()
+        with self._lock:
+            calls = self.by_request.get(request_id)
+            position = self._cursors.get(request_id, 0)
+            if calls is not None and position < len(calls):
+                self._cursors[request_id] = position + 1
+                self.stats["replayed"] += 1
+                return calls[position]
+
+            call = self.by_prompt.get(content_key(prompt))
+            if call is not None:
+                self.stats["matched_by_prompt"] += 1
+                return call
+            self.stats["missing"] += 1
+        raise RuntimeError("No recorded Gemini response for this request")
+
+    @staticmethod
+    def _response(call: Dict, timed_out: bool = False):
+        if timed_out:
+            raise DeadlineExceeded("Recorded Gemini latency exceeds the request timeout")
+        if "error" in call:
+            raise RuntimeError(call["error"])
+        return SimpleNamespace(text=call["text"])
+
+
+def _response_text(response) -> Optional[str]:
+    """
+    Extract the text of a Gemini response without failing on blocked responses.
+    """
+    try:
+        return response.text
+    except Exception:
+        return None
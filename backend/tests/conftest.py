@@ -0,0 +1,11 @@
+"""
+Shared test setup: run from the backend directory so services/ and utils/
+import the way the servers import them.
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
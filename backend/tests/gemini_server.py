@@ -0,0 +1,76 @@
+"""
+In-process gRPC server standing in for the Gemini API in tests.
+Serves GenerativeService.GenerateContent over plaintext HTTP/2, so the
+pooled channels, the google.generativeai clients bound to them and their
+reconnect paths run unmodified. Records the client connection (peer) of
+every call.
+"""
+
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from google.ai.generativelanguage_v1beta.types import (
+    Candidate,
+    Content,
+    GenerateContentRequest,
+    GenerateContentResponse,
+    Part,
+)
+
+SERVICE_NAME = "google.ai.generativelanguage.v1beta.GenerativeService"
+
+
+class GeminiServer:
+    """
+    GenerateContent server on 127.0.0.1 that echoes the prompt after a delay.
+
+    Args:
+        port: Port to listen on (default: an ephemeral port; pass the old
+            port to restart a stopped server in place)
+        delay: Seconds each call takes
+    """
+
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.peers = []  # Client connection of each call, in order
+        self.in_flight = 0
+        self.max_in_flight = 0
+        handler = grpc.method_handlers_generic_handler(SERVICE_NAME, {
+            "GenerateContent": grpc.unary_unary_rpc_method_handler(
+                self._generate,
+                request_deserializer=GenerateContentRequest.deserialize,
+                response_serializer=GenerateContentResponse.serialize,
+            ),
+        })
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=32), handlers=[handler])
+        self.port = self._server.add_insecure_port(f"127.0.0.1:{port}")
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "GeminiServer":
+        self._server.start()
+        return self
+
+    def stop(self):
+        # Closes every open connection, like a server restart
+        self._server.stop(grace=None).wait()
+
+    def _generate(self, request, context):
+        with self.lock:
+            self.peers.append(context.peer())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            text = "echo: " + request.contents[0].parts[0].text
+            return GenerateContentResponse(
+                candidates=[Candidate(content=Content(parts=[Part(text=text)], role="model"), finish_reason=1)]
+            )
+        finally:
+            with self.lock:
+                self.in_flight -= 1
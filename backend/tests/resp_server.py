@@ -0,0 +1,106 @@
+"""
+In-process RESP2 server standing in for Redis in tests.
+Implements the commands the storage backend uses (PING, AUTH, SELECT, GET,
+SET with PX, MGET, DEL) over real sockets, so the client's pooling,
+pipelining and reconnect paths run unmodified.
+"""
+
+import socket
+import socketserver
+import threading
+import time
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.open_sockets.add(self.connection)
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(server.run(args))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """
+    Redis-compatible key/value server on 127.0.0.1 (an ephemeral port by default).
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _RespHandler)
+        self.store = {}  # key -> (expires_at or None, value)
+        self.lock = threading.Lock()
+        self.commands = []
+        self.connections = 0
+        self.open_sockets = set()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop listening and drop every client connection, like a server restart.
+        """
+        self.shutdown()
+        self.server_close()
+        with self.lock:
+            for sock in self.open_sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.open_sockets.clear()
+
+    def run(self, args) -> bytes:
+        command = args[0].upper()
+        with self.lock:
+            self.commands.append(command.decode())
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command in (b"AUTH", b"SELECT"):
+                return b"+OK\r\n"
+            if command == b"GET":
+                return _bulk(self._get(args[1]))
+            if command == b"MGET":
+                return b"*%d\r\n" % (len(args) - 1) + b"".join(_bulk(self._get(key)) for key in args[1:])
+            if command == b"SET":
+                expires_at = None
+                if len(args) > 4 and args[3].upper() == b"PX":
+                    expires_at = time.time() + int(args[4]) / 1000
+                self.store[args[1]] = (expires_at, args[2])
+                return b"+OK\r\n"
+            if command == b"DEL":
+                return b":%d\r\n" % (1 if self.store.pop(args[1], None) else 0)
+            return b"-ERR unknown command '%s'\r\n" % command
+
+    def _get(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.store[key]
+            return None
+        return value
+
+
+def _bulk(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
@@ -0,0 +1,95 @@
+"""
+Pooled Gemini connections against a local GenerateContent server.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from services.gemini_connections import PooledGeminiModel
+from tests.gemini_server import GeminiServer
+
+
+@pytest.fixture
+def server():
+    server = GeminiServer().start()
+    yield server
+    server.stop()
+
+
+def _model(server, pool_size=2):
+    return PooledGeminiModel("gemini-test", None, server.endpoint, pool_size=pool_size)
+
+
+def test_calls_reuse_preconnected_channels(server):
+    model = _model(server)
+    assert model.preconnect(timeout=5) == 2
+
+    for i in range(6):
+        assert model.generate_content(f"prompt {i}").text == f"echo: prompt {i}"
+
+    stats = model.stats()
+    assert stats["calls"] == 6
+    assert stats["cold_calls"] == 0
+    assert [connection["connects"] for connection in stats["connections"]] == [1, 1]
+    # Back-to-back calls all reuse the first idle connection
+    assert len(set(server.peers)) == 1
+
+
+def test_calls_beyond_pool_size_share_channels(server):
+    server.delay = 0.3
+    model = _model(server)
+    model.preconnect(timeout=5)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        texts = list(executor.map(lambda i: model.generate_content(f"p{i}").text, range(6)))
+
+    assert texts == [f"echo: p{i}" for i in range(6)]
+    # Calls are multiplexed on the pool rather than opening new connections or waiting
+    assert server.max_in_flight == 6
+    assert len(set(server.peers)) == 2
+    assert all(connection["in_flight"] == 0 for connection in model.stats()["connections"])
+
+
+def test_reconnects_after_channel_error():
+    server = GeminiServer().start()
+    model = _model(server, pool_size=1)
+    assert model.generate_content("before").text == "echo: before"
+
+    server.stop()
+    with pytest.raises((google_exceptions.ServiceUnavailable, ConnectionError)):
+        model.generate_content("during", request_options={"timeout": 1})
+    assert model.stats()["errors"] == 1
+
+    server = GeminiServer(port=server.port).start()
+    try:
+        assert model.generate_content("after", request_options={"timeout": 5}).text == "echo: after"
+        connection = model.stats()["connections"][0]
+        assert connection["connects"] == 2
+        assert connection["state"] == grpc.ChannelConnectivity.READY.name.lower()
+    finally:
+        server.stop()
+
+
+def test_request_timeout_bounds_the_call(server):
+    server.delay = 2
+    model = _model(server, pool_size=1)
+    model.preconnect(timeout=5)
+
+    with pytest.raises(google_exceptions.DeadlineExceeded):
+        model.generate_content("slow", request_options={"timeout": 0.2})
+
+
+def test_async_pool(server):
+    model = _model(server)
+
+    async def run():
+        assert await model.preconnect_async(timeout=5) == 2
+        responses = await asyncio.gather(*(model.generate_content_async(f"a{i}") for i in range(4)))
+        return [response.text for response in responses]
+
+    assert asyncio.run(run()) == [f"echo: a{i}" for i in range(4)]
+    assert model.stats()["async_connections"] == 2
@@ -0,0 +1,90 @@
+"""
+Job store: startup sweep of other processes' jobs and submission failures.
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services import job_service
+from services.job_service import STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, get_job, init_job_queue, submit_job
+
+
+def _handler(params):
+    return {"success": True, "echo": params}, 200
+
+
+def _insert(db_path, job_id, status, instance, pid):
+    db = sqlite3.connect(db_path, isolation_level=None)
+    now = time.time()
+    db.execute(
+        "INSERT INTO jobs (id, status, created_at, updated_at, expires_at, params, owner_instance, owner_pid)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, status, now, now, now + 60, "{}", instance, pid),
+    )
+    db.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    yield path
+    if job_service._executor is not None:
+        job_service._executor.shutdown(wait=True)
+
+
+def test_startup_sweep_keeps_jobs_of_live_processes(db_path):
+    assert init_job_queue(db_path, _handler)
+
+    # A live process sharing the store
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        time.sleep(0.1)
+        _insert(db_path, "live", STATUS_RUNNING, job_service._process_instance(other.pid), other.pid)
+
+        # A process that has exited
+        gone = subprocess.Popen([sys.executable, "-c", "pass"])
+        gone_instance = job_service._process_instance(gone.pid)
+        gone.wait()
+        _insert(db_path, "gone", STATUS_QUEUED, gone_instance, gone.pid)
+
+        # An earlier process that had this one's PID (e.g. PID 1 in a restarted container)
+        _insert(db_path, "reused", STATUS_RUNNING, "earlier-boot:1", os.getpid())
+
+        assert init_job_queue(db_path, _handler)
+
+        assert get_job("live")["status"] == STATUS_RUNNING
+        for job_id in ("gone", "reused"):
+            job = get_job(job_id)
+            assert job["status"] == STATUS_FAILED
+            assert job["http_status"] == 500
+    finally:
+        other.kill()
+        other.wait()
+
+
+def test_jobs_record_their_owner(db_path):
+    assert init_job_queue(db_path, _handler)
+    job_id = submit_job({"image": "a.png"})
+    assert get_job(job_id, wait_seconds=5)["result"]["echo"] == {"image": "a.png"}
+
+    row = sqlite3.connect(db_path).execute("SELECT owner_instance, owner_pid FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert row == (job_service._process_instance(os.getpid()), os.getpid())
+
+
+def test_failed_insert_releases_pending_slot(db_path):
+    assert init_job_queue(db_path, _handler, max_pending=1)
+
+    # Parameters that cannot be stored make the INSERT step raise
+    with pytest.raises(TypeError):
+        submit_job({"unserializable": object()})
+    assert job_service._job_events == {}
+
+    job_id = submit_job({"image": "a.png"})
+    assert job_id is not None
+    assert json.dumps(get_job(job_id, wait_seconds=5)["result"])
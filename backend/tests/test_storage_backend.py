@@ -0,0 +1,132 @@
+"""
+RESP client and Redis storage backend against a local RESP server.
+"""
+
+import time
+
+import pytest
+
+from services import storage_backend
+from services.storage_backend import (
+    REDIS_KEY_PREFIX,
+    configure_storage,
+    get_storage_info,
+    storage_get,
+    storage_get_many,
+    storage_set,
+    storage_set_many,
+)
+from tests.resp_server import RespServer
+from utils.resp_client import RespClient, RespConnectionError, RespError
+
+
+@pytest.fixture
+def server():
+    server = RespServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def redis_storage(server):
+    assert configure_storage(server.url)
+    yield server
+    configure_storage("memory://")
+
+
+def test_get_set_px(server):
+    client = RespClient(server.url, pool_size=2, timeout=1.0)
+    assert client.execute("SET", "k", "v", "PX", 50) == "OK"
+    assert client.execute("GET", "k") == b"v"
+    time.sleep(0.1)
+    assert client.execute("GET", "k") is None
+
+
+def test_mget_returns_nil_for_misses(server):
+    client = RespClient(server.url)
+    client.execute("SET", "a", "1")
+    client.execute("SET", "c", "3")
+    assert client.execute("MGET", "a", "b", "c") == [b"1", None, b"3"]
+
+
+def test_pipeline_is_one_write_with_ordered_replies(server):
+    client = RespClient(server.url, pool_size=1)
+    replies = client.pipeline([("SET", "x", "1", "PX", 10000), ("GET", "x"), ("BOGUS",), ("GET", "missing")])
+    assert replies[0] == "OK"
+    assert replies[1] == b"1"
+    assert isinstance(replies[2], RespError)
+    assert replies[3] is None
+    assert client.get_stats()["pipelines"] == 1
+    assert server.connections == 1
+
+
+def test_error_reply_raises_from_execute(server):
+    client = RespClient(server.url)
+    with pytest.raises(RespError):
+        client.execute("BOGUS")
+
+
+def test_connections_are_reused(server):
+    client = RespClient(server.url, pool_size=4)
+    for i in range(20):
+        client.execute("SET", f"k{i}", i)
+    assert server.connections == 1
+    assert client.get_stats()["connections_opened"] == 1
+
+
+def test_reconnects_after_server_restart():
+    first = RespServer().start()
+    port = first.server_address[1]
+    client = RespClient(first.url, timeout=1.0)
+    client.execute("PING")
+    first.stop()
+
+    second = RespServer(port).start()
+    try:
+        # The pooled connection is stale; the client retries on a fresh one
+        assert client.execute("PING") == "PONG"
+        assert client.get_stats()["reconnects"] == 1
+    finally:
+        second.stop()
+
+
+def test_unreachable_server_raises_connection_error(server):
+    url = server.url
+    server.stop()
+    with pytest.raises(RespConnectionError):
+        RespClient(url, timeout=0.5).execute("PING")
+
+
+def test_backend_round_trip(redis_storage):
+    assert storage_set("predictions", "a", {"label": "eczema"}, ttl_seconds=60)
+    assert storage_get("predictions", "a") == {"label": "eczema"}
+    assert redis_storage.store[f"{REDIS_KEY_PREFIX}predictions:a".encode()][0] is not None  # PX set
+
+
+def test_backend_bulk_operations_use_one_round_trip(redis_storage):
+    before = len(redis_storage.commands)
+    assert storage_set_many("chat", {"a": {"n": 1}, "b": {"n": 2}}, ttl_seconds=60)
+    assert storage_get_many("chat", ["a", "missing", "b"]) == [{"n": 1}, None, {"n": 2}]
+    assert redis_storage.commands[before:] == ["SET", "SET", "MGET"]
+    info = get_storage_info()
+    assert info["backend"] == "redis"
+
+
+def test_backend_connection_error_is_a_miss(redis_storage):
+    storage_set("predictions", "a", {"label": "eczema"}, ttl_seconds=60)
+    errors_before = storage_backend._stats["predictions"]["errors"]
+    redis_storage.stop()
+
+    assert storage_get("predictions", "a") is None
+    assert storage_get_many("predictions", ["a", "b"]) == [None, None]
+    assert not storage_set("predictions", "b", {"label": "x"}, ttl_seconds=60)
+    assert storage_backend._stats["predictions"]["errors"] >= errors_before + 3
+
+
+def test_unreachable_url_falls_back_to_memory(server):
+    url = server.url
+    server.stop()
+    assert not configure_storage(url)
+    assert get_storage_info()["backend"] == "memory"
+    assert storage_set("predictions", "a", {"ok": True}, ttl_seconds=60)
+    assert storage_get("predictions", "a") == {"ok": True}
@@ -2,6 +2,10 @@ import os
 import time
 from datetime import datetime
 
+from utils.structured_logging import get_logger
+
+log = get_logger("cleanup")
+
 
 def get_file_age_hours(file_path):
     """
@@ -27,7 +31,7 @@ def get_file_age_hours(file_path):
 
         return age_hours
     except Exception as e:
-        print(f"Error getting file age for {file_path}: {str(e)}")
+        log.warning("Could not get file age", path=file_path, error=str(e))
         return None
 
 
@@ -90,21 +94,18 @@ def cleanup_old_files(upload_folder, max_age_hours=1, allowed_extensions=None):
                 errors.append(f"Could not determine age for: {filename}")
                 continue
 
-            # Debug: Print file age for all files
-            print(
-                f"Checking file: {filename} - Age: {age_hours:.2f} hours (threshold: {max_age_hours} hours)"
-            )
+            log.debug("Checking file", filename=filename, age_hours=round(age_hours, 2), threshold_hours=max_age_hours)
 
             # Delete if file is older than threshold
             if age_hours > max_age_hours:
                 try:
                     os.remove(file_path)
                     files_deleted += 1
-                    print(f"Deleted old file: {filename} (age: {age_hours:.2f} hours)")
+                    log.info("Deleted old file", filename=filename, age_hours=round(age_hours, 2))
                 except Exception as e:
                     error_msg = f"Failed to delete {filename}: {str(e)}"
                     errors.append(error_msg)
-                    print(f"Error: {error_msg}")
+                    log.warning(error_msg)
 
         return {
             "success": True,
@@ -115,7 +116,7 @@ def cleanup_old_files(upload_folder, max_age_hours=1, allowed_extensions=None):
     except Exception as e:
         error_msg = f"Error during cleanup: {str(e)}"
         errors.append(error_msg)
-        print(f"Error: {error_msg}")
+        log.error(error_msg)
         return {
             "success": False,
             "files_deleted": files_deleted,
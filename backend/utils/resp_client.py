@@ -0,0 +1,241 @@
+"""
+Minimal Redis protocol (RESP2) client.
+Speaks to Redis or any RESP-compatible server (KeyDB, Dragonfly, Valkey)
+over a small pool of persistent connections. Pipelines send a batch of
+commands in one write and read the replies back in order, so bulk gets and
+sets cost one round trip instead of one per key.
+"""
+
+import queue
+import socket
+import threading
+from typing import List
+from urllib.parse import unquote, urlparse
+
+
+class RespError(Exception):
+    """
+    Error reply from the server (e.g. wrong type, unknown command).
+    """
+
+
+class RespConnectionError(Exception):
+    """
+    The server could not be reached or the connection broke mid-command.
+    """
+
+
+class RespConnection:
+    """
+    One socket to the server with a buffered reader for replies.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def send(self, commands: List[tuple]):
+        self.sock.sendall(b"".join(_encode_command(command) for command in commands))
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise RespConnectionError("connection closed by server")
+
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            return RespError(payload.decode("utf-8", errors="replace"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise RespConnectionError("connection closed by server")
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self.read_reply() for _ in range(count)]
+        raise RespConnectionError(f"unexpected reply prefix {prefix!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespClient:
+    """
+    Pooled RESP client. Thread-safe: each call borrows a connection.
+
+    Args:
+        url: redis://[:password@]host[:port][/db]
+        pool_size: Connections kept open (callers wait when all are busy)
+        timeout: Connect and per-reply socket timeout in seconds
+    """
+
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._stats_lock = threading.Lock()
+        self._stats = {"connections_opened": 0, "commands": 0, "pipelines": 0, "reconnects": 0}
+
+    def execute(self, *args):
+        """
+        Run one command.
+
+        Args:
+            *args: Command name and arguments (str, bytes or numbers)
+
+        Returns:
+            The decoded reply (bytes for bulk strings, None for nil)
+
+        Raises:
+            RespError: If the server replied with an error
+            RespConnectionError: If the server is unreachable
+        """
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def pipeline(self, commands: List[tuple]) -> list:
+        """
+        Send several commands in one write and collect their replies.
+        A pipeline that fails on a reused connection is retried once on a
+        fresh one (the idle connection may have been closed by the server),
+        so only idempotent commands should be pipelined.
+
+        Args:
+            commands: List of argument tuples
+
+        Returns:
+            list: One reply per command; error replies are RespError instances
+
+        Raises:
+            RespConnectionError: If the server is unreachable
+        """
+        if not commands:
+            return []
+
+        with self._stats_lock:
+            self._stats["commands"] += len(commands)
+            self._stats["pipelines"] += 1
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RespConnectionError("timed out waiting for a pooled connection")
+        try:
+            for attempt in range(2):
+                connection, reused = self._checkout(fresh=attempt > 0)
+                try:
+                    connection.send(commands)
+                    replies = [connection.read_reply() for _ in commands]
+                except (OSError, RespConnectionError) as e:
+                    connection.close()
+                    if reused and attempt == 0:
+                        # The server likely restarted: the other idle connections are stale too
+                        self.close()
+                        with self._stats_lock:
+                            self._stats["reconnects"] += 1
+                        continue
+                    raise RespConnectionError(str(e)) from e
+
+                self._idle.put(connection)
+                return replies
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def get_stats(self) -> dict:
+        """
+        Get connection and command counters.
+
+        Returns:
+            dict: Counters plus the number of idle pooled connections
+        """
+        with self._stats_lock:
+            return {**self._stats, "idle_connections": self._idle.qsize(), "pool_size": self.pool_size}
+
+    def _checkout(self, fresh: bool = False):
+        """
+        Take an idle connection, or open a new one (caller holds a pool slot).
+
+        Args:
+            fresh: Always open a new connection
+
+        Returns:
+            tuple: (RespConnection, True if it was reused)
+        """
+        if not fresh:
+            try:
+                return self._idle.get_nowait(), True
+            except queue.Empty:
+                pass
+
+        try:
+            connection = RespConnection(self.host, self.port, self.timeout)
+            setup = []
+            if self.password:
+                setup.append(("AUTH", self.password))
+            if self.db:
+                setup.append(("SELECT", self.db))
+            if setup:
+                connection.send(setup)
+                for reply in [connection.read_reply() for _ in setup]:
+                    if isinstance(reply, RespError):
+                        connection.close()
+                        raise RespConnectionError(f"connection setup failed: {reply}")
+        except OSError as e:
+            raise RespConnectionError(f"cannot connect to {self.host}:{self.port}: {e}") from e
+
+        with self._stats_lock:
+            self._stats["connections_opened"] += 1
+        return connection, False
+
+
+def _encode_command(args: tuple) -> bytes:
+    """
+    Encode a command as a RESP array of bulk strings.
+
+    Args:
+        args: Command name and arguments
+
+    Returns:
+        bytes: Wire format
+    """
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode("utf-8")
+        else:
+            data = str(arg).encode("ascii")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
@@ -0,0 +1,309 @@
+"""
+Structured Logging
+Log records carry fields (request ID, stage timings, sizes) next to the
+message and are written by a background thread fed from a bounded queue, so
+request threads never block on stdout. Forked children (inference workers)
+have no writer thread and write their records directly. Records below WARNING can be sampled
+per category; sampled-out and disabled records are discarded before a
+LogRecord is built, so debug noise costs a level check in production.
+
+Usage:
+    log = get_logger("analyze")
+    log.info("Analysis complete", classify_s=0.41, total_s=1.92)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+# Logging configuration (overridable from the environment)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE_SIZE = 10000  # Records buffered for the writer thread before new ones are dropped
+LOGGER_PREFIX = "skin"
+
+# Fraction of DEBUG/INFO records kept per category (warnings and errors are always kept).
+# Override with LOG_SAMPLE_RATES="cleanup=0.01,classify=0.5"
+DEFAULT_SAMPLE_RATES = {
+    "cleanup": 0.1,
+}
+
+# Request ID of the request being handled (set by the Flask and ASGI servers)
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Logging state
+_configure_lock = threading.Lock()
+_listener = None
+_sample_rates = dict(DEFAULT_SAMPLE_RATES)
+_stats_lock = threading.Lock()
+_sampled_out = {}
+_dropped = 0
+
+# Keyword arguments understood by logging itself; anything else is a field
+_RESERVED_FIELDS = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    Logger that takes structured fields as keyword arguments and applies
+    the category's sampling rate before building a record.
+    """
+
+    def __init__(self, logger: logging.Logger, category: str):
+        super().__init__(logger, {})
+        self.category = category
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING:
+            rate = _sample_rates.get(self.category, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                _count_sampled_out(self.category)
+                return
+        msg, kwargs = self.process(msg, kwargs)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        self.log(logging.ERROR, msg, *args, exc_info=exc_info, **kwargs)
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _RESERVED_FIELDS}
+        extra = kwargs.setdefault("extra", {})
+        extra["fields"] = fields
+        extra["request_id"] = _request_id.get()
+        extra["category"] = self.category
+        return msg, kwargs
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that hands records over unformatted and drops them when
+    the writer thread falls behind instead of blocking the caller.
+    """
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread
+        return record
+
+    def enqueue(self, record):
+        global _dropped
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _stats_lock:
+                _dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """
+    One line per record: time, level, category, request ID, message, fields.
+    """
+
+    def format(self, record):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        parts = [f"{timestamp}.{int(record.msecs):03d}", f"{record.levelname:<7}", getattr(record, "category", record.name)]
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            parts.append(f"[{request_id}]")
+        parts.append(record.getMessage())
+        for key, value in getattr(record, "fields", {}).items():
+            parts.append(f"{key}={value}")
+
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with fields as top-level keys.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "category": getattr(record, "category", record.name),
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None, sample_rates: Optional[Dict[str, float]] = None):
+    """
+    Install the queue-backed handler on the backend's loggers (idempotent).
+
+    Args:
+        level: Minimum level name (default: LOG_LEVEL)
+        log_format: "text" or "json" (default: LOG_FORMAT)
+        sample_rates: Per-category fraction of DEBUG/INFO records kept
+            (default: DEFAULT_SAMPLE_RATES plus LOG_SAMPLE_RATES)
+    """
+    global _listener
+
+    with _configure_lock:
+        _sample_rates.clear()
+        _sample_rates.update(DEFAULT_SAMPLE_RATES)
+        _sample_rates.update(_parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")))
+        if sample_rates:
+            _sample_rates.update(sample_rates)
+
+        root = logging.getLogger(LOGGER_PREFIX)
+        root.setLevel((level or LOG_LEVEL).upper())
+        root.propagate = False
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter() if (log_format or LOG_FORMAT) == "json" else TextFormatter())
+
+        if _listener is not None:
+            _listener.stop()
+        root.handlers.clear()
+
+        records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root.addHandler(_NonBlockingQueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, stream_handler)
+        _listener.start()
+
+
+def get_logger(category: str) -> StructuredLogger:
+    """
+    Get the logger for a category (e.g. "upload", "analyze", "cleanup").
+
+    Args:
+        category: Category name, also the key for sampling rates
+
+    Returns:
+        StructuredLogger: Logger accepting structured fields as keyword arguments
+    """
+    if _listener is None:
+        configure_logging()
+    return StructuredLogger(logging.getLogger(f"{LOGGER_PREFIX}.{category}"), category)
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """
+    Start logging under a request ID for the current thread or task.
+
+    Args:
+        incoming: Client-supplied X-Request-ID to reuse, if any
+
+    Returns:
+        str: The request ID now attached to log records
+    """
+    request_id = (incoming or "").strip()[:64] or uuid.uuid4().hex[:12]
+    _request_id.set(request_id)
+    return request_id
+
+
+def clear_request_id():
+    """
+    Stop attaching a request ID in this thread (pooled server threads outlive requests).
+    """
+    _request_id.set(None)
+
+
+def current_request_id() -> Optional[str]:
+    """
+    Get the request ID attached to log records in this context.
+
+    Returns:
+        str: Request ID, or None outside a request
+    """
+    return _request_id.get()
+
+
+def get_logging_stats() -> Dict:
+    """
+    Get counts of records discarded by sampling or a full queue.
+
+    Returns:
+        dict: {"sampled_out": {category: int}, "dropped": int, "sample_rates": dict}
+    """
+    with _stats_lock:
+        return {
+            "sampled_out": dict(_sampled_out),
+            "dropped": _dropped,
+            "sample_rates": dict(_sample_rates),
+        }
+
+
+def _count_sampled_out(category: str):
+    """
+    Count a record discarded by sampling.
+
+    Args:
+        category: Logger category
+    """
+    with _stats_lock:
+        _sampled_out[category] = _sampled_out.get(category, 0) + 1
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse "category=rate,..." into a dict, ignoring malformed entries.
+
+    Args:
+        spec: Sampling rate specification
+
+    Returns:
+        dict: Category to rate in [0, 1]
+    """
+    rates = {}
+    for item in spec.split(","):
+        category, _, value = item.partition("=")
+        try:
+            rates[category.strip()] = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+def _stop_listener():
+    """
+    Flush queued records on interpreter exit.
+    """
+    if _listener is not None:
+        _listener.stop()
+
+
+def _write_directly_after_fork():
+    """
+    Point a forked child's loggers at the inherited output handlers.
+    The writer thread is not copied by fork, so records queued in the child
+    would never be written.
+    """
+    if _listener is not None:
+        logging.getLogger(LOGGER_PREFIX).handlers[:] = list(_listener.handlers)
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_write_directly_after_fork)
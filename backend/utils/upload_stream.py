@@ -0,0 +1,378 @@
+"""
+Streaming multipart ingestion for image uploads.
+
+The request body is parsed as it arrives instead of being buffered by the
+framework first. The image part is size-checked on every chunk, identified
+from its magic bytes and header (format, width, height) before any of it
+is written to disk, and decoded incrementally as the rest arrives, so
+oversized, disguised or corrupt uploads are rejected as soon as the
+offending bytes are seen. Memory per upload is bounded by the header
+buffer, one chunk, and the decoded image (itself capped by the pixel limit).
+"""
+
+import os
+import struct
+import uuid
+from typing import Callable, Optional
+
+from PIL import ImageFile
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+UPLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read from the request body at a time
+HEADER_SNIFF_LIMIT = 512 * 1024  # Bytes buffered to find the image dimensions (JPEG metadata can be large)
+MAX_MULTIPART_PARTS = 16  # Form fields accepted alongside the image
+MAX_OTHER_PARTS_BYTES = 64 * 1024  # Total size of the form fields besides the image
+
+# Sniffed format -> file extension used when saving
+FORMAT_EXTENSIONS = {"jpeg": "jpg", "png": "png", "gif": "gif", "webp": "webp"}
+
+# JPEG start-of-frame markers (the ones carrying the image dimensions)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers without a length field
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7}
+
+INVALID_IMAGE_MESSAGE = "Unable to read the image file. Please ensure it's a valid image format (JPG, PNG, GIF, or WebP)."
+
+
+class UploadRejected(Exception):
+    """
+    The upload failed validation; the message is safe to return to the client.
+
+    Args:
+        message: Client-facing error message
+        reason: Short machine-readable reason for logs
+        status: HTTP status to respond with
+    """
+
+    def __init__(self, message: str, reason: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.reason = reason
+        self.status = status
+
+
+def parse_multipart_boundary(content_type: Optional[str]) -> Optional[bytes]:
+    """
+    Extract the boundary of a multipart/form-data Content-Type header.
+
+    Args:
+        content_type: Raw Content-Type header value
+
+    Returns:
+        bytes: The boundary, or None if the body is not multipart/form-data
+    """
+    mimetype, options = parse_options_header(content_type or "")
+    boundary = options.get("boundary")
+    if mimetype != "multipart/form-data" or not boundary:
+        return None
+    return boundary.encode("latin-1")
+
+
+def sniff_image_header(data: bytes) -> Optional[dict]:
+    """
+    Identify an image from its leading bytes.
+
+    Args:
+        data: The first bytes of the file
+
+    Returns:
+        dict: {"format", "width", "height"}, or None if more bytes are needed
+
+    Raises:
+        UploadRejected: If the bytes are not a supported image
+    """
+    if len(data) < 12:
+        return None if _could_be_image(data) else _not_an_image()
+
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        if len(data) < 24:
+            return None
+        if data[12:16] != b"IHDR":
+            _not_an_image()
+        width, height = struct.unpack(">II", data[16:24])
+        return _header("png", width, height)
+
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        width, height = struct.unpack("<HH", data[6:10])
+        return _header("gif", width, height)
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _sniff_webp(data)
+
+    if data[:3] == b"\xff\xd8\xff":
+        return _sniff_jpeg(data)
+
+    return _not_an_image()
+
+
+def _could_be_image(data: bytes) -> bool:
+    """
+    Check whether a short prefix may still turn into a supported signature.
+    """
+    signatures = (b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a", b"RIFF", b"\xff\xd8\xff")
+    return any(signature[:len(data)] == data[:len(signature)] for signature in signatures)
+
+
+def _sniff_webp(data: bytes) -> Optional[dict]:
+    """
+    Read the canvas size of a WebP file (lossy, lossless or extended).
+    """
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        if data[23:26] != b"\x9d\x01\x2a":
+            _not_an_image()
+        width, height = struct.unpack("<HH", data[26:30])
+        return _header("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        if data[20] != 0x2F:
+            _not_an_image()
+        bits = struct.unpack("<I", data[21:25])[0]
+        return _header("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return _header("webp", width, height)
+    return _not_an_image()
+
+
+def _sniff_jpeg(data: bytes) -> Optional[dict]:
+    """
+    Walk the JPEG marker segments up to the start-of-frame header.
+    """
+    position = 2
+    while True:
+        # Markers may be preceded by any number of 0xFF fill bytes
+        while position < len(data) and data[position] == 0xFF and position + 1 < len(data) and data[position + 1] == 0xFF:
+            position += 1
+        if position + 4 > len(data):
+            return None
+        if data[position] != 0xFF:
+            _not_an_image()
+
+        marker = data[position + 1]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if position + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[position + 5:position + 9])
+            return _header("jpeg", width, height)
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header
+            _not_an_image()
+
+        segment_length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if segment_length < 2:
+            _not_an_image()
+        position += 2 + segment_length
+
+
+def _header(image_format: str, width: int, height: int) -> dict:
+    if width <= 0 or height <= 0:
+        _not_an_image()
+    return {"format": image_format, "width": width, "height": height}
+
+
+def _not_an_image():
+    raise UploadRejected(INVALID_IMAGE_MESSAGE, "not an image")
+
+
+class ImageUploadStream:
+    """
+    Incremental reader for a multipart/form-data body carrying one image.
+
+    Feed it the body chunk by chunk; it raises UploadRejected as soon as a
+    limit is exceeded or the bytes stop looking like a valid image. The
+    image part is written to a temporary file next to its final location
+    and decoded on the fly; finish() returns the decoded image and header
+    details, and close() removes the temporary file unless it was kept.
+
+    Args:
+        boundary: Multipart boundary from the Content-Type header
+        field_name: Form field holding the image
+        temp_dir: Directory for the partial file (same filesystem as uploads)
+        max_file_size: Largest accepted image part, in bytes
+        max_pixels: Largest accepted width x height
+        check_part: Called with (filename, content_type) of the image part
+            before any of its data is accepted; raises UploadRejected to refuse it
+    """
+
+    def __init__(
+        self,
+        boundary: bytes,
+        field_name: str,
+        temp_dir: str,
+        max_file_size: int,
+        max_pixels: int,
+        check_part: Callable[[str, str], None],
+    ):
+        self.field_name = field_name
+        self.max_file_size = max_file_size
+        self.max_pixels = max_pixels
+        self.check_part = check_part
+        self.temp_path = os.path.join(temp_dir, f".upload-{uuid.uuid4().hex}.part")
+
+        self.filename = None
+        self.header = None
+        self.size = 0
+        self.bytes_received = 0
+
+        self._decoder = MultipartDecoder(boundary, max_parts=MAX_MULTIPART_PARTS)
+        self._other_bytes = 0
+        self._in_image = False
+        self._image_done = False
+        self._complete = False
+        self._prefix = bytearray()
+        self._file = None
+        self._parser = None
+
+    def feed(self, chunk: bytes):
+        """
+        Process the next chunk of the request body.
+
+        Args:
+            chunk: Raw body bytes
+
+        Raises:
+            UploadRejected: If the upload is invalid or over a limit
+        """
+        self.bytes_received += len(chunk)
+        try:
+            self._decoder.receive_data(chunk)
+            self._drain_events()
+        except RequestEntityTooLarge:
+            raise UploadRejected("Too many form fields in the upload.", "too many parts")
+        except ValueError:
+            raise UploadRejected("Malformed multipart upload.", "malformed body")
+
+    def finish(self) -> dict:
+        """
+        Complete the upload after the whole body has been fed.
+
+        Returns:
+            dict: {"temp_path", "filename", "format", "extension", "width",
+                "height", "size", "image"} where image is the decoded PIL image
+
+        Raises:
+            UploadRejected: If no image arrived or it did not decode
+        """
+        try:
+            self._decoder.receive_data(None)
+            self._drain_events()
+        except ValueError:
+            raise UploadRejected("Malformed multipart upload.", "malformed body")
+
+        if self.filename is None:
+            raise UploadRejected("No image provided", "no image part")
+        if not self._image_done or not self._complete:
+            raise UploadRejected("The upload was interrupted. Please try again.", "truncated body")
+        if self.header is None:
+            _not_an_image()
+
+        self._file.close()
+        self._file = None
+        try:
+            image = self._parser.close()
+        except Exception:
+            self._parser = None
+            _not_an_image()
+        self._parser = None
+
+        return {
+            "temp_path": self.temp_path,
+            "filename": self.filename,
+            "format": self.header["format"],
+            "extension": FORMAT_EXTENSIONS[self.header["format"]],
+            "width": self.header["width"],
+            "height": self.header["height"],
+            "size": self.size,
+            "image": image,
+        }
+
+    def close(self, keep_file: bool = False):
+        """
+        Release the partial file and decoder state.
+
+        Args:
+            keep_file: Leave the temporary file in place (it has been moved or adopted)
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._parser is not None:
+            try:
+                self._parser.close()
+            except Exception:
+                pass
+            self._parser = None
+        if not keep_file:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
+
+    def _drain_events(self):
+        while True:
+            event = self._decoder.next_event()
+            if isinstance(event, NeedData):
+                return
+            if isinstance(event, Epilogue):
+                self._complete = True
+                return
+            if isinstance(event, File) and event.name == self.field_name and self.filename is None:
+                self.check_part(event.filename or "", event.headers.get("Content-Type", ""))
+                self.filename = event.filename
+                self._in_image = True
+            elif isinstance(event, Data):
+                if self._in_image:
+                    self._receive_image_data(event.data)
+                    if not event.more_data:
+                        self._in_image = False
+                        self._image_done = True
+                else:
+                    # Other fields are discarded, but may not pad the body indefinitely
+                    self._other_bytes += len(event.data)
+                    if self._other_bytes > MAX_OTHER_PARTS_BYTES:
+                        raise UploadRejected("The upload has too much form data besides the image.", "form fields too large")
+            elif self._in_image:
+                # A new part started before the image ended
+                self._in_image = False
+                self._image_done = True
+
+    def _receive_image_data(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_file_size:
+            raise UploadRejected(
+                f"File too large. Maximum size: {self.max_file_size / (1024 * 1024):.1f}MB",
+                "file too large",
+            )
+        if not data:
+            return
+
+        if self.header is None:
+            self._prefix += data
+            header = sniff_image_header(bytes(self._prefix))
+            if header is None:
+                if len(self._prefix) > HEADER_SNIFF_LIMIT:
+                    raise UploadRejected(INVALID_IMAGE_MESSAGE, "header not found")
+                return
+            if header["width"] * header["height"] > self.max_pixels:
+                raise UploadRejected(
+                    f"Image is too large. Maximum resolution: {self.max_pixels / 1_000_000:.0f} megapixels.",
+                    "too many pixels",
+                )
+            self.header = header
+            data, self._prefix = bytes(self._prefix), None
+            self._file = open(self.temp_path, "wb")
+            self._parser = ImageFile.Parser()
+
+        self._file.write(data)
+        try:
+            self._parser.feed(data)
+        except Exception:
+            raise UploadRejected(INVALID_IMAGE_MESSAGE, "decode failed")